@@ -2,25 +2,112 @@
 # Date: 2024-01-25
 # Communication from the server to the bots
 
-from typing import Annotated
+import asyncio
+import functools
+import hmac
+import socket
+import time
+from typing import TYPE_CHECKING, Annotated
 from fastapi import APIRouter, HTTPException, status
+from starlette.requests import HTTPConnection
 
+from .. import config
 from ..communication import socket_io
+from ..communication.tracing import TRACE_HEADER, traces
+from ..core import metrics
+from ..core.logs import get_logger, sampled
 
-import requests
-from requests import Response
+# requests is imported on the first call to a bot, it is slow to import & unused by most workers
+if TYPE_CHECKING:
+    import requests
+    from requests import Response
 
 # Bot IP Address constants
-IP_ROS_BOT = "localhost:8081"
-IP_IOT_BOT = "localhost:8082"
+IP_ROS_BOT = config.IP_ROS_BOT
+IP_IOT_BOT = config.IP_IOT_BOT
 
 # BOT Name strings
 ROS_BOT = "ros"
 IOT_BOT = "iot"
 
+# BOT name from its IP Address, for metrics
+BOT_NAMES = {IP_ROS_BOT: ROS_BOT, IP_IOT_BOT: IOT_BOT}
+
+log = get_logger(__name__)
+
+# Bot output lines arrive at a high rate, only every n-th is logged
+dump_log = sampled(__name__ + ".dump")
+
 router = APIRouter()
 
-def push_code(bot: str, file_path: str) -> bool:
+
+@functools.lru_cache
+def bot_hosts(bot: str) -> frozenset[str]:
+    """Addresses of the host of a bot, from its configured address"""
+    host = {ROS_BOT: IP_ROS_BOT, IOT_BOT: IP_IOT_BOT}[bot].rsplit(":", 1)[0].strip("[]")
+    try:
+        return frozenset(info[4][0] for info in socket.getaddrinfo(host, None))
+    except socket.gaierror:
+        log.warning("Address of the %s bot host %s not resolved, what it pushes is refused", bot, host)
+        return frozenset()
+
+
+async def from_bot(bot: str, connection: HTTPConnection) -> bool:
+    """The RERO_BOT_TOKEN if set, otherwise a request (or websocket) from the host of the bot"""
+    if config.BOT_TOKEN:
+        given = connection.headers.get("authorization", "").removeprefix("Bearer ") or connection.query_params.get(
+            "token", ""
+        )
+        return hmac.compare_digest(given.encode(), config.BOT_TOKEN.encode())
+    client = connection.client
+    return client is not None and client.host in await asyncio.to_thread(bot_hosts, bot)
+
+
+async def require_bot(bot: str, connection: HTTPConnection):
+    """403 unless the request comes from the bot (see from_bot)"""
+    if not await from_bot(bot, connection):
+        log.warning("Push to %s refused from %s", bot, connection.client.host if connection.client else None)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not Authorized")
+
+# Keep-alive connections per bot address, opened by the first call or by the pre-warm before a timeslot
+_sessions: dict = {}
+
+
+def session(bot: str) -> "requests.Session":
+    """requests session of a bot, its connection pool is reused by every push / stop"""
+    import requests
+
+    client = _sessions.get(bot)
+    if client is None:
+        client = _sessions[bot] = requests.Session()
+    return client
+
+
+def health_check(bot: str) -> float:
+    """
+    Check the bot answers HTTP, any status counts: the bot API has no health route.
+    Leaves a pooled connection open for the next call
+
+    @param:
+        bot (str): IP Address of the BOT
+    return: seconds the bot took to answer, raises requests.RequestException
+    """
+    import requests
+
+    bot_name: str = BOT_NAMES.get(bot, bot)
+
+    begin = time.perf_counter()
+    try:
+        session(bot).get(f"http://{bot}/", timeout=config.BOT_HEALTH_TIMEOUT)
+        return time.perf_counter() - begin
+    except requests.RequestException:
+        metrics.BOT_RPC_ERRORS.inc(bot_name, "health_check")
+        raise
+    finally:
+        metrics.BOT_RPC_SECONDS.observe(time.perf_counter() - begin, bot_name, "health_check")
+
+
+def push_code(bot: str, file_path: str, trace_id: str | None = None) -> bool:
     """
     Function to alert bot & send the code file from the server
 
@@ -29,67 +116,105 @@ def push_code(bot: str, file_path: str) -> bool:
     @param:
         bot (str): IP Address of the BOT
         file_path (str): File path
+        trace_id (str): Trace id of the push, forwarded to the bot
     """
 
-    print("Alerting the bot")
+    import requests
+
+    log.debug("Alerting the bot %s", bot)
 
     url: str = f"http://{bot}/push_code"
+    bot_name: str = BOT_NAMES.get(bot, bot)
 
+    traces.mark(bot_name, "transfer", trace_id)
+
+    begin = time.perf_counter()
     try:
         # Open the file as binary
         with open(file_path, 'rb') as file:
             files = {'file': file}
 
             # Make a POST request
-            response: Response = requests.post(url, files=files)
+            headers = {TRACE_HEADER: trace_id} if trace_id else None
+            response = session(bot).post(url, files=files, headers=headers)
             response.raise_for_status()
             return True
     except FileNotFoundError:
-        print(f"File not found: {file_path}")
+        log.error("File not found: %s", file_path)
         return False
     except requests.RequestException as e:
-        print(f"An error occurred: {e}")
+        log.warning("Push to bot %s failed - %s", bot_name, e)
+        metrics.BOT_RPC_ERRORS.inc(bot_name, "push_code")
         return False
+    finally:
+        metrics.BOT_RPC_SECONDS.observe(time.perf_counter() - begin, bot_name, "push_code")
     
 
+def stop_code(bot: str) -> "Response":
+    """
+    Function to stop the code running on the bot
+
+    @param:
+        bot (str): IP Address of the BOT
+    """
+
+    import requests
+
+    bot_name: str = BOT_NAMES.get(bot, bot)
+
+    begin = time.perf_counter()
+    try:
+        return session(bot).get(f"http://{bot}/stop_code")
+    except requests.RequestException:
+        metrics.BOT_RPC_ERRORS.inc(bot_name, "stop_code")
+        raise
+    finally:
+        metrics.BOT_RPC_SECONDS.observe(time.perf_counter() - begin, bot_name, "stop_code")
+
+
 @router.get("/iot/dump")
-async def dump_iot_data(data: str):
+async def dump_iot_data(data: str, trace: str | None = None):
     """
     Print string from iot bot to the client
 
     data: str
+    trace: str, trace id of the push that produced the output
     """
-    print("Running...", data)
+    dump_log.debug("Bot output", bot=IOT_BOT)
+    traces.mark(IOT_BOT, "first_output", trace)
     await socket_io.user_dump_printer(data, IOT_BOT)
     return 200
 
 @router.get("/iot/exception")
-async def dump_iot_data(data: str):
+async def dump_iot_data(data: str, trace: str | None = None):
     """
     Print string from iot bot to the client
 
     data: str
+    trace: str, trace id of the push that raised the exception
     """
-    
-    socket_io.user_exception_printer(data, IOT_BOT)
+    traces.mark(IOT_BOT, "first_exception", trace)
+    await socket_io.user_exception_printer(data, IOT_BOT)
 
 
 @router.get("/ros/dump")
-async def dump_ros_data(data: str):
+async def dump_ros_data(data: str, trace: str | None = None):
     """
     Print string from ros bot to the client
 
     data: str
+    trace: str, trace id of the push that produced the output
     """
-    
-    socket_io.user_dump_printer(data, ROS_BOT)
+    traces.mark(ROS_BOT, "first_output", trace)
+    await socket_io.user_dump_printer(data, ROS_BOT)
 
 @router.get("/ros/exception")
-async def dump_ros_data(data: str):
+async def dump_ros_data(data: str, trace: str | None = None):
     """
     Print string from ros bot to the client
 
     data: str
+    trace: str, trace id of the push that raised the exception
     """
-    
-    socket_io.user_exception_printer(data, ROS_BOT)
+    traces.mark(ROS_BOT, "first_exception", trace)
+    await socket_io.user_exception_printer(data, ROS_BOT)
@@ -0,0 +1,308 @@
+# Created On: 2026, Oct 19
+# Camera relay - each bot pushes JPEG frames over one websocket, the server fans the latest frame out to the viewers
+
+import asyncio
+import time
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, WebSocketException, status
+
+from .. import config
+from ..core import core, metrics, timeutils
+from ..core.logs import get_logger
+from ..core.schema import User
+from .bot_comms import IOT_BOT, ROS_BOT, from_bot
+from .pubsub import DatagramPeers
+
+log = get_logger(__name__)
+
+router = APIRouter()
+
+# JPEG start of image marker, anything else pushed upstream is dropped
+JPEG_SOI = b"\xff\xd8"
+
+# Largest frame forwarded to the other workers, a unix datagram socket buffers about 200 KiB
+MAX_FORWARDED_FRAME = 200 * 1024
+
+FRAMES = metrics.Counter(
+    "rero_camera_frames_total",
+    "Camera frames by bot and result (accepted / limited / invalid upstream, forwarded by another worker, "
+    "sent / skipped to viewers)",
+    ("bot", "result"),
+)
+FRAME_BYTES = metrics.Counter("rero_camera_bytes_total", "Camera bytes relayed by bot and direction", ("bot", "direction"))
+
+
+class Stream:
+    """
+    Camera of one bot: the latest frame, its sequence number & the upstream limits
+
+    Viewers all send the same bytes object, a viewer slower than the camera skips to the latest frame
+    """
+
+    def __init__(self, bot: str, max_fps: float, max_bitrate: float):
+        self.bot = bot
+        self.max_fps = max_fps
+        # Bytes per second
+        self.max_rate = max_bitrate / 8
+
+        self.frame: bytes = b""
+        self.seq = 0
+        self.updated = 0.0
+        # Set & replaced on every frame, viewers wait on the current one
+        self.arrived = asyncio.Event()
+        self.upstream: WebSocket | None = None
+        self.viewers = 0
+
+        # Token buckets of the limits, one second of burst
+        now = time.monotonic()
+        self.frame_tokens = max_fps
+        self.byte_tokens = self.max_rate
+        self.refilled = now
+
+    def admit(self, size: int, now: float) -> bool:
+        """Check a frame of `size` bytes fits the fps & bitrate limits, charge it if so"""
+        elapsed = now - self.refilled
+        self.refilled = now
+        self.frame_tokens = min(self.max_fps, self.frame_tokens + elapsed * self.max_fps)
+        self.byte_tokens = min(self.max_rate, self.byte_tokens + elapsed * self.max_rate)
+        if self.frame_tokens < 1 or self.byte_tokens < size:
+            return False
+        self.frame_tokens -= 1
+        self.byte_tokens -= size
+        return True
+
+    def publish(self, frame: bytes, forwarded: bool = False) -> bool:
+        """Make a frame the latest one, False when dropped by the limits (already applied to forwarded frames)"""
+        now = time.monotonic()
+        if not forwarded:
+            if not frame.startswith(JPEG_SOI):
+                FRAMES.inc(self.bot, "invalid")
+                return False
+            if not self.admit(len(frame), now):
+                FRAMES.inc(self.bot, "limited")
+                return False
+
+        self.frame = frame
+        self.seq += 1
+        self.updated = now
+        arrived, self.arrived = self.arrived, asyncio.Event()
+        arrived.set()
+
+        FRAMES.inc(self.bot, "forwarded" if forwarded else "accepted")
+        FRAME_BYTES.inc(self.bot, "in", amount=len(frame))
+        return True
+
+    async def next_frame(self, seq: int) -> tuple[int, bytes]:
+        """Latest frame newer than `seq`, waits for one if there is none"""
+        while self.seq <= seq:
+            await self.arrived.wait()
+        return self.seq, self.frame
+
+    def stats(self) -> dict:
+        return {
+            "bot": self.bot,
+            "upstream": self.upstream is not None,
+            "viewers": self.viewers,
+            "seq": self.seq,
+            "frame_bytes": len(self.frame),
+            "frame_age_s": round(time.monotonic() - self.updated, 3) if self.seq else None,
+            "max_fps": self.max_fps,
+            "max_bitrate": self.max_rate * 8,
+        }
+
+
+# bot -> stream
+streams: dict[str, Stream] = {
+    bot: Stream(bot, config.CAMERA_MAX_FPS, config.CAMERA_MAX_BITRATE) for bot in (ROS_BOT, IOT_BOT)
+}
+
+metrics.Gauge(
+    "rero_camera_viewers", "Camera viewers connected to this worker by bot", ("bot",),
+    callback=lambda: {(bot,): stream.viewers for bot, stream in streams.items()},
+)
+
+
+# Frames received by one worker are forwarded to the others (multi-worker server), None in a single process
+exchange: DatagramPeers | None = None
+_listener: asyncio.Task | None = None
+
+
+async def receive_forwarded():
+    """Publish the frames forwarded by the worker holding the upstream connection"""
+    while True:
+        bot, _, frame = (await exchange.recv(MAX_FORWARDED_FRAME + 16)).partition(b"\0")
+        stream = streams.get(bot.decode())
+        if stream is not None:
+            stream.publish(frame, forwarded=True)
+
+
+def start():
+    """Join the frame exchange of the workers, with the socket.io message queue between local workers"""
+    global exchange, _listener
+    if config.SOCKETIO_MESSAGE_QUEUE == "local" and exchange is None:
+        exchange = DatagramPeers("camera", config.SOCKETIO_GROUP)
+        exchange.bind()
+        _listener = asyncio.create_task(receive_forwarded())
+
+
+def close():
+    global exchange, _listener
+    if _listener is not None:
+        _listener.cancel()
+        _listener = None
+    if exchange is not None:
+        exchange.close()
+        exchange = None
+
+
+@router.websocket("/{bot}/camera")
+async def camera_upstream(websocket: WebSocket, bot: str):
+    """
+    Camera of a bot, one binary message per JPEG frame
+
+    Only the bot may connect (see bot_comms.from_bot), a new upstream connection replaces the previous one
+    """
+    stream = streams.get(bot)
+    if stream is None:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Bot not found")
+    if not await from_bot(bot, websocket):
+        log.warning("Camera upstream of %s refused from %s", bot, websocket.client.host if websocket.client else None)
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Not Authorized")
+    await websocket.accept()
+
+    previous, stream.upstream = stream.upstream, websocket
+    if previous is not None:
+        await previous.close(code=status.WS_1008_POLICY_VIOLATION, reason="Replaced by a new upstream")
+    log.info("Camera upstream of %s connected", bot)
+
+    header = bot.encode() + b"\0"
+    try:
+        while True:
+            frame = await websocket.receive_bytes()
+            if stream.publish(frame) and exchange is not None and len(frame) <= MAX_FORWARDED_FRAME:
+                # Scatter send, the frame is not copied into a message
+                exchange.send(header, frame)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        if stream.upstream is websocket:
+            stream.upstream = None
+        log.info("Camera upstream of %s disconnected", bot)
+
+
+async def viewer_access(bot: str, token: str | None) -> int | None:
+    """
+    Check the token of a viewer: the user holding the timeslot of the bot or an admin
+
+    return: end of the timeslot the viewer is limited to, None for admins
+    """
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not Authorized")
+
+    user = await core.get_current_user(token.removeprefix("Bearer "))
+    if user.username in core.admin_group:
+        return None
+
+    await core.get_current_active_user(user)
+    if user.bot != bot:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"No timeslot on the {bot} bot")
+    return user.end_time
+
+
+class Viewer:
+    """
+    A viewer connection, sends the latest frame whenever there is a new one
+
+    With a window, at most `window` frames are unacknowledged (any message from the viewer acks one): a viewer
+    slower than the camera then always gets the latest frame instead of the ones queued in the socket buffers
+    """
+
+    def __init__(self, websocket: WebSocket, stream: Stream, end_time: int | None, fps: float | None, window: int):
+        self.websocket = websocket
+        self.stream = stream
+        self.end_time = end_time
+        self.interval = 1 / fps if fps and fps > 0 else 0.0
+        self.window = max(0, window)
+        self.in_flight = 0
+        self.acked = asyncio.Event()
+
+    async def send_frames(self):
+        stream = self.stream
+        # A frame under a second old is sent right away, an older one would be a frozen picture
+        seq = stream.seq - 1 if stream.seq and time.monotonic() - stream.updated < 1 else stream.seq
+        try:
+            while self.end_time is None or timeutils.now() <= self.end_time:
+                if self.window and self.in_flight >= self.window:
+                    # A viewer that stopped acking still gets closed at the end of the timeslot
+                    self.acked.clear()
+                    try:
+                        await asyncio.wait_for(self.acked.wait(), 1)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                try:
+                    latest, frame = await asyncio.wait_for(stream.next_frame(seq), 1)
+                except asyncio.TimeoutError:
+                    # No frame, check the timeslot again
+                    continue
+                if latest - seq > 1:
+                    FRAMES.inc(stream.bot, "skipped", amount=latest - seq - 1)
+                seq = latest
+
+                # Same bytes object for every viewer, no copy
+                await self.websocket.send_bytes(frame)
+                self.in_flight += 1
+                FRAMES.inc(stream.bot, "sent")
+                FRAME_BYTES.inc(stream.bot, "out", amount=len(frame))
+
+                if self.interval:
+                    await asyncio.sleep(self.interval)
+            await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Timeslot over")
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+    async def receive_acks(self):
+        """Returns when the viewer goes away"""
+        while (await self.websocket.receive())["type"] != "websocket.disconnect":
+            self.in_flight = max(0, self.in_flight - 1)
+            self.acked.set()
+
+
+@router.websocket("/bot/{bot}/camera")
+async def camera_viewer(
+    websocket: WebSocket, bot: str, token: str | None = None, fps: float | None = None, window: int = 0
+):
+    """
+    Watch the camera of a bot, one binary message per JPEG frame
+
+    token: access token, as a query parameter since browsers cannot set headers on a websocket
+    fps: optional cap below the camera rate, e.g. for a slow link
+    window: frames sent before waiting for an ack (any message), 0 leaves the pacing to the socket buffers
+    """
+    stream = streams.get(bot)
+    if stream is None:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Bot not found")
+    try:
+        end_time = await viewer_access(bot, token or websocket.headers.get("authorization"))
+    except HTTPException as error:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=str(error.detail))
+
+    await websocket.accept()
+    stream.viewers += 1
+    viewer = Viewer(websocket, stream, end_time, fps, window)
+    sender = asyncio.create_task(viewer.send_frames())
+    receiver = asyncio.create_task(viewer.receive_acks())
+    try:
+        await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        stream.viewers -= 1
+
+
+@router.get("/camera")
+async def camera_streams(current_user: Annotated[User, Depends(core.admin_plus)]) -> list[dict]:
+    """Camera streams of this worker: upstream connected, viewers, latest frame"""
+    return [stream.stats() for stream in streams.values()]
@@ -3,13 +3,14 @@
 # Communication from the user to the bot handled by the server
 
 import asyncio
+import os
 from typing import Annotated
 
-import requests
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, Response, status, UploadFile
 
 from datetime import datetime, timedelta, timezone
 
+from .. import config
 from ..database import operations as ds
 from ..core.schema import Token, TokenData, User, UserInDB
 
@@ -17,58 +18,92 @@ from ..core.core import get_current_active_user, iot_bot_access, ros_bot_access
 
 from ..communication import bot_comms as bc
 from ..communication import code_comms as cc
+from ..communication import prewarm, tracing
 from ..communication.check_imports import check_imports
-import httpx
+from ..core import audit
+from ..core.logs import get_logger
+
+log = get_logger(__name__)
 
 router = APIRouter(prefix="/bot")
 
+# Intentionally changing the file extension to ensure no accidental runs
+IOT_CODE_PATH: str = os.path.join(config.CODE_DIR, "iot", "iot_bot.code")
+ROS_CODE_PATH: str = os.path.join(config.CODE_DIR, "ros", "ros_bot.code")
 
-@router.post(
-    "/iot/code",
-    responses={
-        200: {"description": "Code pushed successfully"},
-        400: {"description": "Invalid imports, ensure code has no import statements"},
-        500: {"description": "Internal Server Error"},
-    },
-)
-async def push_code(
-    current_user: Annotated[User, Depends(iot_bot_access)], file: UploadFile
+
+async def upload_code(
+    bot: str, bot_ip: str, file_path: str, current_user: User, file: UploadFile, response: Response
 ) -> bool:
     """
-    Function to save the code to a temp folder. Code that is sent by the user.
-    The sent code needs to be dumped into the IoT Bot
+    Save the uploaded code, check its imports & push it to the bot
+
+    Every step is recorded on a trace, its id goes along to the bot & back to the user in the X-Trace-Id header
     """
+    trace = tracing.traces.begin(bot, current_user.username)
+    trace.slot_first = prewarm.first_push(bot, current_user)
+    response.headers[tracing.TRACE_HEADER] = trace.id
     try:
-        # Intentionally changing the file extension to ensure no accidental runs
-        file_path: str = f"/tmp/iot/iot_bot.code"
         with open(file_path, "wb") as f:
             f.write(await file.read())
+        trace.mark("received")
 
-        imports: list = check_imports("/tmp/iot/iot_bot.code")
+        imports: list = check_imports(file_path)
 
-        print(imports)
+        log.debug("Imports found %s", imports, extra={"trace_id": trace.id})
 
         if len(imports) > 0:
+            trace.outcome = "invalid_imports"
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid imports: {imports}",
             )
 
+        trace.mark("validated")
+        tracing.traces.activate(trace)
+
+        # Off the event loop, the push blocks until the bot answers
+        if await asyncio.to_thread(bc.push_code, bot_ip, file_path, trace.id):
+            trace.mark("bot_ack")
+            trace.outcome = "pushed"
         else:
-            bc.push_code(bc.IP_IOT_BOT, "/tmp/iot/iot_bot.code")
+            trace.outcome = "bot_error"
 
-            return True
+        return True
 
     except HTTPException as e:
         raise e
 
     except Exception as e:
+
+        trace.outcome = "error"
+        log.exception("Code push failed - %s", e, extra={"trace_id": trace.id})
+
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e),
         )
 
-    return False
+    finally:
+        audit.record("code_push", current_user.username, bot, trace_id=trace.id, outcome=trace.outcome)
+
+
+@router.post(
+    "/iot/code",
+    responses={
+        200: {"description": "Code pushed successfully"},
+        400: {"description": "Invalid imports, ensure code has no import statements"},
+        500: {"description": "Internal Server Error"},
+    },
+)
+async def push_code(
+    current_user: Annotated[User, Depends(iot_bot_access)], file: UploadFile, response: Response
+) -> bool:
+    """
+    Function to save the code to a temp folder. Code that is sent by the user.
+    The sent code needs to be dumped into the IoT Bot
+    """
+    return await upload_code(bc.IOT_BOT, bc.IP_IOT_BOT, IOT_CODE_PATH, current_user, file, response)
 
 
 @router.get(
@@ -86,7 +121,8 @@ async def stop_iot_bot(
     # TODO: Implement stop message over socket stream
     # return True
 
-    result = await asyncio.to_thread(requests.get, "http://" + bc.IP_IOT_BOT + "/stop_code")
+    audit.record("stop", current_user.username, bc.IOT_BOT)
+    result = await asyncio.to_thread(bc.stop_code, bc.IP_IOT_BOT)
 
 
 @router.post(
@@ -98,46 +134,13 @@ async def stop_iot_bot(
     },
 )
 async def push_code(
-    current_user: Annotated[User, Depends(ros_bot_access)], file: UploadFile
+    current_user: Annotated[User, Depends(ros_bot_access)], file: UploadFile, response: Response
 ) -> bool:
     """
     Function to save the code to a temp folder. Code that is sent by the user.
     The sent code needs to be dumped into the ROS Bot
     """
-    try:
-        # Intentionally changing the file extension to ensure no accidental runs
-        file_path: str = f"/tmp/ros/ros_bot.code"
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-
-        imports: list = check_imports("/tmp/ros/ros_bot.code")
-
-        print(imports)
-
-        if len(imports) > 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid imports: {imports}",
-            )
-
-        else:
-            bc.push_code(bc.IP_ROS_BOT, "/tmp/ros/ros_bot.code")
-
-            return True
-
-    except HTTPException as e:
-        raise e
-
-    except Exception as e:
-
-        print(e)
-
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e),
-        )
-
-    # return False
+    return await upload_code(bc.ROS_BOT, bc.IP_ROS_BOT, ROS_CODE_PATH, current_user, file, response)
 
 
 @router.get(
@@ -153,4 +156,5 @@ async def stop_ros_bot(
 ) -> bool:
     """Emergency stop for the ROS Bot"""
     # TODO: Implement stop message over socket stream
+    audit.record("stop", current_user.username, bc.ROS_BOT)
     return True
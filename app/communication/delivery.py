@@ -0,0 +1,202 @@
+# Created On: 2026, Oct 19
+# Reliable bot output - sequence numbered records, cumulative acks, duplicate drop & send credit for the bots
+#
+# The bot numbers the lines of each program run (session) from 1 and posts them in batches to /<bot>/output.
+# Each answer acks every record up to `ack` and grants `credit` records past it, the bot keeps the unacked records
+# and sends again from ack + 1 after a failure (go-back-N): nothing is lost, repeats are dropped here
+
+import asyncio
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+import orjson
+from fastapi import APIRouter, HTTPException, Request, status
+
+from .. import config
+from ..core import metrics
+from ..core.admission import admission
+from ..core.logs import get_logger, sampled
+from . import output_frames as frames
+from . import socket_io
+from .bot_comms import IOT_BOT, ROS_BOT, require_bot
+from .tracing import traces
+
+log = get_logger(__name__)
+
+dump_log = sampled(__name__ + ".output")
+
+router = APIRouter()
+
+RECORDS = metrics.Counter(
+    "rero_output_records_total",
+    "Reliable output records by bot and result (delivered / duplicate / gap / out_of_window)",
+    ("bot", "result"),
+)
+CREDIT = metrics.Gauge("rero_output_credit", "Send credit last granted to each bot", ("bot",))
+
+# session, last delivered sequence, last reserved sequence, reserved at (monotonic), retired sessions written
+_CURSOR = struct.Struct("<QQQdQ")
+# Sessions replaced by a newer program run, a ring after the cursor
+RETIRED = 256
+_RETIRED = struct.Struct(f"<{RETIRED}Q")
+
+# A reservation older than this (seconds) belongs to a worker which failed while sending, it is taken over
+RESERVATION_TIMEOUT = 5.0
+
+
+class Cursor:
+    """
+    (session, last delivered sequence) of a bot in RUN_DIR/rero-output-<bot>.cursor, shared by the workers
+
+    A retry reaching another worker still finds its records delivered. Records are reserved before they are sent
+    to the clients and count as delivered once sent, a retry arriving meanwhile is answered with the previous ack
+    """
+
+    def __init__(self, bot: str):
+        self.path = os.path.join(config.RUN_DIR, f"rero-output-{bot}.cursor")
+        self._fd: int | None = None
+        self._map: mmap.mmap | None = None
+
+    def _open(self) -> mmap.mmap:
+        size = _CURSOR.size + _RETIRED.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        return self._map
+
+    def reserve(
+        self, session: int, first: int, count: int, window: int, now: float
+    ) -> tuple[int, int, int] | None:
+        """
+        Reserve the records first .. first + count - 1 of the session, at most `window` past the last delivered one
+
+        return: (index of the first new record in the batch, negative after a gap, number of records reserved, last
+        delivered sequence), None for a session replaced by a newer one
+        """
+        cursor = self._map or self._open()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            current, acked, reserved, reserved_at, retired = _CURSOR.unpack_from(cursor)
+            if current != session:
+                # A new program run starts at 1, a late retry of a replaced run (even of its first batch) is refused
+                if first != 1 or session in _RETIRED.unpack_from(cursor, _CURSOR.size):
+                    return None
+                if current:
+                    struct.pack_into("<Q", cursor, _CURSOR.size + retired % RETIRED * 8, current)
+                    retired += 1
+                current, acked, reserved = session, 0, 0
+            elif reserved > acked and now - reserved_at < RESERVATION_TIMEOUT:
+                # Being sent by another request, the bot sends again from the ack it gets
+                return acked + 1 - first, 0, acked
+            # Records up to acked were delivered, a batch starting past acked + 1 follows a lost one
+            skip = acked + 1 - first
+            new = max(0, min(count - skip, window)) if skip >= 0 else 0
+            _CURSOR.pack_into(cursor, 0, current, acked, acked + new, now, retired)
+            return skip, new, acked
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def settle(self, session: int, delivered: int):
+        """Records up to `delivered` were sent, the rest of the reservation is released"""
+        cursor = self._map
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            current, acked, reserved, reserved_at, retired = _CURSOR.unpack_from(cursor)
+            if current == session and delivered >= acked:
+                _CURSOR.pack_into(cursor, 0, current, delivered, delivered, reserved_at, retired)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+cursors = {bot: Cursor(bot) for bot in (IOT_BOT, ROS_BOT)}
+
+# Records of a bot go out to the clients in order, batches posted back to back wait for the previous one
+_locks = {bot: asyncio.Lock() for bot in cursors}
+
+
+def session_key(session: str) -> int:
+    return int.from_bytes(hashlib.blake2b(session.encode(), digest_size=8).digest(), "little")
+
+
+def credit() -> int:
+    """
+    Records a bot may send past its ack: the window, less as the clients fall behind
+    (packets queued per socket.io client) and while bot output requests queue for admission
+    """
+    backlog = socket_io.output_buffer_depth() / max(1, len(socket_io.connected))
+    free = max(0.0, 1 - backlog / config.OUTPUT_MAX_BACKLOG) / (1 + len(admission.classes["ingest"].waiters))
+    return max(1, int(config.OUTPUT_WINDOW * free))
+
+
+def parse_batch(body: bytes) -> tuple[str, list, str | None]:
+    """(session, records, trace) of a posted batch, consecutive [seq, type, text] records"""
+    try:
+        batch = orjson.loads(body)
+        session, records = batch["session"], batch["records"]
+        trace = batch.get("trace")
+        if not isinstance(session, str) or not session or not isinstance(records, list) or not records:
+            raise ValueError
+        first = records[0][0]
+        if not isinstance(first, int) or first < 1:
+            raise ValueError
+        for offset, (seq, kind, text) in enumerate(records):
+            if seq != first + offset or kind not in frames.TYPES or not isinstance(text, str):
+                raise ValueError
+    except (orjson.JSONDecodeError, KeyError, TypeError, ValueError, AttributeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Expected {"session": str, "records": [[seq, "info" | "error", text], ...]} with consecutive seq',
+        )
+    return session, records, trace
+
+
+@router.post("/{bot}/output")
+async def post_output(bot: str, request: Request) -> dict:
+    """
+    Output of the program running on the bot: {"session": run id, "records": [[seq, type, text], ...], "trace": id}
+
+    return: {"ack": every record up to it is delivered, "credit": records the bot may send past the ack}.
+    Records at or below the last ack are dropped as repeats; a batch starting past ack + 1 is not taken.
+    409: a newer run of the bot (a batch of another session starting at 1) replaced this one.
+    Only the bot may post (see bot_comms.from_bot)
+    """
+    cursor = cursors.get(bot)
+    if cursor is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bot not found")
+    await require_bot(bot, request)
+    session, records, trace = parse_batch(await request.body())
+
+    key = session_key(session)
+    async with _locks[bot]:
+        taken = cursor.reserve(key, records[0][0], len(records), config.OUTPUT_WINDOW, time.monotonic())
+        if taken is None:
+            log.info("Output batch of a replaced %s program run refused", bot)
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Session replaced by a newer program run")
+        skip, new, acked = taken
+        if new:
+            traces.mark(bot, "first_output", trace)
+            dump_log.debug("Bot output", bot=bot)
+            # Only the records actually sent are acked, the bot sends the others again
+            try:
+                for seq, kind, text in records[skip:skip + new]:
+                    await socket_io.output(text, bot, kind, seq)
+                    acked = seq
+            finally:
+                cursor.settle(key, acked)
+
+    if skip < 0:
+        RECORDS.inc(bot, "gap", amount=len(records))
+    else:
+        RECORDS.inc(bot, "delivered", amount=new)
+        RECORDS.inc(bot, "duplicate", amount=min(skip, len(records)))
+        RECORDS.inc(bot, "out_of_window", amount=max(0, len(records) - skip - new))
+
+    granted = credit()
+    CREDIT.set(granted, bot)
+    return {"ack": acked, "credit": granted}
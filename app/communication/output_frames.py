@@ -0,0 +1,58 @@
+# Created On: 2026, Oct 19
+# Compact bot output frames - batches of output records packed with integer codes, for the clients that ask for them
+#
+# Frame: version u8, flags u8, record count u16, then the records (zlib deflated as a whole if flags & FLAG_ZLIB)
+# Record: stream u8, type u8, sequence u32, length u32, UTF-8 text. Little endian
+
+import struct
+import zlib
+
+VERSION = 1
+
+# Frame flags
+FLAG_ZLIB = 0x01
+
+# Integer codes of the bots (streams) & output types, sent to the client when it negotiates the format
+STREAMS = {"iot": 0, "ros": 1}
+TYPES = {"info": 0, "error": 1}
+
+HEADER = struct.Struct("<BBH")
+RECORD = struct.Struct("<BBII")
+
+# Most records per frame, the count is a u16
+MAX_RECORDS = 0xFFFF
+
+
+def encode(records: list[tuple[int, int, int, bytes]], compress_min: int = 0) -> bytes:
+    """
+    Frame of (stream, type, sequence, text) records
+
+    compress_min: records of at least this many bytes are deflated when that makes them smaller, 0 never
+    """
+    pack = RECORD.pack
+    body = b"".join(pack(stream, kind, seq, len(text)) + text for stream, kind, seq, text in records)
+    flags = 0
+    if compress_min and len(body) >= compress_min:
+        # Level 1: most of the gain on repetitive output, a fraction of the CPU of the default level
+        deflated = zlib.compress(body, 1)
+        if len(deflated) < len(body):
+            body, flags = deflated, FLAG_ZLIB
+    return HEADER.pack(VERSION, flags, len(records)) + body
+
+
+def decode(frame: bytes) -> list[tuple[int, int, int, str]]:
+    """(stream, type, sequence, text) records of a frame, raises ValueError on a frame of another version"""
+    version, flags, count = HEADER.unpack_from(frame)
+    if version != VERSION:
+        raise ValueError(f"Unsupported output frame version {version}")
+    body = frame[HEADER.size:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+
+    records, offset = [], 0
+    for _ in range(count):
+        stream, kind, seq, length = RECORD.unpack_from(body, offset)
+        offset += RECORD.size
+        records.append((stream, kind, seq, body[offset:offset + length].decode()))
+        offset += length
+    return records
@@ -0,0 +1,205 @@
+# Created On: 2026, Oct 19
+# Pre-warming - bots are checked & reset before a timeslot starts, so the first push of the slot runs on a warm path
+
+import asyncio
+import fcntl
+import os
+import time
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from .. import config
+from ..core import core, metrics, timeutils
+from ..core.logs import get_logger
+from ..core.schema import User
+from ..timeslot import availability, timeslot_manager
+from . import bot_comms as bc
+
+log = get_logger(__name__)
+
+router = APIRouter(prefix="/prewarm")
+
+# The calendars are checked for new timeslots at least this often (seconds)
+REFRESH = 1.0
+
+PREWARM_SECONDS = metrics.Histogram(
+    "rero_prewarm_step_seconds", "Time of each pre-warm step before a timeslot (health_check, stop)", ("bot", "step")
+)
+PREWARMS = metrics.Counter(
+    "rero_prewarm_total", "Timeslots pre-warmed by bot and result (ready / unhealthy / error)", ("bot", "result")
+)
+
+ADDRESSES = {bc.ROS_BOT: bc.IP_ROS_BOT, bc.IOT_BOT: bc.IP_IOT_BOT}
+
+
+class Slot:
+    """Pre-warm state of the next timeslot of a bot"""
+
+    __slots__ = ("username", "start", "result", "steps", "task")
+
+    def __init__(self, username: str, start: int):
+        self.username = username
+        self.start = start
+        self.result: str | None = None
+        # step -> seconds
+        self.steps: dict[str, float] = {}
+        self.task: asyncio.Task | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "username": self.username,
+            "timeslot_start": self.start,
+            "result": self.result,
+            "steps_ms": {step: round(seconds * 1e3, 3) for step, seconds in self.steps.items()},
+        }
+
+
+# bot -> timeslot being / last pre-warmed by this worker
+slots: dict[str, Slot] = {}
+
+# bot -> (username, timeslot start) of the last first push seen by this worker
+_first_pushes: dict[str, tuple[str, int]] = {}
+_task: asyncio.Task | None = None
+
+
+def claim(bot: str, start: int) -> bool:
+    """
+    True for the one worker that resets the bot for the timeslot starting at `start`
+
+    RUN_DIR/rero-prewarm-<bot> holds the start of the last claimed timeslot, read & written under a lock
+    """
+    fd = os.open(os.path.join(config.RUN_DIR, f"rero-prewarm-{bot}"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        claimed = os.read(fd, 32).decode() or "0"
+        if int(claimed) >= start:
+            return False
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(start).encode())
+        return True
+    finally:
+        os.close(fd)
+
+
+async def step(slot: Slot, bot: str, name: str, call, *args):
+    """Run a blocking bot call off the event loop, record its time"""
+    begin = time.perf_counter()
+    try:
+        return await asyncio.to_thread(call, *args)
+    finally:
+        slot.steps[name] = seconds = time.perf_counter() - begin
+        PREWARM_SECONDS.observe(seconds, bot, name)
+
+
+async def prewarm(bot: str, slot: Slot, previous_end: int | None):
+    """
+    RERO_PREWARM_LEAD seconds before the slot: health check, which also opens the pooled connection of this worker.
+    Once the bot is free (now, or when the previous timeslot ends): one worker stops the program left running,
+    then every worker checks the bot again so its connection is fresh for the first push
+    """
+    address = ADDRESSES[bot]
+    try:
+        await step(slot, bot, "health_check", bc.health_check, address)
+
+        if previous_end is not None:
+            # Never cut the timeslot before
+            await asyncio.sleep(max(0.0, previous_end - time.time()))
+        if claim(bot, slot.start):
+            response = await step(slot, bot, "stop", bc.stop_code, address)
+            response.raise_for_status()
+
+        await asyncio.sleep(max(0.0, slot.start - time.time()))
+        await step(slot, bot, "ready_check", bc.health_check, address)
+        slot.result = "ready"
+    except asyncio.CancelledError:
+        raise
+    except Exception as error:
+        slot.result = "unhealthy"
+        log.warning("Pre-warm of %s before the slot of %s failed - %s", bot, slot.username, error)
+    PREWARMS.inc(bot, slot.result)
+    if slot.result == "ready":
+        log.info("Bot %s ready for the slot of %s", bot, slot.username, extra={"username": slot.username})
+
+
+def next_slot(bot: str, now: int) -> tuple[str, int, int | None] | None:
+    """(username, start, end of the timeslot running until then) of the next timeslot of the bot"""
+    bookings = availability.calendars[bot].bookings
+    upcoming = None
+    for username, (start, end) in bookings.items():
+        if start > now and (upcoming is None or start < upcoming[1]):
+            upcoming = (username, start)
+    if upcoming is None:
+        return None
+
+    # Latest end before the slot among the timeslots still running
+    previous_end = max((end for start, end in bookings.values() if start <= now < end), default=None)
+    return (*upcoming, previous_end)
+
+
+async def run():
+    """Start the pre-warm of each bot RERO_PREWARM_LEAD seconds before its next timeslot"""
+    while True:
+        now = timeutils.now()
+        wakeup = REFRESH
+        try:
+            await timeslot_manager.refresh_calendars()
+            for bot in ADDRESSES:
+                upcoming = next_slot(bot, now)
+                if upcoming is None:
+                    continue
+                username, start, previous_end = upcoming
+                slot = slots.get(bot)
+                if slot is not None and slot.start == start and slot.username == username:
+                    continue
+
+                lead = start - config.PREWARM_LEAD - time.time()
+                if lead > 0:
+                    wakeup = min(wakeup, lead)
+                    continue
+                if slot is not None and slot.task is not None:
+                    # Timeslot moved or reassigned
+                    slot.task.cancel()
+                slots[bot] = slot = Slot(username, start)
+                slot.task = asyncio.create_task(prewarm(bot, slot, previous_end))
+        except Exception:
+            log.exception("Pre-warm scheduling failed")
+        await asyncio.sleep(wakeup)
+
+
+def first_push(bot: str, user: User) -> str | None:
+    """
+    For the first push of the user's timeslot: "yes" / "no" the bot was pre-warmed for it, None for the later pushes
+
+    Per worker, a first push on each worker counts
+    """
+    key = (user.username, user.start_time)
+    if _first_pushes.get(bot) == key:
+        return None
+    _first_pushes[bot] = key
+    slot = slots.get(bot)
+    warmed = slot is not None and (slot.username, slot.start) == key and slot.result == "ready"
+    return "yes" if warmed else "no"
+
+
+def start():
+    global _task
+    if config.PREWARM_LEAD > 0 and _task is None:
+        _task = asyncio.create_task(run())
+
+
+def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+    for slot in slots.values():
+        if slot.task is not None:
+            slot.task.cancel()
+
+
+@router.get("")
+async def prewarm_state(current_user: Annotated[User, Depends(core.admin_plus)]) -> dict:
+    """Next / last timeslot pre-warmed by this worker per bot, with the time of each step"""
+    return {bot: slot.to_dict() for bot, slot in slots.items()}
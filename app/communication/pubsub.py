@@ -0,0 +1,142 @@
+# Created On: 2026, Oct 19
+# Messages between the workers of one host over unix datagram sockets (socket.io queue, camera frames), no broker needed
+
+import asyncio
+import base64
+import errno
+import glob
+import json
+import os
+import socket
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from .. import config
+from ..core.logs import get_logger
+
+log = get_logger(__name__)
+
+# Largest message forwarded to the other workers, bigger emits reach the local clients only
+MAX_MESSAGE = 200 * 1024
+
+# Binary payloads (compact output frames) cross as {BYTES_KEY: base64} objects
+BYTES_KEY = "__rero_bytes__"
+
+
+def _bytes_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {BYTES_KEY: base64.b64encode(value).decode()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _bytes_hook(value: dict):
+    if len(value) == 1 and BYTES_KEY in value:
+        return base64.b64decode(value[BYTES_KEY])
+    return value
+
+
+class DatagramPeers:
+    """
+    Unix datagram socket of this worker (RUN_DIR/rero-<kind>-<group>-<pid>.sock) & the sockets of the other workers
+
+    Sends are non blocking, a worker too busy to drain its socket loses messages rather than slowing the sender
+    """
+
+    def __init__(self, kind: str, group: str):
+        self.pattern = os.path.join(config.RUN_DIR, f"rero-{kind}-{group}-*.sock")
+        self.path = os.path.join(config.RUN_DIR, f"rero-{kind}-{group}-{os.getpid()}.sock")
+        self.sock: socket.socket | None = None
+        self.peers: list[str] = []
+        # mtime of RUN_DIR when the peers were listed, a worker binding or leaving changes it
+        self.peers_mtime = 0
+        self.dropped = 0
+
+    def bind(self) -> socket.socket:
+        """Socket of this worker, bound at startup so the others know about it before its first message"""
+        if self.sock is None:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(self.path)
+            os.chmod(self.path, 0o600)
+            sock.setblocking(False)
+            self.sock = sock
+        return self.sock
+
+    def _peers(self) -> list[str]:
+        mtime = os.stat(config.RUN_DIR).st_mtime_ns
+        if mtime != self.peers_mtime:
+            self.peers = [path for path in glob.glob(self.pattern) if path != self.path]
+            self.peers_mtime = mtime
+        return self.peers
+
+    def send(self, *buffers):
+        """Send one datagram made of the buffers (no join) to every other worker"""
+        sock = self.bind()
+        for peer in self._peers():
+            try:
+                sock.sendmsg(buffers, (), 0, peer)
+            except (BlockingIOError, InterruptedError):
+                self.dropped += 1
+            except OSError as error:
+                # Socket of a worker that exited
+                if error.errno in (errno.ECONNREFUSED, errno.ENOENT):
+                    self.peers_mtime = 0
+                else:
+                    log.warning("Datagram to %s failed - %s", peer, error)
+
+    async def recv(self, size: int) -> bytes:
+        return await asyncio.get_running_loop().sock_recv(self.bind(), size)
+
+    def close(self):
+        """Remove the socket of this worker"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+class LocalPubSubManager(AsyncPubSubManager):
+    """Every worker binds RUN_DIR/rero-sio-<group>-<pid>.sock and sends each message to the sockets of the others"""
+
+    name = "rerolocal"
+
+    def __init__(self, group: str, channel: str = "socketio", write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.peers = DatagramPeers("sio", group)
+
+    def bind(self) -> socket.socket:
+        return self.peers.bind()
+
+    async def _publish(self, data):
+        message = json.dumps(data, separators=(",", ":"), default=_bytes_default).encode()
+        if len(message) > MAX_MESSAGE:
+            log.warning("socket.io message of %d bytes not forwarded to the other workers", len(message))
+            return
+        self.peers.send(message)
+
+    async def _listen(self):
+        while True:
+            message = await self.peers.recv(MAX_MESSAGE)
+            try:
+                yield json.loads(message, object_hook=_bytes_hook)
+            except ValueError:
+                log.warning("Unreadable socket.io message of %d bytes from a worker", len(message))
+
+    def close(self):
+        self.peers.close()
+
+
+def client_manager():
+    """Manager for config.SOCKETIO_MESSAGE_QUEUE: None (single process), "local" or a redis:// URL"""
+    queue = config.SOCKETIO_MESSAGE_QUEUE
+    if not queue:
+        return None
+    if queue == "local":
+        return LocalPubSubManager(config.SOCKETIO_GROUP)
+    if queue.startswith(("redis://", "rediss://")):
+        # Needs the redis package, only installed for cross-host deployments
+        return socketio.AsyncRedisManager(queue)
+    raise ValueError(f"Unsupported RERO_SOCKETIO_MESSAGE_QUEUE {queue!r}")
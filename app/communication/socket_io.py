@@ -2,20 +2,63 @@
 # Created on: 2024, Oct 18
 # Socket communication to-from the front-end for user-code exception & print
 
-from ..database.operations import get_jwt
+import asyncio
+import time
+
+from .. import config
+from ..core import sessions
+from ..core import metrics
+from ..core import audit
+from ..core.epoch import SharedEpoch
+from ..core.logs import get_logger
 from ..core.core import admin_group
-from ..core.core import SECRET_KEY, ALGORITHM
+from ..core.core import secret_key, ALGORITHM, QUEUE_SCOPE
+from . import output_frames as frames
+from . import pubsub
+from .pubsub import LocalPubSubManager, client_manager
 
 import socketio
 import jwt
 
 
+log = get_logger(__name__)
+
 # SocketIO Server Instance
 # Allow CORS for all origins for communication between the user & back-end directly
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="https://rerolab.com")
+# Emits reach the clients of the other workers through the client manager (message queue)
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    cors_allowed_origins="https://rerolab.com",
+    client_manager=client_manager(),
+    transports=config.SOCKETIO_TRANSPORTS,
+)
 
 socket_app = socketio.ASGIApp(sio)
 
+# Session ids of the authenticated clients
+connected: set[str] = set()
+
+# Room of the clients with a session (not the waiting queue), they also get bot output in one of OUTPUT_ROOMS
+ACTIVE_ROOM = "active"
+
+# Bot output rooms of the clients by format (output_format event): "print" JSON events, the default,
+# or "output" binary frames batching the records (see output_frames)
+OUTPUT_ROOMS = {"json": "output:json", "binary": "output:binary"}
+
+# Records (stream, type, sequence, text) of the next binary frame & their text bytes, per bot sequence numbers of
+# this worker (the numbers of /<bot>/dump lines are not ordered across workers)
+_batch: list = []
+_batch_bytes = 0
+_sequences: dict[str, int] = {}
+_binary_clients: set[str] = set()
+# Binary clients of all the workers of this server, a worker only frames output when some client wants it
+_binary_total = SharedEpoch(f"output-binary-{config.SOCKETIO_GROUP}")
+
+# Text bytes per frame, a frame must fit a message to the other workers once base64 encoded in JSON
+FRAME_MAX_BYTES = min(config.OUTPUT_BATCH_MAX_BYTES, pubsub.MAX_MESSAGE * 3 // 4 - 4096)
+_batch_pending: asyncio.Event | None = None
+_batch_task: asyncio.Task | None = None
+
 # SocketIO Event Handlers
 @sio.event
 async def connect(sid, environ):
@@ -30,37 +73,212 @@ async def connect(sid, environ):
 
     try:
 
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, secret_key(), algorithms=[ALGORITHM])
         username: str = payload.get("sub")
 
 
         # Check username registered
         if username is None:
             await sio.emit("Error: Username field NULL", sid=sid)
-            print("Username is none")
+            log.info("Socket connect without username")
             raise Exception
 
+        # Waiting queue token, the client may only join the queue (see waiting.py)
+        elif payload.get("scope") == QUEUE_SCOPE:
+            await sio.save_session(sid, {"username": username, "scope": QUEUE_SCOPE})
+
         # Check JWT Token
-        elif (username not in admin_group) and (get_jwt(username)[0] != token):
+        elif (username not in admin_group) and not sessions.is_current(
+            username, payload.get(sessions.SESSION_CLAIM)
+        ):
             await sio.emit("Error: Invalid JWT token", sid=sid)
             raise Exception
 
     except Exception as e:
-        print(e)
-        await sio.emit("message", {"error": str(e)})
+        log.info("Socket connect rejected - %s", e)
+        await sio.emit("message", {"error": str(e)}, to=sid)
         await sio.disconnect(sid)
         return
     
     # Successful connect
-    print("Client connected", sid)
-    await sio.emit("message", "Connected")
+    log.debug("Client connected %s", sid, extra={"username": username})
+    connected.add(sid)
+    if payload.get("scope") != QUEUE_SCOPE:
+        # The session version is checked again by long-lived sessions (teleoperation)
+        await sio.save_session(sid, {"username": username, "version": payload.get(sessions.SESSION_CLAIM)})
+        await sio.enter_room(sid, ACTIVE_ROOM)
+        await sio.enter_room(sid, OUTPUT_ROOMS["json"])
+    metrics.SOCKETIO_CLIENTS.set(len(connected))
+    audit.record("socket_connect", username, sid=sid, scope=payload.get("scope"))
+    await sio.emit("message", "Connected", to=sid)
+    metrics.SOCKETIO_EMITS.inc("message")
+
+
+@sio.event
+async def disconnect(sid):
+    """Client onDisconnect for websocket"""
+    connected.discard(sid)
+    if sid in _binary_clients:
+        _binary_clients.discard(sid)
+        _binary_total.bump(-1)
+    metrics.SOCKETIO_CLIENTS.set(len(connected))
+    for hook in disconnect_hooks:
+        try:
+            await hook(sid)
+        except Exception:
+            log.exception("Disconnect hook %s failed", hook.__qualname__)
+
+
+# Coroutines called with the sid of every client leaving, for the features keeping per client state
+disconnect_hooks: list = []
+
+
+@sio.on("output_format")
+async def output_format(sid, data=None):
+    """
+    Choose how bot output is sent: {"format": "json"} one "print" event per line (the default),
+    {"format": "binary"} "output" events carrying frames of records, see output_frames
+    """
+    output = data.get("format") if isinstance(data, dict) else None
+    if output not in OUTPUT_ROOMS:
+        return {"error": f"Unknown format, expected one of {list(OUTPUT_ROOMS)}"}
+    session = await sio.get_session(sid)
+    if not session.get("username") or session.get("scope") == QUEUE_SCOPE:
+        return {"error": "Not Authorized"}
+
+    for name, room in OUTPUT_ROOMS.items():
+        if name == output:
+            await sio.enter_room(sid, room)
+        else:
+            await sio.leave_room(sid, room)
+
+    if output == "json":
+        if sid in _binary_clients:
+            _binary_clients.discard(sid)
+            _binary_total.bump(-1)
+        return {"format": output}
+    if sid not in _binary_clients:
+        _binary_clients.add(sid)
+        _binary_total.bump()
+    return {
+        "format": output,
+        "version": frames.VERSION,
+        "streams": frames.STREAMS,
+        "types": frames.TYPES,
+        "batch_interval_ms": round(config.OUTPUT_BATCH_INTERVAL * 1e3),
+    }
+
+
+async def flush_output():
+    """Send the batched records as one frame to the binary clients"""
+    global _batch, _batch_bytes
+    if not _batch:
+        return
+    records, _batch, _batch_bytes = _batch, [], 0
+    await sio.emit("output", frames.encode(records, config.OUTPUT_COMPRESS_MIN), room=OUTPUT_ROOMS["binary"])
+    metrics.SOCKETIO_EMITS.inc("output")
+
+
+async def run_output():
+    """Frame the records gathered over RERO_OUTPUT_BATCH_INTERVAL after the first one, no wakeups while idle"""
+    while True:
+        await _batch_pending.wait()
+        await asyncio.sleep(config.OUTPUT_BATCH_INTERVAL)
+        _batch_pending.clear()
+        try:
+            await flush_output()
+        except Exception:
+            log.exception("Output frame not sent")
+
+
+async def output(data: str, bot: str, kind: str, seq: int | None = None):
+    """
+    Send a line of bot output to the clients in each format
+
+    seq: sequence number given by the bot (reliable output, see delivery), numbered by this worker otherwise
+    """
+    global _batch_bytes
+    await sio.emit("print", {"print": data, "bot": bot, "type": kind}, room=OUTPUT_ROOMS["json"])
+    metrics.SOCKETIO_EMITS.inc("print")
+
+    if _batch_pending is None or not binary_wanted():
+        return
+    if seq is None:
+        seq = _sequences[bot] = _sequences.get(bot, 0) + 1
+    text = data.encode()
+    # Only a line longer than a frame on its own makes a bigger frame
+    if _batch and _batch_bytes + len(text) > FRAME_MAX_BYTES:
+        await flush_output()
+    _batch.append((frames.STREAMS[bot], frames.TYPES[kind], seq & 0xFFFFFFFF, text))
+    _batch_bytes += len(text)
+    if len(_batch) >= min(config.OUTPUT_BATCH_MAX, frames.MAX_RECORDS) or _batch_bytes >= FRAME_MAX_BYTES:
+        await flush_output()
+    else:
+        _batch_pending.set()
+
+
+def binary_wanted() -> bool:
+    """Some client wants binary frames: on this worker, another local worker, or maybe another host (redis)"""
+    queue = config.SOCKETIO_MESSAGE_QUEUE
+    return bool(_binary_clients) or (queue == "local" and _binary_total.value() > 0) or (
+        queue is not None and queue != "local"
+    )
+
 
 async def user_dump_printer(data, bot):
     """Send bot dump (user-printed) data to user"""
-    print("Sending data")
-    await sio.emit("print", {"print" : data, "bot" : bot, "type": "info"})
+    await output(data, bot, "info")
 
 async def user_exception_printer(data, bot):
     """Send bot exception to user"""
-    await sio.emit("print", {"print" : data, "bot" : bot, "type": "error"})
+    await output(data, bot, "error")
+
+
+def output_buffer_depth() -> int:
+    """Packets queued for the connected clients, waiting to be written out"""
+    return sum(socket.queue.qsize() for socket in list(sio.eio.sockets.values()))
+
+
+metrics.Gauge("rero_socketio_output_buffer_depth", "Packets queued to socket.io clients", callback=output_buffer_depth)
+
+
+async def drain(timeout: float = 2.0):
+    """
+    Prepare the clients of this worker for a shutdown
+
+    Clients are told the server restarts and the queued packets get `timeout` seconds to be written out,
+    the transports closed by the shutdown then make the clients reconnect to another worker
+    """
+    for sid in list(connected):
+        await sio.emit("message", "Server restarting", to=sid, ignore_queue=True)
+
+    deadline = time.monotonic() + timeout
+    while output_buffer_depth() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+    log.info("Drained %d socket.io clients", len(connected))
+
+
+def start():
+    """Join the message queue of the workers, start the output batching"""
+    global _batch_pending, _batch_task
+    if isinstance(sio.manager, LocalPubSubManager):
+        sio.manager.bind()
+    if _batch_task is None:
+        _batch_pending = asyncio.Event()
+        _batch_task = asyncio.create_task(run_output())
+
 
+def close():
+    """Release the message queue of this worker"""
+    global _batch_pending, _batch_task
+    if _batch_task is not None:
+        _batch_task.cancel()
+        _batch_task = None
+        _batch_pending = None
+    # The clients of this worker leave the count of the server, they reconnect to another worker
+    if _binary_clients:
+        _binary_total.bump(-len(_binary_clients))
+        _binary_clients.clear()
+    if isinstance(sio.manager, LocalPubSubManager):
+        sio.manager.close()
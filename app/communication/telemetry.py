@@ -0,0 +1,467 @@
+# Created On: 2026, Oct 19
+# Sensor telemetry - numeric samples from the bot programs, buffered per session, saved in column chunks,
+# queried as downsampled series & streamed live on socket.io
+
+import asyncio
+import math
+import secrets
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Annotated
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+
+from .. import config
+from ..core import cache, core, metrics, timeutils
+from ..core.logs import get_logger
+from ..core.schema import User
+from ..database import telemetry as store
+from ..timeslot import availability, timeslot_manager
+from .bot_comms import IOT_BOT, ROS_BOT, require_bot
+from .socket_io import sio
+
+log = get_logger(__name__)
+
+router = APIRouter()
+
+# Samples per block summary (min / max / sum) of a chunk, a bucket covering whole blocks reads only their summaries
+BLOCK = 64
+
+# Longest channel name
+MAX_NAME = 64
+
+# The slot holder of a bot is looked up again after this long (seconds)
+HOLDER_TTL = 1.0
+
+SAMPLES = metrics.Counter(
+    "rero_telemetry_samples_total", "Telemetry samples by bot and result (accepted / rejected)", ("bot", "result")
+)
+CHUNKS = metrics.Counter("rero_telemetry_chunks_total", "Telemetry chunks saved by bot", ("bot",))
+
+
+class Chunk:
+    """
+    Sealed samples of a channel: timestamps (sorted), values & the min / max / sum of every BLOCK values
+
+    Never modified once sealed, queries read them from other threads
+    """
+
+    __slots__ = ("id", "ts", "vals", "block_min", "block_max", "block_sum")
+
+    def __init__(self, chunk_id: int, ts: array, vals: array, block_min: array, block_max: array, block_sum: array):
+        self.id = chunk_id
+        self.ts = ts
+        self.vals = vals
+        self.block_min = block_min
+        self.block_max = block_max
+        self.block_sum = block_sum
+
+    @classmethod
+    def seal(cls, ts: array, vals: array) -> "Chunk":
+        blocks = [vals[i: i + BLOCK] for i in range(0, len(vals), BLOCK)]
+        return cls(
+            secrets.randbits(62),
+            ts,
+            vals,
+            array("d", map(min, blocks)),
+            array("d", map(max, blocks)),
+            array("d", map(sum, blocks)),
+        )
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Chunk":
+        chunk_id, _, _, _, *blobs = row
+        ts, vals, block_min, block_max, block_sum = (array("d", blob) for blob in blobs)
+        return cls(chunk_id, ts, vals, block_min, block_max, block_sum)
+
+    def row(self, key: tuple) -> tuple:
+        return (
+            self.id, *key, self.ts[0], self.ts[-1], len(self.ts),
+            self.ts.tobytes(), self.vals.tobytes(),
+            self.block_min.tobytes(), self.block_max.tobytes(), self.block_sum.tobytes(),
+        )
+
+    def aggregate(self, lo: int, hi: int) -> tuple[float, float, float]:
+        """(min, max, sum) of the values [lo, hi), whole blocks from their summaries"""
+        first = -(-lo // BLOCK)
+        last = hi // BLOCK
+        if last - first < 2:
+            part = self.vals[lo:hi]
+            return min(part), max(part), sum(part)
+
+        head, tail = self.vals[lo: first * BLOCK], self.vals[last * BLOCK: hi]
+        low = min(self.block_min[first:last])
+        high = max(self.block_max[first:last])
+        total = sum(self.block_sum[first:last]) + sum(head) + sum(tail)
+        if head:
+            low, high = min(low, min(head)), max(high, max(head))
+        if tail:
+            low, high = min(low, min(tail)), max(high, max(tail))
+        return low, high, total
+
+
+class Channel:
+    """
+    Samples of one channel in a session: the open chunk being filled, and a ring of its latest sealed chunks
+
+    Timestamps only go forward, an older sample than the last one is rejected (chunks stay sorted)
+    """
+
+    def __init__(self, key: tuple):
+        # (bot, username, session, name)
+        self.key = key
+        self.ts = array("d")
+        self.vals = array("d")
+        self.opened = time.monotonic()
+        self.updated = self.opened
+        self.recent: deque[Chunk] = deque(maxlen=config.TELEMETRY_RING_CHUNKS)
+
+    def append(self, t: float, value: float) -> bool:
+        if self.ts and t < self.ts[-1]:
+            return False
+        if not self.ts:
+            self.opened = time.monotonic()
+        self.ts.append(t)
+        self.vals.append(value)
+        return True
+
+    def seal(self) -> Chunk | None:
+        if not self.ts:
+            return None
+        chunk = Chunk.seal(self.ts, self.vals)
+        self.ts, self.vals = array("d"), array("d")
+        self.recent.append(chunk)
+        return chunk
+
+    def first(self) -> float | None:
+        return self.recent[0].ts[0] if self.recent else (self.ts[0] if self.ts else None)
+
+    def last(self) -> float | None:
+        return self.ts[-1] if self.ts else (self.recent[-1].ts[-1] if self.recent else None)
+
+
+# (bot, username, session, name) -> channel, sessions of this worker
+channels: dict[tuple, Channel] = {}
+
+# bot -> (looked up at, username, slot start) of the slot holder
+_holders: dict[str, tuple[float, str, int]] = {}
+_task: asyncio.Task | None = None
+
+metrics.Gauge(
+    "rero_telemetry_buffered_samples", "Telemetry samples not sealed in a chunk yet on this worker",
+    callback=lambda: sum(len(channel.ts) for channel in channels.values()),
+)
+
+
+def live_room(bot: str, username: str | None = None, session: int = 0) -> str:
+    """socket.io room of the live samples of a session, all the sessions of the bot (admins) without a username"""
+    return f"telemetry:{bot}" if username is None else f"telemetry:{bot}:{username}:{session}"
+
+
+async def slot_holder(bot: str) -> tuple[str, int]:
+    """(username, slot start) of the timeslot running on the bot, ("", 0) when there is none"""
+    now = time.monotonic()
+    cached = _holders.get(bot)
+    if cached is not None and now - cached[0] < HOLDER_TTL:
+        return cached[1], cached[2]
+
+    await timeslot_manager.refresh_calendars()
+    epoch = timeutils.now()
+    holder = ("", 0)
+    for username, (start, end) in availability.calendars[bot].bookings.items():
+        if start <= epoch < end:
+            holder = (username, start)
+            break
+    _holders[bot] = (now, *holder)
+    return holder
+
+
+async def save(chunks: list[tuple[tuple, Chunk]]):
+    """Write sealed chunks, they stay queryable from memory meanwhile"""
+    if not chunks:
+        return
+    try:
+        await asyncio.to_thread(store.add_chunks, [chunk.row(key[:4]) for key, chunk in chunks])
+    except Exception:
+        log.exception("%d telemetry chunks lost", len(chunks))
+        return
+    for key, _ in chunks:
+        CHUNKS.inc(key[0])
+
+
+def parse_samples(body: bytes) -> list:
+    try:
+        samples = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON list of samples")
+    if not isinstance(samples, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON list of samples")
+    return samples
+
+
+@router.post("/{bot}/telemetry")
+async def ingest_telemetry(bot: str, request: Request) -> dict:
+    """
+    Numeric samples of the program running on the bot: a JSON list of [name, timestamp, value]
+
+    timestamp: epoch seconds, null for the time of arrival. Samples go to the session of the current slot holder.
+    Only the bot may post (see bot_comms.from_bot)
+    """
+    if bot not in (ROS_BOT, IOT_BOT):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bot not found")
+    await require_bot(bot, request)
+    samples = parse_samples(await request.body())
+
+    username, session = await slot_holder(bot)
+    arrival = time.time()
+    live: dict[str, dict[str, list]] = {}
+    sealed = []
+    rejected = 0
+    for sample in samples:
+        try:
+            name, t, value = sample
+            t = arrival if t is None else float(t)
+            value = float(value)
+        except (TypeError, ValueError):
+            rejected += 1
+            continue
+        if not isinstance(name, str) or not 0 < len(name) <= MAX_NAME or not math.isfinite(value) or not math.isfinite(t):
+            rejected += 1
+            continue
+
+        key = (bot, username, session, name)
+        channel = channels.get(key)
+        if channel is None:
+            channel = channels[key] = Channel(key)
+        if not channel.append(t, value):
+            rejected += 1
+            continue
+        if len(channel.ts) >= config.TELEMETRY_CHUNK:
+            sealed.append((key, channel.seal()))
+
+        series = live.setdefault(name, {"t": [], "v": []})
+        series["t"].append(t)
+        series["v"].append(value)
+
+    accepted = len(samples) - rejected
+    SAMPLES.inc(bot, "accepted", amount=accepted)
+    if rejected:
+        SAMPLES.inc(bot, "rejected", amount=rejected)
+
+    if live:
+        # Rooms of the session & of the admins on every worker, one event per request
+        await sio.emit(
+            "telemetry", {"bot": bot, "username": username, "session": session, "channels": live},
+            room=[live_room(bot, username, session), live_room(bot)],
+        )
+        metrics.SOCKETIO_EMITS.inc("telemetry")
+    await save(sealed)
+    return {"accepted": accepted, "rejected": rejected}
+
+
+def downsample(chunks: list[Chunk], start: float, end: float, buckets: int) -> dict:
+    """Min / max / avg / count of the samples in `buckets` equal intervals of [start, end], empty ones left out"""
+    width = (end - start) / buckets
+    lows = [math.inf] * buckets
+    highs = [-math.inf] * buckets
+    sums = [0.0] * buckets
+    counts = [0] * buckets
+
+    for chunk in chunks:
+        ts = chunk.ts
+        if not ts or ts[-1] < start or ts[0] > end:
+            continue
+        first = max(0, int((ts[0] - start) // width))
+        last = min(buckets - 1, int((ts[-1] - start) // width))
+        lo = bisect_left(ts, start + first * width)
+        for k in range(first, last + 1):
+            hi = bisect_left(ts, start + (k + 1) * width, lo) if k < buckets - 1 else bisect_right(ts, end, lo)
+            if hi > lo:
+                low, high, total = chunk.aggregate(lo, hi)
+                lows[k] = min(lows[k], low)
+                highs[k] = max(highs[k], high)
+                sums[k] += total
+                counts[k] += hi - lo
+            lo = hi
+
+    filled = [k for k in range(buckets) if counts[k]]
+    return {
+        "start": start,
+        "end": end,
+        "bucket_seconds": width,
+        "t": [start + k * width for k in filled],
+        "min": [lows[k] for k in filled],
+        "max": [highs[k] for k in filled],
+        "avg": [sums[k] / counts[k] for k in filled],
+        "count": [counts[k] for k in filled],
+    }
+
+
+def range_query(key: tuple, start: float | None, end: float | None, buckets: int, memory: list[Chunk]) -> dict:
+    """Stored & in memory chunks of a channel, downsampled. Runs in a thread"""
+    if start is None or end is None:
+        extent = store.get_extent(*key)
+        firsts = [chunk.ts[0] for chunk in memory] + ([extent[0]] if extent else [])
+        lasts = [chunk.ts[-1] for chunk in memory] + ([extent[1]] if extent else [])
+        if not firsts:
+            return downsample([], 0.0, 1.0, 1)
+        start = min(firsts) if start is None else start
+        end = max(lasts) if end is None else end
+    # A single instant still gets a bucket
+    end = max(end, start + 1e-6)
+
+    in_memory = {chunk.id: chunk for chunk in memory}
+    chunks = []
+    for row in store.get_chunks(*key, start, end, skip=set(in_memory)):
+        chunk = in_memory.pop(row[0], None)
+        chunks.append(chunk if chunk is not None else Chunk.from_row(row))
+    # Left in memory: the open chunk & chunks still being saved
+    chunks += in_memory.values()
+    return downsample(chunks, start, end, buckets)
+
+
+@router.get("/telemetry/{bot}")
+async def query_telemetry(
+    current_user: Annotated[User, Depends(core.get_current_user)],
+    bot: str,
+    channel: str,
+    username: str | None = None,
+    session: int | None = None,
+    start: float | None = None,
+    end: float | None = None,
+    buckets: int = 500,
+):
+    """
+    Downsampled series of a channel: min / max / avg / count per time bucket, columns of equal length
+
+    username, session: the session (slot start) to read, default the caller's current one, only admins read others.
+    start, end: epoch seconds, default the whole session
+    """
+    if bot not in (ROS_BOT, IOT_BOT):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bot not found")
+    username = current_user.username if username is None else username
+    if username != current_user.username and current_user.username not in core.admin_group:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not Authorized")
+    if session is None:
+        user = cache.get_user(username)
+        session = user.start_time if user is not None else 0
+    if not 0 < buckets <= config.TELEMETRY_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"buckets must be 1 to {config.TELEMETRY_MAX_BUCKETS}"
+        )
+    if start is not None and end is not None and end < start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end before start")
+
+    key = (bot, username, session, channel)
+    live = channels.get(key)
+    memory = []
+    if live is not None:
+        memory = list(live.recent)
+        if live.ts:
+            # Copy of the open chunk, it keeps growing while the thread reads it
+            memory.append(Chunk.seal(array("d", live.ts), array("d", live.vals)))
+
+    series = await asyncio.to_thread(range_query, key, start, end, buckets, memory)
+    series.update(bot=bot, username=username, session=session, channel=channel)
+    return Response(orjson.dumps(series), media_type="application/json")
+
+
+@router.get("/telemetry/{bot}/channels")
+async def telemetry_channels(current_user: Annotated[User, Depends(core.get_current_user)], bot: str) -> list[dict]:
+    """Channels with samples on the bot, newest session first, only the caller's own unless admin"""
+    if bot not in (ROS_BOT, IOT_BOT):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bot not found")
+    only = None if current_user.username in core.admin_group else current_user.username
+
+    found = {}
+    for username, session, name, _, first, last in await asyncio.to_thread(store.get_channels, bot, only):
+        found[(username, session, name)] = {
+            "username": username, "session": session, "channel": name, "first": first, "last": last,
+        }
+    # Open chunks of this worker, not saved yet
+    for (channel_bot, username, session, name), channel in channels.items():
+        if channel_bot != bot or (only is not None and username != only) or channel.first() is None:
+            continue
+        entry = found.setdefault(
+            (username, session, name),
+            {"username": username, "session": session, "channel": name, "first": channel.first(), "last": None},
+        )
+        entry["last"] = max(entry["last"] or channel.last(), channel.last())
+    return sorted(found.values(), key=lambda entry: (-entry["session"], entry["channel"]))
+
+
+@sio.on("telemetry_subscribe")
+async def telemetry_subscribe(sid, data=None):
+    """
+    Live samples of a bot ({"bot"}): the slot holder gets the samples of their current session,
+    an admin those of every session
+    """
+    bot = data.get("bot") if isinstance(data, dict) else None
+    if bot not in (ROS_BOT, IOT_BOT):
+        return {"error": "Bot not found"}
+    session = await sio.get_session(sid)
+    username = session.get("username")
+    user = cache.get_user(username) if username and session.get("scope") != core.QUEUE_SCOPE else None
+    if user is None or user.disabled or user.blacklist:
+        return {"error": "Not Authorized"}
+
+    if user.username in core.admin_group:
+        room = live_room(bot)
+    elif user.bot == bot and timeutils.in_timeslot(user.start_time, user.end_time, timeutils.now()):
+        room = live_room(bot, user.username, user.start_time)
+    else:
+        return {"error": "Not Authorized"}
+    session["telemetry"] = {**session.get("telemetry", {}), bot: room}
+    await sio.enter_room(sid, room)
+    return {"subscribed": bot}
+
+
+@sio.on("telemetry_unsubscribe")
+async def telemetry_unsubscribe(sid, data=None):
+    bot = data.get("bot") if isinstance(data, dict) else None
+    room = (await sio.get_session(sid)).get("telemetry", {}).pop(bot, None)
+    if room is not None:
+        await sio.leave_room(sid, room)
+    return {"unsubscribed": bot}
+
+
+async def flush(idle: float):
+    """Seal the open chunks older than `idle` seconds, forget the channels quiet for 10 times as long"""
+    now = time.monotonic()
+    sealed = []
+    for key, channel in list(channels.items()):
+        if channel.ts and now - channel.opened >= idle:
+            sealed.append((key, channel.seal()))
+            channel.updated = now
+        elif not channel.ts and now - channel.updated >= 10 * idle:
+            # Saved already, queries read it from the database
+            del channels[key]
+    await save(sealed)
+
+
+async def run():
+    """Other workers see the samples of this one once sealed, at most RERO_TELEMETRY_FLUSH seconds late"""
+    while True:
+        await asyncio.sleep(config.TELEMETRY_FLUSH)
+        try:
+            await flush(config.TELEMETRY_FLUSH)
+        except Exception:
+            log.exception("Telemetry flush failed")
+
+
+def start():
+    global _task
+    store.init()
+    if _task is None:
+        _task = asyncio.create_task(run())
+
+
+async def close():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+    await flush(0)
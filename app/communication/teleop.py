@@ -0,0 +1,370 @@
+# Created On: 2026, Oct 19
+# Teleoperation - commands of the slot holder over socket.io, forwarded to the bot over a persistent websocket
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Annotated
+
+import orjson
+import websockets
+from fastapi import APIRouter, Depends
+
+from .. import config
+from ..core import audit, cache, core, metrics, sessions, timeutils
+from ..core.epoch import SharedEpoch
+from ..core.logs import get_logger
+from ..core.schema import User
+from . import socket_io
+from .bot_comms import IOT_BOT, IP_IOT_BOT, IP_ROS_BOT, ROS_BOT
+from .socket_io import sio
+
+log = get_logger(__name__)
+
+router = APIRouter(prefix="/teleop")
+
+# Limits of the command values, bigger velocities are clamped
+MAX_LINEAR = 1.0
+MAX_ANGULAR = 2.0
+MAX_AXES = 8
+MAX_BUTTONS = 16
+MAX_PIN = 63
+
+# Command-to-ack latencies kept per bot for the percentiles
+LATENCY_HISTORY = 1000
+
+# Batches without an ack after this long are forgotten (seconds)
+ACK_TIMEOUT = 5.0
+
+# Wait before reconnecting to a bot, doubled on every failure in a row up to the max (seconds)
+RECONNECT_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+
+COMMANDS = metrics.Counter(
+    "rero_teleop_commands_total",
+    "Teleoperation commands by bot and result (forwarded / coalesced / rejected / deadman)",
+    ("bot", "result"),
+)
+ACK_SECONDS = metrics.Histogram(
+    "rero_teleop_ack_seconds", "Teleoperation command received to acked by the bot", ("bot",)
+)
+
+
+def validate(command) -> tuple[tuple, dict] | None:
+    """
+    (coalescing key, normalized command) of a command from the client, None if invalid
+
+    velocity: linear, angular / joystick: axes [-1, 1], buttons / io: pin, value
+    """
+    if not isinstance(command, dict):
+        return None
+    kind = command.get("kind")
+    try:
+        if kind == "velocity":
+            linear, angular = float(command["linear"]), float(command["angular"])
+            if not (math.isfinite(linear) and math.isfinite(angular)):
+                return None
+            return ("velocity",), {
+                "kind": kind,
+                "linear": max(-MAX_LINEAR, min(MAX_LINEAR, linear)),
+                "angular": max(-MAX_ANGULAR, min(MAX_ANGULAR, angular)),
+            }
+
+        if kind == "joystick":
+            axes = [max(-1.0, min(1.0, float(axis))) for axis in command.get("axes", ())[:MAX_AXES]]
+            buttons = [bool(button) for button in command.get("buttons", ())[:MAX_BUTTONS]]
+            if not all(math.isfinite(axis) for axis in axes):
+                return None
+            return ("joystick",), {"kind": kind, "axes": axes, "buttons": buttons}
+
+        if kind == "io":
+            pin = int(command["pin"])
+            if not 0 <= pin <= MAX_PIN:
+                return None
+            # One key per pin, a pin change is never lost to another pin
+            return ("io", pin), {"kind": kind, "pin": pin, "value": int(bool(command["value"]))}
+
+    except (KeyError, TypeError, ValueError):
+        return None
+    return None
+
+
+class BotLink:
+    """
+    Websocket to the /teleop endpoint of a bot, opened by a teleop session & closed once no client is in control
+
+    Commands waiting to be sent are kept per key, a newer command replaces an unsent one (latest value wins).
+    Messages are {"seq", "commands", "deadman_ms"}, the bot answers {"ack": seq}
+
+    Control is claimed across the workers: every teleop_start bumps a shared counter of the bot, the link of a
+    worker only sends while the counter is still at the value its own claim got
+    """
+
+    def __init__(self, bot: str, address: str):
+        self.bot = bot
+        self.url = f"ws://{address}/teleop"
+        self.ws = None
+        self.task: asyncio.Task | None = None
+
+        # sid of the client in control, through this worker's claim
+        self.controller: str | None = None
+        self.control = SharedEpoch(f"teleop-{bot}")
+        self.claim = 0
+        # key -> (command, client id, received at)
+        self.pending: dict[tuple, tuple[dict, object, float]] = {}
+        self.wakeup = asyncio.Event()
+        self.seq = 0
+        # seq -> [(client id, received at)], batches waiting for their ack
+        self.in_flight: dict[int, list[tuple[object, float]]] = {}
+        self.deadman: asyncio.TimerHandle | None = None
+        self.latencies: deque = deque(maxlen=LATENCY_HISTORY)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def take_control(self, sid: str) -> str | None:
+        """Claim the bot for a client, return the client of this worker which had it"""
+        previous, self.controller = self.controller, sid
+        self.claim = self.control.bump()
+        return previous
+
+    def owns(self) -> bool:
+        """No newer claim on any worker"""
+        return self.claim != 0 and self.control.value() == self.claim
+
+    def release(self):
+        """Control was taken on another worker, drop what is left without stopping the bot"""
+        self.controller = None
+        self.pending.clear()
+        if self.deadman is not None:
+            self.deadman.cancel()
+            self.deadman = None
+        self.wakeup.set()
+
+    def submit(self, key: tuple, command: dict, client_id, now: float):
+        if key in self.pending:
+            COMMANDS.inc(self.bot, "coalesced")
+        self.pending[key] = (command, client_id, now)
+        self.wakeup.set()
+
+        # Deadman: the bot is stopped unless the next command arrives in time
+        if self.deadman is not None:
+            self.deadman.cancel()
+        self.deadman = asyncio.get_running_loop().call_later(config.TELEOP_DEADMAN, self.stop, "deadman")
+
+    def stop(self, reason: str):
+        """Replace everything pending by a stop command, unless another worker's client took control since"""
+        if not self.owns():
+            return self.release()
+        if self.deadman is not None:
+            self.deadman.cancel()
+            self.deadman = None
+        if reason == "deadman":
+            COMMANDS.inc(self.bot, "deadman")
+        self.pending = {("stop",): ({"kind": "stop", "reason": reason}, None, time.perf_counter())}
+        self.wakeup.set()
+
+    async def run(self):
+        """Keep the link connected while a client is in control, send the pending commands & read the acks"""
+        failures = 0
+        while True:
+            try:
+                async with websockets.connect(self.url, open_timeout=5, ping_interval=5) as ws:
+                    self.ws = ws
+                    failures = 0
+                    log.info("Teleop link to %s connected", self.bot)
+                    reader = asyncio.create_task(self.read_acks(ws))
+                    try:
+                        await self.send_pending(ws)
+                    finally:
+                        reader.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                # A bot offline for long fails every attempt, only the first of a streak is worth a warning
+                if failures == 0:
+                    log.warning("Teleop link to %s lost - %s", self.bot, error)
+                else:
+                    log.debug("Teleop link to %s still down - %s", self.bot, error)
+                failures += 1
+            finally:
+                self.ws = None
+                self.in_flight.clear()
+
+            if self.controller is None and not self.pending:
+                self.task = None
+                log.info("Teleop link to %s closed, no client in control", self.bot)
+                return
+            if failures:
+                # Commands queued while disconnected are stale by the time the link is back, except a stop
+                self.pending = {key: value for key, value in self.pending.items() if key == ("stop",)}
+                await asyncio.sleep(min(RECONNECT_DELAY * 2 ** (failures - 1), RECONNECT_MAX_DELAY))
+
+    async def send_pending(self, ws):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            if not self.pending:
+                if self.controller is None:
+                    return
+                continue
+
+            batch, self.pending = self.pending, {}
+            self.seq += 1
+            self.in_flight[self.seq] = [(client_id, received) for _, client_id, received in batch.values()]
+            # Text frame, the bot reads JSON
+            await ws.send(orjson.dumps({
+                "seq": self.seq,
+                "commands": [command for command, _, _ in batch.values()],
+                "deadman_ms": round(config.TELEOP_DEADMAN * 1e3),
+            }).decode())
+            COMMANDS.inc(self.bot, "forwarded", amount=len(batch))
+            self.prune(time.perf_counter() - ACK_TIMEOUT)
+            # The last stop is out & nobody is in control, the link closes until the next teleop_start
+            if self.controller is None and not self.pending:
+                return
+
+    def prune(self, cutoff: float):
+        """Forget the batches sent before `cutoff` the bot never acked, oldest first"""
+        while self.in_flight:
+            seq, commands = next(iter(self.in_flight.items()))
+            if commands and commands[0][1] >= cutoff:
+                break
+            del self.in_flight[seq]
+
+    async def read_acks(self, ws):
+        async for message in ws:
+            try:
+                seq = orjson.loads(message)["ack"]
+            except (orjson.JSONDecodeError, KeyError, TypeError):
+                continue
+            commands = self.in_flight.pop(seq, None)
+            if commands is None:
+                continue
+
+            now = time.perf_counter()
+            acked = [client_id for client_id, _ in commands if client_id is not None]
+            for _, received in commands:
+                latency = now - received
+                self.latencies.append(latency)
+                ACK_SECONDS.observe(latency, self.bot)
+            if acked and self.controller is not None:
+                await sio.emit("teleop_ack", {"bot": self.bot, "ids": acked}, to=self.controller, ignore_queue=True)
+
+    def percentiles(self) -> dict:
+        values = sorted(latency * 1e3 for latency in self.latencies)
+        summary = {"count": len(values), "connected": self.ws is not None, "controller": self.controller is not None}
+        if values:
+            summary.update(
+                {f"p{q}_ms": round(values[min(len(values) - 1, len(values) * q // 100)], 3) for q in (50, 95, 99)}
+            )
+            summary["max_ms"] = round(values[-1], 3)
+        return summary
+
+
+# bot -> link
+links: dict[str, BotLink] = {ROS_BOT: BotLink(ROS_BOT, IP_ROS_BOT), IOT_BOT: BotLink(IOT_BOT, IP_IOT_BOT)}
+
+
+def check_access(username: str, bot: str) -> int | None:
+    """
+    get_current_active_user & iot_bot_access / ros_bot_access rules, once per teleop session
+
+    return: end of the timeslot the session is limited to (None for the wheel group), raises PermissionError
+    """
+    user = cache.get_user(username)
+    if user is None or user.disabled or user.blacklist:
+        raise PermissionError("Inactive user")
+    if user.username in core.wheel_group:
+        return None
+    if user.bot != bot:
+        raise PermissionError(f"No timeslot on the {bot} bot")
+    if not timeutils.in_timeslot(user.start_time, user.end_time, timeutils.now()):
+        raise PermissionError("Wait your turn")
+    return user.end_time
+
+
+@sio.on("teleop_start")
+async def teleop_start(sid, data=None):
+    """Take control of a bot: {"bot": "ros" | "iot"}, a newer session of the user (or root) takes over"""
+    bot = data.get("bot") if isinstance(data, dict) else None
+    link = links.get(bot)
+    if link is None:
+        return {"error": "Bot not found"}
+
+    session = await sio.get_session(sid)
+    username = session.get("username")
+    if username is None or session.get("scope") == core.QUEUE_SCOPE:
+        return {"error": "Not Authorized"}
+    try:
+        end_time = check_access(username, bot)
+    except PermissionError as error:
+        return {"error": str(error)}
+
+    previous = link.take_control(sid)
+    session["teleop"] = (bot, end_time)
+    link.start()
+    if previous is not None and previous != sid:
+        await sio.emit("teleop_ack", {"bot": bot, "error": "Control taken over"}, to=previous)
+    audit.record("teleop_start", username, bot)
+    log.info("Teleop of %s started", bot, extra={"username": username})
+    return {"bot": bot, "deadman_ms": round(config.TELEOP_DEADMAN * 1e3), "timeslot_end": end_time}
+
+
+@sio.on("teleop")
+async def teleop_command(sid, data=None):
+    """A command of the session in control: {"kind": ..., "id": optional client id echoed in teleop_ack}"""
+    now = time.perf_counter()
+    session = await sio.get_session(sid)
+    bot, end_time = session.get("teleop", (None, None))
+    link = links.get(bot)
+    if link is None or link.controller != sid:
+        return {"error": "Not in control, emit teleop_start first"}
+    if not link.owns():
+        link.release()
+        return {"error": "Control taken over"}
+    if end_time is not None and timeutils.now() > end_time:
+        await teleop_stop(sid)
+        return {"error": "Timeslot over"}
+    # A logout, a newer login or a revocation ends the teleop session too
+    username = session["username"]
+    if username not in core.admin_group and not sessions.is_current(username, session.get("version")):
+        await teleop_stop(sid)
+        return {"error": "Session ended"}
+
+    validated = validate(data)
+    if validated is None:
+        COMMANDS.inc(bot, "rejected")
+        return {"error": "Invalid command"}
+    link.submit(*validated, data.get("id"), now)
+
+
+@sio.on("teleop_stop")
+async def teleop_stop(sid, data=None):
+    """Stop the bot & give up control"""
+    for link in links.values():
+        if link.controller == sid:
+            link.stop("released")
+            link.controller = None
+    return {"stopped": True}
+
+
+socket_io.disconnect_hooks.append(teleop_stop)
+
+
+async def close():
+    for link in links.values():
+        await link.close()
+
+
+@router.get("/stats")
+async def teleop_stats(current_user: Annotated[User, Depends(core.admin_plus)]) -> dict:
+    """Command received to bot ack latency percentiles per bot, over the latest commands of this worker"""
+    return {bot: link.percentiles() for bot, link in links.items()}
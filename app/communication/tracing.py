@@ -0,0 +1,179 @@
+# Created On: 2026, Oct 19
+# Code push lifecycle traces - stage timestamps of each upload, from receipt to the first bot output
+
+import time
+import uuid
+from collections import OrderedDict
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from .. import config
+from ..core import metrics
+from ..core.core import admin_plus
+from ..core.schema import User
+
+router = APIRouter(prefix="/traces")
+
+# Header carrying the trace id to the bot, the bot passes it back as the `trace` parameter of /<bot>/dump
+TRACE_HEADER = "X-Trace-Id"
+
+# Stages in lifecycle order, each mapped to the stage its duration is measured from (None: the start of the request)
+#   received: upload stored, validated: imports checked, transfer: push to the bot started (after the thread pool wait),
+#   bot_ack: bot answered the push, first_output / first_exception: first /dump & /exception call for the push
+# The bot may print before its ack is back, so the output stages count from the start of the transfer
+STAGES = {
+    "received": None,
+    "validated": "received",
+    "transfer": "validated",
+    "bot_ack": "transfer",
+    "first_output": "transfer",
+    "first_exception": "transfer",
+}
+
+STAGE_SECONDS = metrics.Histogram(
+    "rero_code_push_stage_duration_seconds", "Code push time spent per lifecycle stage", ("bot", "stage")
+)
+SLOT_FIRST_OUTPUT_SECONDS = metrics.Histogram(
+    "rero_slot_first_output_seconds",
+    "First code push of a timeslot, upload received to the first bot output, by whether the bot was pre-warmed",
+    ("bot", "prewarmed"),
+)
+
+
+class Trace:
+    """Timestamps of one code push, only the first mark of a stage counts"""
+
+    __slots__ = ("id", "bot", "username", "started", "marks", "outcome", "slot_first")
+
+    def __init__(self, bot: str, username: str):
+        self.id = uuid.uuid4().hex
+        self.bot = bot
+        self.username = username
+        self.started = time.time()
+        # stage -> seconds since `started`
+        self.marks: dict[str, float] = {}
+        self.outcome: str | None = None
+        # First push of the user's timeslot: "yes" / "no" the bot was pre-warmed, None for the later pushes
+        self.slot_first: str | None = None
+
+    def since(self, stage: str | None) -> float | None:
+        return 0.0 if stage is None else self.marks.get(stage)
+
+    def mark(self, stage: str):
+        if stage in self.marks:
+            return
+        self.marks[stage] = elapsed = time.time() - self.started
+        previous = self.since(STAGES[stage])
+        if previous is not None:
+            STAGE_SECONDS.observe(elapsed - previous, self.bot, stage)
+        if stage == "first_output" and self.slot_first is not None:
+            SLOT_FIRST_OUTPUT_SECONDS.observe(elapsed, self.bot, self.slot_first)
+
+    def stage_durations(self) -> dict[str, float]:
+        durations = {}
+        for stage, offset in self.marks.items():
+            previous = self.since(STAGES[stage])
+            if previous is not None:
+                durations[stage] = offset - previous
+        return durations
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.id,
+            "bot": self.bot,
+            "username": self.username,
+            "started": self.started,
+            "outcome": self.outcome,
+            "slot_first": self.slot_first,
+            "marks_ms": {stage: round(offset * 1e3, 3) for stage, offset in self.marks.items()},
+        }
+
+
+class TraceStore:
+    """
+    The last `limit` traces, oldest evicted first
+
+    The trace of the latest push to a bot is its active trace, bot output without a trace id is attributed to it
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.traces: OrderedDict[str, Trace] = OrderedDict()
+        self.active: dict[str, Trace] = {}
+
+    def begin(self, bot: str, username: str) -> Trace:
+        trace = Trace(bot, username)
+        self.traces[trace.id] = trace
+        while len(self.traces) > self.limit:
+            self.traces.popitem(last=False)
+        return trace
+
+    def activate(self, trace: Trace):
+        self.active[trace.bot] = trace
+
+    def get(self, trace_id: str) -> Trace | None:
+        return self.traces.get(trace_id)
+
+    def mark(self, bot: str, stage: str, trace_id: str | None = None):
+        """Mark a stage of the given trace, or of the bot's active trace"""
+        trace = self.traces.get(trace_id) if trace_id else self.active.get(bot)
+        if trace is not None and trace.bot == bot:
+            trace.mark(stage)
+
+    def recent(self, limit: int, bot: str | None = None, username: str | None = None) -> list[Trace]:
+        found = []
+        for trace in reversed(self.traces.values()):
+            if (bot is None or trace.bot == bot) and (username is None or trace.username == username):
+                found.append(trace)
+                if len(found) == limit:
+                    break
+        return found
+
+    def percentiles(self, bot: str | None = None) -> dict:
+        """Per stage p50 / p95 / p99 / max in milliseconds over the stored traces"""
+        durations: dict[str, list[float]] = {stage: [] for stage in STAGES}
+        for trace in self.traces.values():
+            if bot is None or trace.bot == bot:
+                for stage, seconds in trace.stage_durations().items():
+                    durations[stage].append(seconds * 1e3)
+
+        summary = {}
+        for stage, values in durations.items():
+            values.sort()
+            summary[stage] = {"count": len(values)}
+            if values:
+                summary[stage].update(
+                    {f"p{q}_ms": round(values[min(len(values) - 1, len(values) * q // 100)], 3) for q in (50, 95, 99)}
+                )
+                summary[stage]["max_ms"] = round(values[-1], 3)
+        return summary
+
+
+traces = TraceStore(config.TRACE_LIMIT)
+
+
+@router.get("")
+async def list_traces(
+    current_user: Annotated[User, Depends(admin_plus)],
+    bot: str | None = None,
+    username: str | None = None,
+    limit: int = 50,
+) -> list[dict]:
+    """Latest code push traces, newest first"""
+    return [trace.to_dict() for trace in traces.recent(max(1, limit), bot, username)]
+
+
+@router.get("/stages")
+async def stage_percentiles(current_user: Annotated[User, Depends(admin_plus)], bot: str | None = None) -> dict:
+    """Latency percentiles of each stage, measured from the stage before it"""
+    return traces.percentiles(bot)
+
+
+@router.get("/{trace_id}")
+async def get_trace(current_user: Annotated[User, Depends(admin_plus)], trace_id: str) -> dict:
+    """One code push trace"""
+    trace = traces.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trace not found")
+    return trace.to_dict()
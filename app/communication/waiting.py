@@ -0,0 +1,224 @@
+# Created On: 2026, Oct 19
+# Waiting queue - users early for their timeslot wait on socket.io, the server pushes position, ETA & the slot start
+
+import asyncio
+import fcntl
+import os
+import time
+
+import orjson
+
+from .. import config
+from ..core import cache, core, metrics, timeutils
+from ..core.logs import get_logger
+from ..timeslot import availability, timeslot_manager
+from .bot_comms import IOT_BOT, ROS_BOT
+from . import socket_io
+from .socket_io import sio
+
+log = get_logger(__name__)
+
+# Events sent to a waiting client
+QUEUE_EVENT = "queue"
+SLOT_STARTING_EVENT = "slot_starting"
+
+
+class Waiter:
+    """A client waiting for the timeslot of its user, the last queue update sent to it & when it joined"""
+
+    __slots__ = ("username", "update", "joined")
+
+    def __init__(self, username: str):
+        self.username = username
+        self.update: dict | None = None
+        self.joined = time.time()
+
+
+# sid -> waiter, clients of this worker only
+waiting: dict[str, Waiter] = {}
+
+# Set to recompute the queue before the next refresh (join)
+_changed = asyncio.Event()
+_task: asyncio.Task | None = None
+
+# username -> [slot start, slot end, claimed at] of the slots started, shared by the workers. Only the claim is
+# kept, the tokens go once to the room of the user (on every worker) and are never stored
+CLAIMS_PATH = os.path.join(config.RUN_DIR, "rero-queue-claims")
+
+
+def user_room(username: str) -> str:
+    """socket.io room of the waiting clients of a user, on every worker"""
+    return f"queue:{username}"
+
+metrics.Gauge("rero_waiting_clients", "Clients in the waiting queue of this worker", callback=lambda: len(waiting))
+
+
+async def booking_of(username: str) -> tuple[str, int, int] | None:
+    """(bot, start, end) of the timeslot of the user, from the availability calendars"""
+    # Reloads the calendars when a timeslot was written since they were built
+    await timeslot_manager.refresh_calendars()
+    for bot in (ROS_BOT, IOT_BOT):
+        booking = availability.calendars[bot].bookings.get(username)
+        if booking is not None:
+            return bot, *booking
+    return None
+
+
+def position(bot: str, start: int, now: int) -> int:
+    """1 + the timeslots of the bot that are not over and start before `start`"""
+    bookings = availability.calendars[bot].bookings.values()
+    return 1 + sum(1 for other_start, other_end in bookings if other_start < start and other_end > now)
+
+
+async def update(sid: str, waiter: Waiter, now: int) -> int | None:
+    """
+    Push the queue state to a client if it changed, hand over the tokens once the slot started
+
+    Returns the start of the timeslot while the client keeps waiting, None when it left the queue
+    """
+    booking = await booking_of(waiter.username)
+    if booking is None or booking[2] <= now:
+        await sio.emit(QUEUE_EVENT, {"message": "No upcoming timeslot"}, to=sid, ignore_queue=True)
+        waiting.pop(sid, None)
+        return None
+
+    bot, start, end = booking
+    if start <= now:
+        await start_slot(sid, waiter, bot, start, end)
+        return None
+
+    state = {"bot": bot, "position": position(bot, start, now), "timeslot_start": start, "timeslot_end": end}
+    if state != waiter.update:
+        waiter.update = state
+        # The ETA counts down on the client, it is sent again only with a new position / timeslot
+        await sio.emit(QUEUE_EVENT, {**state, "eta": start - now}, to=sid, ignore_queue=True)
+        metrics.SOCKETIO_EMITS.inc(QUEUE_EVENT)
+    return start
+
+
+def claim_slot(username: str, start: int, end: int) -> float | None:
+    """
+    Claim the login of the user for the slot starting at `start`, once for all the waiting clients on every worker
+
+    return: None for the claim, otherwise the time the slot was claimed by another client
+    """
+    fd = os.open(CLAIMS_PATH, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        content = os.pread(fd, os.fstat(fd).st_size, 0)
+        claims = orjson.loads(content) if content else {}
+
+        claimed = claims.get(username)
+        if claimed is not None and claimed[0] == start:
+            return claimed[2]
+
+        now = timeutils.now()
+        claims = {name: claim for name, claim in claims.items() if claim[1] > now}
+        claims[username] = [start, end, time.time()]
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, orjson.dumps(claims), 0)
+        return None
+    finally:
+        os.close(fd)
+
+
+async def start_slot(sid: str, waiter: Waiter, bot: str, start: int, end: int):
+    """
+    The slot of the user started, log it in: the waiting clients get the tokens the login would have returned
+
+    The tokens are issued once, by the first client to get there, and sent to the room of the user:
+    every tab of the user on any worker gets the same pair
+    """
+    waiting.pop(sid, None)
+
+    user = cache.get_user(waiter.username)
+    if user is None or user.disabled or user.blacklist or not timeutils.in_timeslot(
+        user.start_time, user.end_time, timeutils.now()
+    ):
+        await sio.emit(QUEUE_EVENT, {"message": "No upcoming timeslot"}, to=sid, ignore_queue=True)
+        return
+
+    claimed = await asyncio.to_thread(claim_slot, user.username, start, end)
+    if claimed is not None:
+        # In the room when the tokens went out, nothing more to send
+        if waiter.joined < claimed:
+            return
+        await sio.emit(QUEUE_EVENT, {"message": "Timeslot started, log in"}, to=sid, ignore_queue=True)
+        return
+
+    token = await asyncio.to_thread(core.issue_tokens, user)
+    await sio.emit(
+        SLOT_STARTING_EVENT,
+        {"bot": bot, "timeslot_start": start, "timeslot_end": end, **token.model_dump()},
+        room=user_room(user.username),
+    )
+    metrics.SOCKETIO_EMITS.inc(SLOT_STARTING_EVENT)
+    log.info("Slot of %s on %s started, tokens handed to the waiting clients", waiter.username, bot)
+
+
+async def run():
+    """
+    Refresh the queue of this worker every RERO_QUEUE_REFRESH seconds, on joins,
+    and exactly when the next waited-for timeslot starts
+    """
+    while True:
+        now = timeutils.now()
+        next_start = None
+        for sid, waiter in list(waiting.items()):
+            try:
+                start = await update(sid, waiter, now)
+            except Exception:
+                log.exception("Waiting queue update of %s failed", waiter.username)
+                continue
+            if start is not None and (next_start is None or start < next_start):
+                next_start = start
+
+        timeout = config.QUEUE_REFRESH
+        if next_start is not None:
+            timeout = min(timeout, max(next_start - time.time(), 0))
+        try:
+            await asyncio.wait_for(_changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        _changed.clear()
+
+
+@sio.on("queue_join")
+async def queue_join(sid, data=None):
+    """Wait for the timeslot, only a queue token (from the 403 of POST /token) is needed"""
+    session = await sio.get_session(sid)
+    if session.get("scope") != core.QUEUE_SCOPE:
+        return {"error": "Connect with the queue_token of the login response"}
+
+    waiting[sid] = Waiter(session["username"])
+    await sio.enter_room(sid, user_room(session["username"]))
+    _changed.set()
+    return {"joined": True}
+
+
+@sio.on("queue_leave")
+async def queue_leave(sid, data=None):
+    waiter = waiting.pop(sid, None)
+    if waiter is not None:
+        await sio.leave_room(sid, user_room(waiter.username))
+    return {"left": True}
+
+
+async def forget(sid):
+    waiting.pop(sid, None)
+
+
+socket_io.disconnect_hooks.append(forget)
+
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(run())
+
+
+def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
@@ -0,0 +1,136 @@
+# Created On: 2026, Oct 19
+# Server configuration, read from RERO_* environment variables with the container defaults
+
+import os
+import tempfile
+
+# SQLite database of the users
+DB_PATH = os.environ.get("RERO_DB_PATH", "/var/lib/sqlite/users.db")
+
+# File holding the JWT signing key on its first line
+SECRET_FILE = os.environ.get("RERO_SECRET_FILE", "/etc/secret")
+
+# Bot addresses (host:port)
+IP_ROS_BOT = os.environ.get("RERO_ROS_BOT", "localhost:8081")
+IP_IOT_BOT = os.environ.get("RERO_IOT_BOT", "localhost:8082")
+
+# Uploaded user code is kept in CODE_DIR/<bot>/
+CODE_DIR = os.environ.get("RERO_CODE_DIR", "/tmp")
+
+# Timezone of naive datetimes & the legacy timeslot strings
+TIMEZONE = os.environ.get("RERO_TZ", "Asia/Kolkata")
+
+# Directory of the files shared by the workers on the host
+RUN_DIR = os.environ.get(
+    "RERO_RUN_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+
+# Login admission control, attempts per minute & burst per username / client IP. The IP limit is off (0) by default,
+# a lab behind one NAT or proxy address logs in all at once at the slot start
+LOGIN_LIMITER_BACKEND = os.environ.get("RERO_LOGIN_LIMITER_BACKEND")
+LOGIN_USER_PER_MINUTE = float(os.environ.get("RERO_LOGIN_USER_PER_MINUTE", 5))
+LOGIN_USER_BURST = float(os.environ.get("RERO_LOGIN_USER_BURST", 5))
+LOGIN_IP_PER_MINUTE = float(os.environ.get("RERO_LOGIN_IP_PER_MINUTE", 0))
+LOGIN_IP_BURST = float(os.environ.get("RERO_LOGIN_IP_BURST", 30))
+LOGIN_MAX_VERIFICATIONS = int(os.environ.get("RERO_LOGIN_MAX_VERIFICATIONS", os.cpu_count() or 1))
+LOGIN_VERIFY_WAIT = float(os.environ.get("RERO_LOGIN_VERIFY_WAIT", 0.5))
+
+# Logging, level / "json" or "text" lines / log only every n-th high volume event (bot output)
+LOG_LEVEL = os.environ.get("RERO_LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("RERO_LOG_FORMAT", "json")
+LOG_SAMPLE_EVERY = int(os.environ.get("RERO_LOG_SAMPLE_EVERY", 100))
+
+# Code push traces kept in memory for /traces
+TRACE_LIMIT = int(os.environ.get("RERO_TRACE_LIMIT", 1000))
+
+# Database, statements slower than this are logged with their query plan / SQLITE_BUSY handling:
+# each attempt waits up to the busy timeout (seconds) and is retried this many times
+DB_SLOW_QUERY_MS = float(os.environ.get("RERO_DB_SLOW_QUERY_MS", 50))
+DB_BUSY_TIMEOUT = float(os.environ.get("RERO_DB_BUSY_TIMEOUT", 0.25))
+DB_BUSY_RETRIES = int(os.environ.get("RERO_DB_BUSY_RETRIES", 20))
+
+# Supervised server (python -m app.server), one worker process unless more are asked for (see the README for the
+# state kept per worker), a worker being replaced gets DRAIN_TIMEOUT seconds to finish its requests, a new one
+# BOOT_TIMEOUT to start
+SERVER_HOST = os.environ.get("RERO_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("RERO_PORT", 8080))
+WORKERS = int(os.environ.get("RERO_WORKERS", 1))
+WORKER_DRAIN_TIMEOUT = float(os.environ.get("RERO_WORKER_DRAIN_TIMEOUT", 30))
+WORKER_BOOT_TIMEOUT = float(os.environ.get("RERO_WORKER_BOOT_TIMEOUT", 60))
+# Proxies (comma separated addresses, "*" any) whose X-Forwarded-For gives the client address
+FORWARDED_ALLOW_IPS = os.environ.get("RERO_FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# socket.io between workers: unset (single process), "local" (workers of this host) or a redis:// URL,
+# the supervisor picks "local" for more than one worker. Polling needs sticky sessions, so more than one
+# worker also restricts the transports to websocket (transports: ["websocket"] in socket.io-client)
+SOCKETIO_MESSAGE_QUEUE = os.environ.get("RERO_SOCKETIO_MESSAGE_QUEUE")
+SOCKETIO_GROUP = os.environ.get("RERO_SOCKETIO_GROUP", "default")
+SOCKETIO_TRANSPORTS = os.environ.get("RERO_SOCKETIO_TRANSPORTS", "polling,websocket").split(",")
+# Set by the supervisor in each worker when there is more than one, /metrics labels its series with it
+WORKER_ID: str | None = None
+
+# Seconds a cached /me or /timeslot response (and a user record read for authentication) is served
+# without checking the database, writes through the server invalidate them right away
+RESPONSE_CACHE_TTL = float(os.environ.get("RERO_RESPONSE_CACHE_TTL", 5))
+
+# Bulk user import (POST /users/bulk): rows accepted per file, processes hashing the initial passwords
+BULK_MAX_ROWS = int(os.environ.get("RERO_BULK_MAX_ROWS", 5000))
+BULK_HASH_WORKERS = int(os.environ.get("RERO_BULK_HASH_WORKERS", os.cpu_count() or 1))
+
+# Waiting queue on socket.io, positions are recomputed at least this often (seconds) to catch timeslot changes
+QUEUE_REFRESH = float(os.environ.get("RERO_QUEUE_REFRESH", 5))
+
+# Camera relay, frames a bot pushes beyond these rates are dropped (frames per second, bits per second)
+CAMERA_MAX_FPS = float(os.environ.get("RERO_CAMERA_MAX_FPS", 30))
+CAMERA_MAX_BITRATE = float(os.environ.get("RERO_CAMERA_MAX_BITRATE", 20_000_000))
+# Secret a bot sends (Authorization: Bearer, or ?token=) to push its camera, telemetry & output, unset: only the bot
+# host may push. RERO_CAMERA_UPSTREAM_TOKEN is its older name
+BOT_TOKEN = os.environ.get("RERO_BOT_TOKEN", os.environ.get("RERO_CAMERA_UPSTREAM_TOKEN"))
+
+# Teleoperation (socket.io teleop events), the bot is stopped when the controller sends nothing for this long (seconds)
+TELEOP_DEADMAN = float(os.environ.get("RERO_TELEOP_DEADMAN", 0.5))
+
+# Sensor telemetry (POST /<bot>/telemetry): its own database, samples per saved chunk, sealed chunks kept in memory
+# per channel, seconds before an open chunk is saved anyway (samples reach the other workers' queries by then),
+# and the most buckets a range query returns
+TELEMETRY_DB_PATH = os.environ.get("RERO_TELEMETRY_DB_PATH", os.path.join(os.path.dirname(DB_PATH), "telemetry.db"))
+TELEMETRY_CHUNK = int(os.environ.get("RERO_TELEMETRY_CHUNK", 4096))
+TELEMETRY_RING_CHUNKS = int(os.environ.get("RERO_TELEMETRY_RING_CHUNKS", 16))
+TELEMETRY_FLUSH = float(os.environ.get("RERO_TELEMETRY_FLUSH", 2))
+TELEMETRY_MAX_BUCKETS = int(os.environ.get("RERO_TELEMETRY_MAX_BUCKETS", 5000))
+
+# Pre-warm of the bots this long before each timeslot (seconds, 0 disables): health check, pooled connection,
+# stop of the program left running. A bot slower than BOT_HEALTH_TIMEOUT seconds to answer is reported unhealthy
+PREWARM_LEAD = float(os.environ.get("RERO_PREWARM_LEAD", 30))
+BOT_HEALTH_TIMEOUT = float(os.environ.get("RERO_BOT_HEALTH_TIMEOUT", 2))
+
+# Audit log (logins, pushes, stops, timeslot & user changes): its own database, events are queued in memory and
+# written in one transaction every AUDIT_FLUSH_INTERVAL seconds or once AUDIT_BATCH are queued. Past AUDIT_QUEUE_MAX
+# queued events (database unavailable) new events are dropped rather than holding up requests
+AUDIT_DB_PATH = os.environ.get("RERO_AUDIT_DB_PATH", os.path.join(os.path.dirname(DB_PATH), "audit.db"))
+AUDIT_BATCH = int(os.environ.get("RERO_AUDIT_BATCH", 500))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("RERO_AUDIT_FLUSH_INTERVAL", 0.2))
+AUDIT_QUEUE_MAX = int(os.environ.get("RERO_AUDIT_QUEUE_MAX", 100000))
+
+# Load shedding of HTTP requests (app/core/admission.py): "class=limit:budget" per route class, limit requests of the
+# class run at once (0 for no limit), the others wait up to budget seconds for a slot before a 503. Classes by
+# priority: stop, ingest (bot output, telemetry), auth, default, code_push, admin. Code pushes hold a thread each until
+# the bot answers, one per bot keeps threads free for the stops. ADMISSION_MAX_CONCURRENT is shared by the limited
+# classes, 0 turns load shedding off
+ADMISSION_CLASSES = os.environ.get(
+    "RERO_ADMISSION_CLASSES", "stop=0,ingest=64:5,auth=16:2,default=32:2,code_push=2:1,admin=4:1"
+)
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("RERO_ADMISSION_MAX_CONCURRENT", 64))
+
+# Compact bot output (socket.io "output" frames, for the clients sending output_format {"format": "binary"}): records
+# gathered this long after the first one (seconds), up to OUTPUT_BATCH_MAX records or OUTPUT_BATCH_MAX_BYTES of text go
+# in one frame, frames of at least OUTPUT_COMPRESS_MIN bytes are deflated (0 never)
+OUTPUT_BATCH_INTERVAL = float(os.environ.get("RERO_OUTPUT_BATCH_INTERVAL", 0.02))
+OUTPUT_BATCH_MAX = int(os.environ.get("RERO_OUTPUT_BATCH_MAX", 256))
+OUTPUT_BATCH_MAX_BYTES = int(os.environ.get("RERO_OUTPUT_BATCH_MAX_BYTES", 64 * 1024))
+OUTPUT_COMPRESS_MIN = int(os.environ.get("RERO_OUTPUT_COMPRESS_MIN", 512))
+
+# Reliable bot output (POST /<bot>/output): records a bot may have past its last ack, and the socket.io packets queued
+# per client at which the credit granted to the bots drops to its minimum
+OUTPUT_WINDOW = int(os.environ.get("RERO_OUTPUT_WINDOW", 1024))
+OUTPUT_MAX_BACKLOG = float(os.environ.get("RERO_OUTPUT_MAX_BACKLOG", 256))
@@ -0,0 +1,200 @@
+# Created On: 2026, Oct 19
+# Load shedding - concurrency limits per route class, queued requests admitted by priority, 503 past a queue budget
+
+import asyncio
+import math
+import time
+from collections import deque
+
+import orjson
+
+from .. import config
+from . import metrics
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+# Route classes, highest priority first: a freed slot goes to the waiting request of the highest class
+CLASSES = ("stop", "ingest", "auth", "default", "code_push", "admin")
+
+QUEUE_SECONDS = metrics.Histogram(
+    "rero_admission_queue_seconds", "Time requests waited for a slot by route class and result (admitted / shed)",
+    ("class", "result"),
+)
+
+# Bot output & telemetry, GET /<bot>/dump and /<bot>/exception (POST /<bot>/output & /<bot>/telemetry by method)
+INGEST_PATHS = frozenset(f"/{bot}/{kind}" for bot in ("iot", "ros") for kind in ("dump", "exception"))
+AUTH_PATHS = frozenset(("/token", "/token/refresh", "/logout", "/password/set"))
+ADMIN_PREFIXES = (
+    "/db/", "/profiler", "/traces", "/prewarm", "/teleop/stats", "/users/", "/adduser/", "/blacklist",
+    "/disable_user", "/timeslot/allot", "/token/limits",
+)
+
+
+def classify(method: str, path: str) -> str | None:
+    """Route class of a request, None for the requests never held back (socket.io, metrics scrapes)"""
+    if path.startswith("/socket.io") or path == "/metrics":
+        return None
+    if path.startswith("/bot/"):
+        if path.endswith("/stop"):
+            return "stop"
+        if method == "POST" and path.endswith("/code"):
+            return "code_push"
+    if path in INGEST_PATHS or (method == "POST" and path.endswith(("/telemetry", "/output"))):
+        return "ingest"
+    if path in AUTH_PATHS:
+        return "auth"
+    if path.startswith(ADMIN_PREFIXES):
+        return "admin"
+    return "default"
+
+
+def parse_classes(spec: str) -> dict[str, tuple[int, float]]:
+    """
+    "class=limit:budget,..." -> {class: (limit, budget)}, classes left out keep no limit
+
+    limit: requests of the class running at once, 0 for no limit (never queued nor shed)
+    budget: seconds a request may wait for a slot before it is shed
+    """
+    classes = {name: (0, 0.0) for name in CLASSES}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = entry.partition("=")
+        limit, _, budget = value.partition(":")
+        if name not in classes:
+            raise ValueError(f"Unknown route class {name!r}, expected one of {CLASSES}")
+        classes[name] = (int(limit), float(budget or 0))
+    return classes
+
+
+class RouteClass:
+    __slots__ = ("name", "limit", "budget", "active", "waiters")
+
+    def __init__(self, name: str, limit: int, budget: float):
+        self.name = name
+        self.limit = limit
+        self.budget = budget
+        self.active = 0
+        # Futures of the queued requests, oldest first
+        self.waiters: deque[asyncio.Future] = deque()
+
+
+class Admission:
+    """
+    Slots per route class within a shared capacity (the classes without a limit are outside of it)
+
+    A request runs right away if its class and the capacity have room and nothing of its class is queued,
+    otherwise it waits up to the budget of its class. Every release hands the freed slots to the queued
+    requests in class priority order, so under load the low classes wait (and are shed) first
+    """
+
+    def __init__(self, classes: dict[str, tuple[int, float]], capacity: int):
+        self.classes = {name: RouteClass(name, *classes[name]) for name in CLASSES}
+        self.capacity = capacity
+        self.active = 0
+
+    def has_room(self, route_class: RouteClass) -> bool:
+        return route_class.active < route_class.limit and self.active < self.capacity
+
+    def take(self, route_class: RouteClass):
+        route_class.active += 1
+        self.active += 1
+
+    async def acquire(self, route_class: RouteClass) -> bool:
+        """False if no slot freed up within the budget of the class"""
+        if not route_class.waiters and self.has_room(route_class):
+            self.take(route_class)
+            return True
+        if route_class.budget <= 0:
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        route_class.waiters.append(future)
+        try:
+            await asyncio.wait_for(future, route_class.budget)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            # Client gone while queued, a slot handed over meanwhile goes to the next request
+            if future.done() and not future.cancelled():
+                self.release(route_class)
+            raise
+        finally:
+            if not future.done() or future.cancelled():
+                try:
+                    route_class.waiters.remove(future)
+                except ValueError:
+                    pass
+
+    def release(self, route_class: RouteClass):
+        route_class.active -= 1
+        self.active -= 1
+        for queued in self.classes.values():
+            while queued.waiters and self.has_room(queued):
+                future = queued.waiters.popleft()
+                if not future.done():
+                    self.take(queued)
+                    future.set_result(None)
+            if self.active >= self.capacity:
+                return
+
+    def stats(self) -> dict:
+        return {
+            name: {"limit": route_class.limit, "active": route_class.active, "queued": len(route_class.waiters)}
+            for name, route_class in self.classes.items()
+            if route_class.limit
+        }
+
+
+admission = Admission(parse_classes(config.ADMISSION_CLASSES), config.ADMISSION_MAX_CONCURRENT)
+
+metrics.Gauge(
+    "rero_admission_active_requests", "Requests running by route class", ("class",),
+    callback=lambda: {(name,): stats["active"] for name, stats in admission.stats().items()},
+)
+metrics.Gauge(
+    "rero_admission_queued_requests", "Requests waiting for a slot by route class", ("class",),
+    callback=lambda: {(name,): stats["queued"] for name, stats in admission.stats().items()},
+)
+
+
+async def busy(send, route_class: RouteClass):
+    """503 of a shed request, the client may retry once the queue budget has gone by"""
+    body = orjson.dumps({"detail": "Server busy, retry later"})
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(route_class.budget))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware holding each HTTP request until its route class has a free slot, see Admission"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or admission.capacity <= 0:
+            return await self.app(scope, receive, send)
+        name = classify(scope["method"], scope["path"])
+        route_class = admission.classes[name] if name is not None else None
+        if route_class is None or not route_class.limit:
+            return await self.app(scope, receive, send)
+
+        begin = time.perf_counter()
+        if not await admission.acquire(route_class):
+            QUEUE_SECONDS.observe(time.perf_counter() - begin, name, "shed")
+            log.debug("Request to %s shed", scope["path"])
+            return await busy(send, route_class)
+
+        QUEUE_SECONDS.observe(time.perf_counter() - begin, name, "admitted")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(route_class)
@@ -0,0 +1,99 @@
+# Created On: 2026, Oct 19
+# Audit log - logins, pushes, stops, timeslot & user changes, socket connects; queued in memory, group committed.
+# Queried with GET /db/audit
+
+import asyncio
+import time
+from collections import deque
+
+import orjson
+
+from .. import config
+from ..database import audit as store
+from . import metrics
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+EVENTS = metrics.Counter(
+    "rero_audit_events_total", "Audit events by result (written / dropped)", ("result",)
+)
+FLUSH_SIZE = metrics.Histogram(
+    "rero_audit_flush_events", "Audit events per group commit", buckets=(1, 5, 10, 50, 100, 500, 1000, 5000)
+)
+
+# (ts, event, username, bot, detail) waiting for the writer, appended from any thread
+_queue: deque = deque()
+_wakeup: asyncio.Event | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_task: asyncio.Task | None = None
+
+metrics.Gauge("rero_audit_queued_events", "Audit events not written yet", callback=lambda: len(_queue))
+
+
+def record(event: str, username: str | None = None, bot: str | None = None, **detail):
+    """
+    Queue an audit event, returns right away: no I/O, the detail is serialized by the writer
+
+    username: the user doing the action, detail: anything else worth keeping (target user, trace id, outcome...)
+    """
+    if len(_queue) >= config.AUDIT_QUEUE_MAX:
+        # The writer is far behind (database unavailable), the request is not held up for it
+        EVENTS.inc("dropped")
+        return
+    _queue.append((time.time(), event, username, bot, detail or None))
+    if len(_queue) == config.AUDIT_BATCH and _loop is not None:
+        # Batch full, write it now rather than at the next interval
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+def drain() -> list[tuple]:
+    """Rows of the queued events, detail serialized"""
+    rows = []
+    for _ in range(len(_queue)):
+        ts, event, username, bot, detail = _queue.popleft()
+        rows.append((ts, event, username, bot, orjson.dumps(detail, default=str).decode() if detail else None))
+    return rows
+
+
+def write(rows: list[tuple]):
+    try:
+        store.add_events(rows)
+    except Exception:
+        log.exception("%d audit events lost", len(rows))
+        EVENTS.inc("dropped", amount=len(rows))
+        return
+    EVENTS.inc("written", amount=len(rows))
+    FLUSH_SIZE.observe(len(rows))
+
+
+async def run():
+    """Group commit: every RERO_AUDIT_FLUSH_INTERVAL seconds, or as soon as RERO_AUDIT_BATCH events are queued"""
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), config.AUDIT_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        if _queue:
+            await asyncio.to_thread(lambda: write(drain()))
+
+
+def start():
+    global _loop, _wakeup, _task
+    store.init()
+    if _task is None:
+        _loop = asyncio.get_running_loop()
+        _wakeup = asyncio.Event()
+        _task = asyncio.create_task(run())
+
+
+async def close():
+    """Stop the writer, the events still queued are written"""
+    global _loop, _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+        _loop = None
+    if _queue:
+        await asyncio.to_thread(lambda: write(drain()))
@@ -0,0 +1,108 @@
+# Created On: 2026, Oct 19
+# Per-worker caches of user records & read endpoint responses, dropped whenever the users epoch moves
+
+import hashlib
+import time
+
+import orjson
+from fastapi import Request, Response, status
+
+from .. import config
+from ..database import operations as ds
+from . import metrics
+from .schema import UserInDB
+
+RESPONSE_CACHE = metrics.Counter(
+    "rero_response_cache_total", "Cached read endpoint lookups by endpoint and result", ("endpoint", "result")
+)
+
+# Authenticated data, browsers keep it to themselves and revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+class EpochCache:
+    """
+    key -> value entries valid until the users epoch moves or RERO_RESPONSE_CACHE_TTL expires
+
+    The epoch covers writes made by any worker, the TTL bounds how stale an edit made outside the server can get
+    """
+
+    def __init__(self):
+        self.entries: dict = {}
+        self.seen_epoch: int | None = None
+
+    def get(self, key):
+        changed = ds.users_epoch.value()
+        if changed != self.seen_epoch:
+            self.entries.clear()
+            self.seen_epoch = changed
+            return None
+
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key, value, epoch: int):
+        """Store a value built while the epoch was at `epoch`, a write since then leaves it out"""
+        if epoch == self.seen_epoch:
+            self.entries[key] = (time.monotonic() + config.RESPONSE_CACHE_TTL, value)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# username -> validated UserInDB, read by the authentication dependencies
+users = EpochCache()
+
+# (endpoint, key) -> (etag, body)
+responses = EpochCache()
+
+
+def get_user(username: str) -> UserInDB | None:
+    """User record for authentication, read from the database once per TTL / users change"""
+    user = users.get(username)
+    if user is None:
+        epoch = ds.users_epoch.value()
+        user = ds.get_user_in_db(username)
+        if user is not None:
+            users.set(username, user, epoch)
+    return user
+
+
+def etag_of(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """Check If-None-Match of the request against the current ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def json_response(request: Request, endpoint: str, key, build) -> Response:
+    """
+    JSON response of build() serialized with orjson, cached under (endpoint, key)
+
+    Answers 304 when the client already holds the same body (If-None-Match)
+    """
+    cached = responses.get((endpoint, key))
+    if cached is None:
+        RESPONSE_CACHE.inc(endpoint, "miss")
+        epoch = ds.users_epoch.value()
+        body = orjson.dumps(build())
+        cached = (etag_of(body), body)
+        responses.set((endpoint, key), cached, epoch)
+    else:
+        RESPONSE_CACHE.inc(endpoint, "hit")
+
+    etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+    if not_modified(request, etag):
+        RESPONSE_CACHE.inc(endpoint, "not_modified")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
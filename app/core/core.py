@@ -2,11 +2,12 @@
 # Created On:
 # Core functionality for the server - login, jwt, role-level access
 
+from .. import config
 from ..database import operations as ds
 
 from datetime import datetime, timedelta, timezone, date
 
-from fastapi import APIRouter, HTTPException, Depends, status, FastAPI
+from fastapi import APIRouter, HTTPException, Depends, status, FastAPI, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 import jwt
@@ -14,20 +15,44 @@ from jwt.exceptions import InvalidTokenError
 
 from passlib.context import CryptContext
 
-from .schema import Token, TokenData, User, UserInDB
+from .schema import Token, TokenData, User, UserInDB, RefreshRequest
+from . import timeutils
+from . import sessions
+from . import metrics
+from . import audit
+from . import cache
+from .logs import get_logger
+from .ratelimit import limiter
 import sqlite3
+import functools
+import hashlib
+import secrets
 
 from typing import Annotated
 
+log = get_logger(__name__)
+
 router = APIRouter()
 
-with open("/etc/secret") as f:
-    global SECRET_KEY
-    SECRET_KEY = f.readline().strip()
+
+@functools.cache
+def secret_key() -> str:
+    """JWT signing key, read from the secret file on first use"""
+    with open(config.SECRET_FILE) as f:
+        return f.readline().strip()
+
 
 ALGORITHM = "HS256"
+
+# "scope" claim of the waiting queue tokens
+QUEUE_SCOPE = "queue"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Refresh tokens slide by REFRESH_TOKEN_EXPIRE_MINUTES on every use, up to REFRESH_TOKEN_MAX_HOURS after login
+# and never past the end of the user timeslot
+REFRESH_TOKEN_EXPIRE_MINUTES = 60
+REFRESH_TOKEN_MAX_HOURS = 12
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -47,6 +72,7 @@ admin_group = wheel_group + (ROLE_ADMIN,)
 ############### Role levels ###############
 
 
+@metrics.BCRYPT_VERIFY_SECONDS.time()
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -55,9 +81,9 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-def get_user(username: str):
-    user_dict = ds.get_user_in_db(username)
-    return UserInDB(**user_dict.dict())
+def get_user(username: str) -> UserInDB | None:
+    # Validated once per users change, shared by the requests of this worker - not to be modified
+    return cache.get_user(username)
 
 
 def authenticate_user(username: str, password: str):
@@ -66,7 +92,7 @@ def authenticate_user(username: str, password: str):
         return False
     if not verify_password(password, user.hashed_password):
         return False
-    print("Returning user")
+    log.debug("User %s authenticated", username)
     return user
 
 
@@ -77,10 +103,68 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, secret_key(), algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def hash_refresh_token(refresh_token: str) -> str:
+    """Refresh tokens are random 256 bit strings, a plain sha256 is enough to store them"""
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def refresh_token_expiry(user: UserInDB, now: int, max_expires_at: int) -> int:
+    """Sliding expiry of a refresh token, capped at the family lifetime and the end of the timeslot"""
+    expires_at = min(now + REFRESH_TOKEN_EXPIRE_MINUTES * 60, max_expires_at)
+    if user.username not in admin_group:
+        expires_at = min(expires_at, user.end_time)
+    return expires_at
+
+
+def create_refresh_token(user: UserInDB, session_version: int) -> str:
+    """Start a new refresh token family for a login"""
+    now = timeutils.now()
+    max_expires_at = now + REFRESH_TOKEN_MAX_HOURS * 3600
+
+    refresh_token = secrets.token_urlsafe(32)
+    ds.add_refresh_token(
+        hash_refresh_token(refresh_token),
+        user.username,
+        secrets.token_hex(16),
+        session_version,
+        refresh_token_expiry(user, now, max_expires_at),
+        max_expires_at,
+    )
+    return refresh_token
+
+
+def issue_tokens(user: UserInDB) -> Token:
+    """Access & refresh token of a new session, older tokens of the user stop validating"""
+    session_version = sessions.new_session(user.username)
+
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.username, sessions.SESSION_CLAIM: session_version},
+        expires_delta=access_token_expires,
+    )
+
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        refresh_token=create_refresh_token(user, session_version),
+    )
+
+
+def create_queue_token(user: UserInDB) -> str:
+    """
+    Token admitting a user who logged in too early to the waiting queue, until the end of the timeslot
+
+    Only good for the queue: it has no session version, the API & the bot output stream reject it
+    """
+    return jwt.encode(
+        {"sub": user.username, "scope": QUEUE_SCOPE, "exp": user.end_time}, secret_key(), algorithm=ALGORITHM
+    )
+
+
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -88,23 +172,22 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, secret_key(), algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         # Check username registered
-        if username is None:
+        if username is None or payload.get("scope") == QUEUE_SCOPE:
             raise credentials_exception
 
-        # Allow only one user, check jwt against stored jwt
-        elif (username not in admin_group) and (ds.get_jwt(username)[0] != token):
-            # On multiple users using same account, remove the older login
-            ds.set_jwt(username, None)
+        # Allow only one user, check the token session version against the latest issued
+        elif (username not in admin_group) and not sessions.is_current(
+            username, payload.get(sessions.SESSION_CLAIM)
+        ):
+            # An older login of the account, the newer one stays valid
             raise credentials_exception
 
-        token_data = TokenData(username=username)
-
     except InvalidTokenError:
         raise credentials_exception
-    user = get_user(username=token_data.username)
+    user = get_user(username)
     if user is None:
         raise credentials_exception
     return user
@@ -116,11 +199,8 @@ async def get_current_active_user(
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
 
-    elif (current_user.username not in admin_group) and (
-        (
-            int(current_user.start_time) > int(datetime.now().strftime("%y%m%d%H%M%S"))
-            or int(current_user.end_time) < int(datetime.now().strftime("%y%m%d%H%M%S"))
-        )
+    elif (current_user.username not in admin_group) and not timeutils.in_timeslot(
+        current_user.start_time, current_user.end_time, timeutils.now()
     ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -161,9 +241,10 @@ async def admin_plus(current_user: Annotated[User, Depends(get_current_user)]):
     if current_user.username not in admin_group:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            details="Developer, root & admin endpoint only",
+            detail="Developer, root & admin endpoint only",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return current_user
 
 
 async def iot_bot_access(
@@ -209,38 +290,124 @@ async def ros_bot_access(
     )
 
 
-@router.post("/token")
+def too_many_attempts(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts, try again later",
+        headers={"Retry-After": str(max(1, round(retry_after)))},
+    )
+
+
+@router.post(
+    "/token",
+    responses={
+        401: {"description": "Incorrect username or password, or user disabled"},
+        403: {"description": "Outside the user timeslot"},
+        429: {"description": "Too many login attempts"},
+    },
+)
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], response_model=None
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], request: Request, response_model=None
 ):
 
-    user = authenticate_user(form_data.username, form_data.password)
+    # Rate limit before any bcrypt work is done
+    retry_after = limiter.admit(form_data.username, request.client.host if request.client else None)
+    if retry_after:
+        raise too_many_attempts(retry_after)
 
+    # Password check off the event loop, with a cap on concurrent verifications
+    user = await limiter.verify(authenticate_user, form_data.username, form_data.password)
+    if user is None:
+        raise too_many_attempts(1)
+
+    client = request.client.host if request.client else None
     if not user:
+        audit.record("login_failed", form_data.username, reason="password", client=client)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     elif user.disabled or user.blacklist:
+        audit.record("login_failed", user.username, reason="disabled", client=client)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User Disabled",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    elif (user.username not in admin_group) and (
-        (
-            int(user.start_time) > int(datetime.now().strftime("%y%m%d%H%M%S"))
-            or int(user.end_time) < int(datetime.now().strftime("%y%m%d%H%M%S"))
-        )
+    elif (user.username not in admin_group) and not timeutils.in_timeslot(
+        user.start_time, user.end_time, timeutils.now()
     ):
 
-        print(
-            int(user.start_time),
-            int(user.end_time),
-            int(datetime.now().strftime("%y%m%d%H%M%S")),
+        detail = {
+            "message": "Wait your turn",
+            "timeslot_start": user.start_time,
+            "timeslot_end": user.end_time,
+        }
+        # An upcoming slot can be waited for on socket.io instead of polling /token
+        if user.bot and user.start_time and user.start_time > timeutils.now():
+            detail["queue_token"] = create_queue_token(user)
+
+        audit.record("login_failed", user.username, user.bot or None, reason="timeslot", client=client)
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=detail,
+            headers={"WWW-Authenticate": "Bearer"},
         )
 
+    audit.record("login", user.username, user.bot or None, client=client)
+    return issue_tokens(user)
+
+
+
+@router.post(
+    "/token/refresh",
+    responses={
+        200: {"description": "New access & refresh token"},
+        401: {"description": "Invalid, expired, revoked or reused refresh token"},
+        403: {"description": "Timeslot over"},
+    },
+)
+async def refresh_access_token(request: RefreshRequest) -> Token:
+    """
+    Exchange a refresh token for a new access token without the password
+
+    Refresh tokens are single use, every call returns the next one of the family.
+    Presenting an already used token revokes the family and ends the session.
+    """
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    token_hash = hash_refresh_token(request.refresh_token)
+    stored = ds.get_refresh_token(token_hash)
+    if stored is None:
+        raise credentials_exception
+
+    username, family, session_version, expires_at, max_expires_at, used = stored
+    now = timeutils.now()
+
+    # Reuse of a rotated token, the token has leaked - end the session
+    if used:
+        audit.record("refresh_token_reused", username)
+        ds.delete_refresh_tokens(username)
+        sessions.revoke(username)
+        raise credentials_exception
+
+    # Expired, or the session ended by a logout / newer login
+    if expires_at < now or not sessions.is_current(username, session_version):
+        raise credentials_exception
+
+    user: UserInDB = ds.get_user_in_db(username)
+    if not user or user.disabled or user.blacklist:
+        raise credentials_exception
+
+    if (user.username not in admin_group) and not timeutils.in_timeslot(
+        user.start_time, user.end_time, now
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={
@@ -251,15 +418,23 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    refresh_token = secrets.token_urlsafe(32)
+    if not ds.rotate_refresh_token(
+        token_hash,
+        hash_refresh_token(refresh_token),
+        refresh_token_expiry(user, now, max_expires_at),
+    ):
+        # Lost a race against another use of the same token
+        ds.delete_refresh_tokens(username)
+        sessions.revoke(username)
+        raise credentials_exception
+
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, sessions.SESSION_CLAIM: session_version},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
 
-    # Store token data in database
-    ds.set_jwt(user.username, access_token)
-
-    return Token(access_token=access_token, token_type="bearer")
+    return Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
 
 
 @router.post(
@@ -284,12 +459,9 @@ async def add_user(
     return: User
     """
 
-    # Set a static past date (Oct 03, 2024) the date when this was implemented
-    datetime_const = datetime(2024, 10, 3, 12, 30).strftime("%y%m%d%H%M%S")
-
-    # Implemented to ensure no logins are possible before the initial timeslot allotement takes place
-    user.start_time = datetime_const
-    user.end_time = datetime_const
+    # Epoch 0 timeslot, ensures no logins are possible before the initial timeslot allotement takes place
+    user.start_time = timeutils.NO_TIMESLOT
+    user.end_time = timeutils.NO_TIMESLOT
 
     # Set bot to null str
     user.bot = ""
@@ -298,6 +470,7 @@ async def add_user(
     user.hashed_password = get_password_hash(user.username)
     try:
         ds.add_user(user)
+        audit.record("user_added", current_user.username, user=user.username)
         return ds.get_user_in_db(user.username)
     except sqlite3.IntegrityError:
         raise HTTPException(
@@ -347,6 +520,7 @@ async def set_password(
             user.username, get_password_hash(password)
         )
         if flag:
+            audit.record("password_changed", current_user.username, user=user.username)
             return flag
         else:
             raise HTTPException(
@@ -366,6 +540,7 @@ async def set_password(
             user.username, get_password_hash(password)
         )
         if flag:
+            audit.record("password_changed", current_user.username, user=user.username)
             return flag
         else:
             raise HTTPException(
@@ -390,12 +565,14 @@ async def set_password(
         200: {"description": "OK"},
     },
 )
-async def get_username(current_user: Annotated[User, Depends(get_current_active_user)]):
+async def get_username(request: Request, current_user: Annotated[User, Depends(get_current_active_user)]):
     """
 
     Get the authenticated user, associated bot, and allocated timeslot
     Raise HTTP Exception incase bot not allocated
 
+    Supports If-None-Match, the response carries an ETag and is cached until the user changes
+
 
     @return
         {
@@ -407,26 +584,18 @@ async def get_username(current_user: Annotated[User, Depends(get_current_active_
 
     """
 
+    # current_user was just read by the authentication, no need to fetch it again
     if current_user.username in admin_group:
-        return {"username": current_user.username, "bot": "*", "start_time": None, "end_time": None}
-
+        build = lambda: {"username": current_user.username, "bot": "*", "start_time": None, "end_time": None}
     else:
-        try:
-            user: User = ds.get_user(current_user.username)
-
-            return {
-                "username": user.username,
-                "bot": user.bot,
-                "start_time": user.start_time,
-                "end_time": user.end_time,
-            }
+        build = lambda: {
+            "username": current_user.username,
+            "bot": current_user.bot,
+            "start_time": current_user.start_time,
+            "end_time": current_user.end_time,
+        }
 
-        except:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="No bot or timeslot allocated",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+    return cache.json_response(request, "me", current_user.username, build)
 
 
 @router.get("/blacklist")
@@ -462,4 +631,16 @@ async def logout(current_user: Annotated[User, Depends(get_current_active_user)]
     return: status of the user
     """
     
-    return ds.set_jwt(current_user.username, None)
\ No newline at end of file
+    ds.delete_refresh_tokens(current_user.username)
+    audit.record("logout", current_user.username)
+    return sessions.revoke(current_user.username)
+
+
+@router.get("/token/limits")
+async def login_limits(current_user: Annotated[User, Depends(only_root_user)]) -> dict:
+    """
+    Login admission counters
+
+    return: admitted verifications, attempts limited per user / IP / busy, verifications in flight
+    """
+    return limiter.stats()
@@ -0,0 +1,96 @@
+# Created On: 2026, Oct 19
+# Cross-worker change counters shared through a memory mapped file
+
+import fcntl
+import mmap
+import os
+import struct
+
+from .. import config
+
+_COUNTER = struct.Struct("<Q")
+
+
+class SharedEpoch:
+    """
+    A 64 bit counter every worker process can read without a syscall
+
+    Writers bump the counter after changing shared state (sessions, users...),
+    readers compare it against the value they last saw to know when to drop local caches
+    """
+
+    def __init__(self, name: str):
+        self.path = os.path.join(config.RUN_DIR, f"rero-{name}.epoch")
+        self._fd: int | None = None
+        self._map: mmap.mmap | None = None
+
+    def _open(self) -> mmap.mmap:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < _COUNTER.size:
+            os.ftruncate(fd, _COUNTER.size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, _COUNTER.size)
+        return self._map
+
+    def value(self) -> int:
+        """Current value of the counter"""
+        return _COUNTER.unpack_from(self._map or self._open())[0]
+
+    def bump(self, amount: int = 1) -> int:
+        """Add `amount` to the counter (never below 0), return the new value"""
+        counter = self._map or self._open()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            value = max(0, _COUNTER.unpack_from(counter)[0] + amount)
+            _COUNTER.pack_into(counter, 0, value)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return value
+
+
+class SharedChangeLog(SharedEpoch):
+    """
+    A SharedEpoch followed by a ring of the last `size` changed keys (64 bit), one per bump
+
+    Readers drop only the cached entries of the keys that changed since the value they last saw,
+    or everything when more than `size` changes happened meanwhile
+    """
+
+    def __init__(self, name: str, size: int = 4096):
+        super().__init__(name)
+        self.size = size
+        self._ring = struct.Struct(f"<{size}Q")
+
+    def _open(self) -> mmap.mmap:
+        length = _COUNTER.size + self._ring.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < length:
+            os.ftruncate(fd, length)
+        self._fd = fd
+        self._map = mmap.mmap(fd, length)
+        return self._map
+
+    def record(self, key: int) -> int:
+        """Log a change of `key`, return the new value of the counter"""
+        log = self._map or self._open()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            value = _COUNTER.unpack_from(log)[0] + 1
+            # The key first, a reader seeing the new value finds it
+            _COUNTER.pack_into(log, _COUNTER.size + value % self.size * 8, key)
+            _COUNTER.pack_into(log, 0, value)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return value
+
+    def changes(self, since: int) -> tuple[int, list[int] | None]:
+        """(current value, keys changed after `since`), None for the keys when they are no longer all in the ring"""
+        log = self._map or self._open()
+        value = _COUNTER.unpack_from(log)[0]
+        if value - since > self.size or value < since:
+            return value, None
+        keys = [_COUNTER.unpack_from(log, _COUNTER.size + n % self.size * 8)[0] for n in range(since + 1, value + 1)]
+        # Overwritten by writers while being read
+        if _COUNTER.unpack_from(log)[0] - since > self.size:
+            return value, None
+        return value, keys
@@ -0,0 +1,150 @@
+# Created On: 2026, Oct 19
+# Structured, leveled logging - records are handed to a queue on the event loop and written out by a background thread
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+
+from .. import config
+
+# Root logger of the server modules ("app")
+ROOT_LOGGER = __name__.rsplit(".", 2)[0]
+
+# Values of these keys are never written out
+SECRET_KEYS = frozenset(
+    ("password", "hashed_password", "jwt", "token", "access_token", "refresh_token", "secret", "authorization")
+)
+
+# bcrypt hashes & JWTs inside messages
+SECRET_PATTERN = re.compile(r"\$2[aby]?\$\d\d\$[./A-Za-z0-9]{53}|eyJ[\w-]+\.[\w-]+\.[\w-]+")
+
+REDACTED = "***"
+
+# Attributes every LogRecord has, anything else came in through extra={...}
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def redact(value):
+    """Mask secrets in a logged value, dicts are masked by key"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in SECRET_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, str):
+        return SECRET_PATTERN.sub(REDACTED, value)
+    return value
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line (or key=value text), extra fields included, secrets redacted"""
+
+    def __init__(self, json_lines: bool = True):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                fields[key] = REDACTED if key.lower() in SECRET_KEYS else redact(value)
+        if record.exc_info:
+            fields["exc"] = redact(self.formatException(record.exc_info))
+
+        if self.json_lines:
+            return json.dumps(fields, default=str)
+        return " ".join(f"{key}={value}" for key, value in fields.items())
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue the record as is, formatting & redaction happen on the listener thread
+
+    The stock QueueHandler formats the message in the calling thread, i.e. on the event loop
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class Sampled:
+    """
+    Log only every n-th call, for high volume events such as bot output lines
+
+    The count check happens before any logging work, skipped calls cost an increment
+    """
+
+    def __init__(self, logger: logging.Logger, every: int):
+        self.logger = logger
+        self.every = max(1, every)
+        self.count = 0
+
+    def log(self, level: int, msg: str, *args, **extra):
+        self.count += 1
+        if (self.count - 1) % self.every == 0 and self.logger.isEnabledFor(level):
+            self.logger.log(level, msg, *args, extra={**extra, "sampled": self.every})
+
+    def debug(self, msg: str, *args, **extra):
+        self.log(logging.DEBUG, msg, *args, **extra)
+
+    def info(self, msg: str, *args, **extra):
+        self.log(logging.INFO, msg, *args, **extra)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def sampled(name: str, every: int = config.LOG_SAMPLE_EVERY) -> Sampled:
+    return Sampled(logging.getLogger(name), every)
+
+
+def setup():
+    """Route the server loggers through the queue, safe to call more than once"""
+    global _listener
+
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(StructuredFormatter(json_lines=config.LOG_FORMAT == "json"))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown)
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(config.LOG_LEVEL.upper())
+    logger.handlers[:] = [DeferredQueueHandler(records)]
+    logger.propagate = False
+
+
+def _after_fork():
+    """A forked worker has no listener thread, the next setup() starts its own"""
+    global _listener
+    _listener = None
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def shutdown():
+    """Flush the queued records"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,217 @@
+# Created On: 2026, Oct 19
+# Prometheus text-format metrics - counters, gauges & pre-bucketed histograms cheap enough for the hot paths
+
+import functools
+import inspect
+import time
+from bisect import bisect_left
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from .. import config
+
+router = APIRouter()
+
+# Latency buckets in seconds, from sub-millisecond DB reads up to slow bot RPCs
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REGISTRY: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    # Each worker of a multi-worker server counts on its own
+    if config.WORKER_ID is not None:
+        pairs.append(f'worker="{config.WORKER_ID}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """
+    Base of the metric types, values are kept per label-value tuple
+
+    Updates are plain dict / list operations without locks: the event loop is single threaded,
+    and updates from worker threads (bcrypt, to_thread calls) can at worst lose a rare increment
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        REGISTRY.append(self)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """Counter incremented by the code, or read from callback() at scrape time ({label tuple: value} or a number)"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), callback=None):
+        super().__init__(name, help, labels)
+        self.values: dict[tuple, float] = {}
+        self.callback = callback
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        values = self.values
+        if self.callback is not None:
+            values = self.callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in values.items()]
+
+
+class Gauge(Counter):
+    """Gauge set by the code, or read from callback() at scrape time"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+    def dec(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    """Fixed buckets, observe() is a bisect and three increments"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        # label tuple -> [per-bucket counts (last one is +Inf), sum, count]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, *labels):
+        """Decorator recording the duration of every call of a sync or async function"""
+
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    begin = time.perf_counter()
+                    try:
+                        return await fn(*args, **kwargs)
+                    finally:
+                        self.observe(time.perf_counter() - begin, *labels)
+
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                begin = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - begin, *labels)
+
+            return wrapper
+
+        return decorator
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.header())
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+############### Server metrics ###############
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "rero_http_request_duration_seconds", "HTTP request latency per route", ("method", "route", "status")
+)
+
+DB_QUERY_SECONDS = Histogram(
+    "rero_db_query_duration_seconds", "Time spent in database.operations per function", ("function",)
+)
+
+BCRYPT_VERIFY_SECONDS = Histogram("rero_bcrypt_verify_duration_seconds", "Password hash verification time")
+
+BOT_RPC_SECONDS = Histogram("rero_bot_rpc_duration_seconds", "Server to bot request latency", ("bot", "call"))
+
+BOT_RPC_ERRORS = Counter("rero_bot_rpc_errors_total", "Failed server to bot requests", ("bot", "call"))
+
+SOCKETIO_CLIENTS = Gauge("rero_socketio_connected_clients", "Connected socket.io clients")
+
+SOCKETIO_EMITS = Counter("rero_socketio_emits_total", "socket.io events emitted", ("event",))
+
+############### Server metrics ###############
+
+
+def db_timed(fn):
+    """Record the time of a database.operations function under its name"""
+    return DB_QUERY_SECONDS.time(fn.__name__)(fn)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every HTTP request per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        begin = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route is None:
+                route = "/socket.io" if scope["path"].startswith("/socket.io") else "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - begin, scope["method"], route, status_code)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the server metrics"""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,197 @@
+# Created On: 2026, Oct 19
+# On-demand sampling profiler - stacks of a fraction of requests aggregated per route, flamegraph (collapsed) output
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from .core import only_root_user
+from .schema import User
+
+router = APIRouter(prefix="/profiler")
+
+# Longest profiling window, the sampler stops on its own afterwards
+MAX_DURATION = 600
+
+# Stack samples of threads other than the event loop (to_thread work such as bcrypt) are kept under this route
+THREADS_ROUTE = "[threads]"
+
+# Innermost frames of threads blocked waiting for work (thread pool, log listener...), not worth a sample
+IDLE_FRAMES = ("_worker (", "dequeue (", "wait (", "select (")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    Samples the stacks of the event loop thread every `interval` seconds while enabled
+
+    Only requests picked by the middleware (with probability `fraction`) are attributed,
+    the middleware registers the frame of the picked request and the sampler looks it up by identity
+    in the sampled stack. When disabled the only cost is the `enabled` check in the middleware.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.fraction = 0.0
+        self.interval = 0.005
+        self.until = 0.0
+        self.loop_thread: int | None = None
+        self.samples = 0
+
+        # frame of a picked request -> its ASGI scope
+        self.active: dict = {}
+        # route -> collapsed stack -> samples, written by the sampler thread under the lock
+        self.stacks: dict[str, Counter] = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self, fraction: float, duration: float, interval: float):
+        self.stop()
+        self.fraction = fraction
+        self.interval = interval
+        self.until = time.monotonic() + duration
+        self.loop_thread = threading.get_ident()
+        with self._lock:
+            self.stacks.clear()
+        self.samples = 0
+        self.enabled = True
+        self._thread = threading.Thread(target=self._run, name="rero-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.enabled = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self.active.clear()
+
+    def _run(self):
+        own = threading.get_ident()
+        while self.enabled and time.monotonic() < self.until:
+            for thread, frame in sys._current_frames().items():
+                if thread != own:
+                    self._sample(thread, frame)
+            self.samples += 1
+            time.sleep(self.interval)
+        self.enabled = False
+
+    def _sample(self, thread: int, frame):
+        names = []
+        route = None
+        while frame is not None:
+            scope = self.active.get(frame)
+            if scope is not None:
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+            names.append(_frame_name(frame))
+            frame = frame.f_back
+
+        if thread != self.loop_thread:
+            if names and names[0].startswith(IDLE_FRAMES):
+                return
+            route = THREADS_ROUTE
+        elif route is None:
+            return
+
+        stack = ";".join(reversed(names))
+        with self._lock:
+            self.stacks[route][stack] += 1
+
+    def snapshot(self) -> dict[str, Counter]:
+        """Copy of the stacks, safe to iterate while the sampler runs"""
+        with self._lock:
+            return {name: stacks.copy() for name, stacks in self.stacks.items()}
+
+    def collapsed(self, route: str | None = None) -> str:
+        """Brendan Gregg's collapsed stack format, the route is the root frame"""
+        lines = []
+        for name, stacks in self.snapshot().items():
+            if route is None or name == route:
+                lines.extend(f"{name};{stack} {count}" for stack, count in stacks.most_common())
+        return "\n".join(lines) + "\n"
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "fraction": self.fraction,
+            "interval_ms": self.interval * 1e3,
+            "remaining_s": max(0.0, round(self.until - time.monotonic(), 1)) if self.enabled else 0.0,
+            "samples": self.samples,
+            "routes": {name: sum(stacks.values()) for name, stacks in self.snapshot().items()},
+        }
+
+
+profiler = Profiler()
+
+
+class ProfilerMiddleware:
+    """ASGI middleware picking the requests to profile, a no-op unless the profiler is enabled"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not profiler.enabled or scope["type"] != "http" or random.random() >= profiler.fraction:
+            return await self.app(scope, receive, send)
+
+        frame = sys._getframe()
+        profiler.active[frame] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.active.pop(frame, None)
+
+
+@router.post("/start")
+async def start_profiler(
+    current_user: Annotated[User, Depends(only_root_user)],
+    fraction: float = 0.1,
+    duration: float = 60,
+    interval_ms: float = 5,
+) -> dict:
+    """
+    Profile `fraction` of the requests for `duration` seconds, sampling every `interval_ms`
+
+    Previous samples are discarded
+    """
+    if not (0 < fraction <= 1 and 0 < duration <= MAX_DURATION and 1 <= interval_ms <= 1000):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"fraction must be in (0, 1], duration in (0, {MAX_DURATION}], interval_ms in [1, 1000]",
+        )
+
+    profiler.start(fraction, duration, interval_ms / 1e3)
+    return profiler.status()
+
+
+@router.post("/stop")
+async def stop_profiler(current_user: Annotated[User, Depends(only_root_user)]) -> dict:
+    """Stop sampling, the samples are kept until the next start"""
+    profiler.stop()
+    return profiler.status()
+
+
+@router.get("")
+async def profiler_status(current_user: Annotated[User, Depends(only_root_user)]) -> dict:
+    """Profiler state and samples per route"""
+    return profiler.status()
+
+
+@router.get("/stacks", response_class=PlainTextResponse)
+async def profiler_stacks(current_user: Annotated[User, Depends(only_root_user)], route: str | None = None):
+    """
+    Aggregated stacks in collapsed format, one "route;frame;...;frame count" line per stack
+
+    Feed to flamegraph.pl or speedscope
+    """
+    return PlainTextResponse(profiler.collapsed(route))
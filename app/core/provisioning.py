@@ -0,0 +1,254 @@
+# Created On: 2026, Oct 19
+# User administration - bulk import (rows validated up front, initial passwords hashed across a process pool, one insert
+# transaction) and the indexed user search
+
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Annotated, AsyncIterator
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from .. import config
+from ..database import operations as ds
+from . import audit, core, timeutils
+from .logs import get_logger
+from .schema import NewUser, User, UserInDB
+
+log = get_logger(__name__)
+
+router = APIRouter(prefix="/users")
+
+# Hashing progress is reported at most this often (seconds)
+PROGRESS_INTERVAL = 0.5
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def pool() -> ProcessPoolExecutor:
+    """
+    Processes hashing the passwords, started on the first import
+
+    forkserver: a plain fork would copy the event loop & the threads of the worker into every child
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, config.BULK_HASH_WORKERS), mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def parse_rows(content: bytes, json_format: bool) -> list[dict]:
+    """Rows of a CSV file with a header line, or of a JSON list of objects"""
+    text = content.decode("utf-8-sig")
+    if json_format:
+        rows = json.loads(text)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("expected a list of objects")
+        return rows
+
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"username", "date_of_birth"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(sorted(missing))}")
+    # Empty cells take the defaults
+    return [{key: value.strip() for key, value in row.items() if key and value and value.strip()} for row in reader]
+
+
+def validate(rows: list[dict]) -> tuple[list[tuple[int, UserInDB]], list[dict]]:
+    """Rows turned into new users, and a report for each rejected row (numbered from 1)"""
+    users = []
+    rejected = []
+    seen: dict[str, int] = {}
+    for number, row in enumerate(rows, 1):
+        try:
+            new_user = NewUser.model_validate(row)
+        except ValidationError as error:
+            errors = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+            rejected.append({"row": number, "username": row.get("username"), "status": "invalid", "error": errors})
+            continue
+
+        username = new_user.username.strip()
+        if not username or any(c.isspace() for c in username) or username in core.admin_group:
+            rejected.append({"row": number, "username": username, "status": "invalid", "error": "username not allowed"})
+        elif username in seen:
+            rejected.append(
+                {"row": number, "username": username, "status": "duplicate", "error": f"same as row {seen[username]}"}
+            )
+        else:
+            seen[username] = number
+            # Same initial state as POST /adduser: no timeslot, no bot, the username as password
+            users.append((number, UserInDB(
+                username=username,
+                date_of_birth=new_user.date_of_birth,
+                disabled=new_user.disabled,
+                blacklist=new_user.blacklist,
+                start_time=timeutils.NO_TIMESLOT,
+                end_time=timeutils.NO_TIMESLOT,
+                bot="",
+                hashed_password="",
+                jwt=None,
+            )))
+    return users, rejected
+
+
+def line(event: dict) -> bytes:
+    return orjson.dumps(event) + b"\n"
+
+
+async def provision(rows: list[dict], actor: str) -> AsyncIterator[bytes]:
+    """Import the rows for the user `actor`, yielding NDJSON progress events and a final summary"""
+    begin = time.perf_counter()
+    users, rejected = validate(rows)
+
+    # Usernames already taken are not worth hashing, the insert checks again
+    taken = await asyncio.to_thread(ds.existing_usernames, [user.username for _, user in users])
+    for number, user in users:
+        if user.username in taken:
+            rejected.append({"row": number, "username": user.username, "status": "duplicate", "error": "username exists"})
+    users = [(number, user) for number, user in users if user.username not in taken]
+
+    yield line({"stage": "validated", "rows": len(rows), "accepted": len(users), "rejected": len(rejected)})
+    for report in sorted(rejected, key=lambda report: report["row"]):
+        yield line(report)
+
+    loop = asyncio.get_running_loop()
+    futures = [loop.run_in_executor(pool(), core.get_password_hash, user.username) for _, user in users]
+    try:
+        done = 0
+        reported = time.monotonic()
+        for future in asyncio.as_completed(futures):
+            await future
+            done += 1
+            if done == len(futures) or time.monotonic() - reported > PROGRESS_INTERVAL:
+                reported = time.monotonic()
+                yield line({"stage": "hashing", "done": done, "total": len(futures)})
+    finally:
+        # The client went away, leave the pool to the other imports
+        for future in futures:
+            future.cancel()
+
+    for (_, user), future in zip(users, futures):
+        user.hashed_password = future.result()
+
+    try:
+        duplicates = set(await asyncio.to_thread(ds.add_users, [user for _, user in users])) if users else set()
+    except sqlite3.Error as error:
+        yield line({"stage": "failed", "error": str(error)})
+        return
+
+    # Taken by another writer while hashing
+    for number, user in users:
+        if user.username in duplicates:
+            yield line({"row": number, "username": user.username, "status": "duplicate", "error": "username exists"})
+
+    created = [user.username for _, user in users if user.username not in duplicates]
+    elapsed = time.perf_counter() - begin
+    audit.record("users_imported", actor, users=created, rejected=len(rows) - len(created))
+    log.info("Bulk import: %d users created, %d rows rejected in %.1fs", len(created), len(rows) - len(created), elapsed)
+    yield line({
+        "stage": "done",
+        "created": len(created),
+        "rejected": len(rows) - len(created),
+        "seconds": round(elapsed, 3),
+        "usernames": created,
+    })
+
+
+@router.post(
+    "/bulk",
+    responses={
+        200: {"description": "NDJSON progress events, the last one is the summary"},
+        400: {"description": "Unreadable file, missing columns or too many rows"},
+        401: {"description": "Not Authorized"},
+    },
+)
+async def bulk_add_users(current_user: Annotated[User, Depends(core.admin_plus)], file: UploadFile):
+    """
+    Create many users from a CSV (header: username, date_of_birth[, disabled, blacklist]) or a JSON list of objects
+
+    Users start like POST /adduser ones. Every rejected row (invalid, or a duplicate username) is reported on its own,
+    the other rows are still created. Progress streams back as one JSON object per line:
+    validated, rejected rows, hashing, done
+    """
+    json_format = (file.filename or "").endswith(".json") or file.content_type == "application/json"
+    try:
+        rows = parse_rows(await file.read(), json_format)
+    except (ValueError, csv.Error) as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unreadable file: {error}")
+
+    if len(rows) > config.BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {config.BULK_MAX_ROWS} rows per import",
+        )
+
+    return StreamingResponse(provision(rows, current_user.username), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/search",
+    responses={
+        200: {"description": "A page of users, `next` is the `after` of the following page"},
+        400: {"description": "Unknown field or limit out of range"},
+        401: {"description": "Not Authorized"},
+    },
+)
+async def search_users(
+    current_user: Annotated[User, Depends(core.admin_plus)],
+    prefix: str | None = None,
+    bot: str | None = None,
+    disabled: bool | None = None,
+    blacklist: bool | None = None,
+    slot_from: int | None = None,
+    slot_until: int | None = None,
+    after: str | None = None,
+    limit: int = 50,
+    fields: str | None = None,
+) -> dict:
+    """
+    Find users by username prefix, bot, disabled / blacklist flag & timeslot overlapping [slot_from, slot_until)
+    (epoch seconds), ordered by username
+
+    fields: comma separated columns to return (username, disabled, blacklist, start_time, end_time, date_of_birth,
+    bot), all of them by default
+    """
+    if not 0 < limit <= 1000:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="limit must be 1 to 1000")
+    columns = ds.USER_FIELDS
+    if fields:
+        columns = tuple(dict.fromkeys(field.strip() for field in fields.split(",")))
+        unknown = set(columns) - set(ds.USER_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {sorted(unknown)}")
+    # The cursor needs the username of the last row
+    selected = columns if "username" in columns else ("username", *columns)
+
+    rows = await asyncio.to_thread(
+        ds.search_users, prefix, bot, disabled, blacklist, slot_from, slot_until, after, limit, selected
+    )
+    users = [
+        {
+            column: bool(value) if column in ("disabled", "blacklist") else value
+            for column, value in zip(selected, row)
+            if column in columns
+        }
+        for row in rows
+    ]
+    return {"users": users, "next": rows[-1][0] if len(rows) == limit else None}
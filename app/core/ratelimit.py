@@ -0,0 +1,155 @@
+# Created On: 2026, Oct 19
+# Login admission control - token buckets per username / client IP and a cap on concurrent bcrypt verifications
+
+import asyncio
+import importlib
+import time
+from collections import OrderedDict
+
+from .. import config
+from . import metrics
+
+
+class MemoryBackend:
+    """
+    In-process token bucket state, key -> (tokens, last refill time), least recently used first
+
+    Any object with the same take() method can be plugged in instead (see load_backend)
+    to share the buckets between workers
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.max_keys = max_keys
+
+    def take(self, buckets: list[tuple[str, float, float]], now: float) -> list[float]:
+        """
+        Take one token from each (key, rate tokens/second, burst) bucket, only if every one of them has a token
+
+        return: per bucket, 0 if it has a token, otherwise the seconds until it has one (nothing is taken then)
+        """
+        levels = []
+        for key, rate, burst in buckets:
+            tokens, updated = self.buckets.get(key, (burst, now))
+            levels.append(min(burst, tokens + (now - updated) * rate))
+        waits = [0 if tokens >= 1 else (1 - tokens) / rate for tokens, (_, rate, _) in zip(levels, buckets)]
+
+        taken = 0 if any(waits) else 1
+        for tokens, (key, _, _) in zip(levels, buckets):
+            if key in self.buckets:
+                self.buckets.move_to_end(key)
+            elif len(self.buckets) >= self.max_keys:
+                # A spray of new keys evicts the oldest buckets instead of growing the dict
+                self.buckets.popitem(last=False)
+            self.buckets[key] = (tokens - taken, now)
+        return waits
+
+
+def load_backend(path: str | None):
+    """Backend from a "module:Class" path, the in-process backend if unset"""
+    if not path:
+        return MemoryBackend()
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+class LoginLimiter:
+    """
+    Admission control for password logins
+
+    Attempts are charged to a per-username and a per-IP bucket before any bcrypt work is done,
+    and at most max_verifications password checks run at once
+    """
+
+    def __init__(
+        self,
+        backend,
+        user_rate: float,
+        user_burst: float,
+        ip_rate: float,
+        ip_burst: float,
+        max_verifications: int,
+        verify_wait: float,
+    ):
+        self.backend = backend
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self.verify_wait = verify_wait
+        self.max_verifications = max_verifications
+        self._verifications = asyncio.Semaphore(max_verifications)
+        self.in_flight = 0
+
+        self.counters = {
+            "allowed": 0,
+            "limited_user": 0,
+            "limited_ip": 0,
+            "limited_busy": 0,
+        }
+
+    def admit(self, username: str, ip: str | None) -> float:
+        """
+        Charge a login attempt to the buckets of the username & client IP (if the IP limit is on),
+        nothing is charged unless both have a token
+
+        return: 0 if admitted, otherwise the seconds the client should wait (Retry-After)
+        """
+        buckets = [(f"user:{username.lower()}", self.user_rate, self.user_burst)]
+        if ip and self.ip_rate:
+            buckets.append((f"ip:{ip}", self.ip_rate, self.ip_burst))
+        waits = self.backend.take(buckets, time.monotonic())
+
+        if len(waits) > 1 and waits[1]:
+            self.counters["limited_ip"] += 1
+            return max(waits)
+        if waits[0]:
+            self.counters["limited_user"] += 1
+            return waits[0]
+        return 0
+
+    async def verify(self, fn, *args):
+        """
+        Run the password check fn(*args) in a worker thread, within the concurrency cap
+
+        return: result of fn, None if no verification slot freed up within verify_wait
+        """
+        try:
+            await asyncio.wait_for(self._verifications.acquire(), self.verify_wait)
+        except asyncio.TimeoutError:
+            self.counters["limited_busy"] += 1
+            return None
+
+        self.in_flight += 1
+        try:
+            self.counters["allowed"] += 1
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            self.in_flight -= 1
+            self._verifications.release()
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "max_verifications": self.max_verifications,
+        }
+
+
+limiter = LoginLimiter(
+    backend=load_backend(config.LOGIN_LIMITER_BACKEND),
+    user_rate=config.LOGIN_USER_PER_MINUTE / 60,
+    user_burst=config.LOGIN_USER_BURST,
+    ip_rate=config.LOGIN_IP_PER_MINUTE / 60,
+    ip_burst=config.LOGIN_IP_BURST,
+    max_verifications=config.LOGIN_MAX_VERIFICATIONS,
+    verify_wait=config.LOGIN_VERIFY_WAIT,
+)
+
+metrics.Counter(
+    "rero_login_attempts_total",
+    "Login attempts admitted to password verification, or limited per user / IP / busy",
+    ("outcome",),
+    callback=lambda: {(outcome,): count for outcome, count in limiter.counters.items()},
+)
+metrics.Gauge("rero_login_verifications_in_flight", "Password verifications running", callback=lambda: limiter.in_flight)
@@ -4,6 +4,11 @@ from pydantic import BaseModel
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class TokenData(BaseModel):
@@ -17,8 +22,8 @@ class User(BaseModel):
     username: Userid, unique id
     blacklist: blacklisted user
     disabled: disabled user
-    start_time: start time of the user timeslot for access
-    stop_time: end time of the user timeslot for access
+    start_time: start time of the user timeslot for access (UTC epoch seconds)
+    stop_time: end time of the user timeslot for access (UTC epoch seconds)
     date_of_birth: User date of birth
     bot: Bot access during the timeslot
     """
@@ -26,8 +31,8 @@ class User(BaseModel):
     username: str
     blacklist: bool = False
     disabled : bool = False
-    start_time: str | None
-    end_time: str | None
+    start_time: int | None
+    end_time: int | None
     date_of_birth: date
     bot: str | None
 
@@ -40,4 +45,18 @@ class UserInDB(User):
     jwt: jwt token last associated with user
     """
     hashed_password: str
-    jwt: str | None
\ No newline at end of file
+    jwt: str | None
+
+class NewUser(BaseModel):
+    """
+    NewUser class, a row of a bulk import
+
+    username: Userid, unique id
+    date_of_birth: User date of birth, needed to set the password
+    disabled / blacklist: Initial status of the user
+    """
+
+    username: str
+    date_of_birth: date
+    disabled: bool = False
+    blacklist: bool = False
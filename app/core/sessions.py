@@ -0,0 +1,78 @@
+# Created On: 2026, Oct 19
+# Single-session login - session versions carried in the JWT, checked against an in-memory map
+
+import hashlib
+
+from ..database import operations as ds
+from .epoch import SharedChangeLog
+
+# JWT claim holding the session version
+SESSION_CLAIM = "sv"
+
+# Logs the user of every session version change (login / logout / revoke) by any worker
+epoch = SharedChangeLog("sessions")
+
+# user key -> current session version, the entries of the users whose session changed are dropped
+versions: dict[int, int] = {}
+_seen_epoch: int | None = None
+
+
+def user_key(username: str) -> int:
+    return int.from_bytes(hashlib.blake2b(username.encode(), digest_size=8).digest(), "little")
+
+
+def _forget_changed():
+    """Drop the cached versions of the users whose session changed since the last look"""
+    global _seen_epoch
+
+    if epoch.value() == _seen_epoch:
+        return
+    if _seen_epoch is None:
+        _seen_epoch = epoch.value()
+        versions.clear()
+        return
+    _seen_epoch, changed = epoch.changes(_seen_epoch)
+    if changed is None:
+        versions.clear()
+    else:
+        for key in changed:
+            versions.pop(key, None)
+
+
+def current_version(username: str) -> int | None:
+    """Current session version of the user, the database is only read after a session change of this user"""
+    _forget_changed()
+
+    key = user_key(username)
+    version = versions.get(key)
+    if version is None:
+        version = ds.get_session_version(username)
+        if version is not None:
+            versions[key] = version
+    return version
+
+
+def is_current(username: str, version) -> bool:
+    """Check the session version of a token is the latest issued to the user"""
+    return version is not None and version == current_version(username)
+
+
+def new_session(username: str) -> int:
+    """Start a new session, every older token of the user stops validating"""
+    global _seen_epoch
+
+    _forget_changed()
+    version = ds.bump_session_version(username)
+    key = user_key(username)
+    changed = epoch.record(key)
+    if version is not None:
+        versions[key] = version
+        # Nothing else changed meanwhile, the entry just cached stays valid
+        if changed == _seen_epoch + 1:
+            _seen_epoch = changed
+    return version
+
+
+def revoke(username: str):
+    """End the current session of the user"""
+    new_session(username)
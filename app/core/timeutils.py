@@ -0,0 +1,59 @@
+# Created On: 2026, Oct 19
+# Timeslot timestamps - integer UTC epoch seconds, parsing of ISO 8601 & legacy strings
+
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from .. import config
+
+# Timezone for naive datetimes & the legacy yymmddhhmmss strings (the server's local time)
+LOCAL_TZ = ZoneInfo(config.TIMEZONE)
+
+# Format the timeslots were stored in before the epoch migration
+LEGACY_FORMAT = "%y%m%d%H%M%S"
+
+# Timeslot of users without an allotment, always in the past so no logins are possible
+NO_TIMESLOT = 0
+
+
+def now() -> int:
+    """Current UTC epoch seconds"""
+    return int(time.time())
+
+
+def legacy_to_epoch(value) -> int:
+    """Convert a stored yymmddhhmmss local time string to epoch seconds, NO_TIMESLOT if unset"""
+    try:
+        moment = datetime.strptime(str(value), LEGACY_FORMAT)
+    except ValueError:
+        return NO_TIMESLOT
+    return int(moment.replace(tzinfo=LOCAL_TZ).timestamp())
+
+
+def parse_timestamp(value: str) -> int:
+    """
+    Parse an ISO 8601 datetime (naive values are taken as local time) to epoch seconds
+
+    The legacy yymmddhhmmss format is still accepted for older clients
+
+    raises: ValueError
+    """
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        moment = datetime.strptime(value, LEGACY_FORMAT)
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=LOCAL_TZ)
+    return int(moment.timestamp())
+
+
+def to_iso(epoch: int) -> str:
+    """Epoch seconds to an ISO 8601 UTC string"""
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def in_timeslot(start_time: int | None, end_time: int | None, at: int) -> bool:
+    """Check an epoch timestamp lies within a timeslot"""
+    return (start_time or 0) <= at <= (end_time or 0)
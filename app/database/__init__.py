@@ -3,51 +3,195 @@ import sqlite3
 from datetime import date
 from typing import List
 
+from .. import config
 from ..core.schema import User, UserInDB
+from ..core.timeutils import legacy_to_epoch
+from ..core.logs import get_logger
+from .querylog import connect
+
+log = get_logger(__name__)
+
+
+# Original users table, new databases are created with it and brought up to date by the migrations
+LEGACY_USERS_TABLE_QUERY = '''
+CREATE TABLE users (
+    username TEXT PRIMARY KEY,
+    hashed_password TEXT NOT NULL,
+    disabled BOOL NOT NULL,
+    blacklist BOOL NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    date_of_birth DATE,
+    bot TEXT,
+    jwt TEXT
+);
+'''
+
+EPOCH_USERS_TABLE_QUERY = '''
+CREATE TABLE users (
+    username TEXT PRIMARY KEY,
+    hashed_password TEXT NOT NULL,
+    disabled BOOL NOT NULL,
+    blacklist BOOL NOT NULL,
+    start_time INTEGER NOT NULL DEFAULT 0,
+    end_time INTEGER NOT NULL DEFAULT 0,
+    date_of_birth DATE,
+    bot TEXT,
+    jwt TEXT
+);
+'''
+
+TIMESLOT_INDEX_QUERIES = (
+    "CREATE INDEX IF NOT EXISTS idx_users_start_time ON users (start_time);",
+    "CREATE INDEX IF NOT EXISTS idx_users_end_time ON users (end_time);",
+)
+
+
+def migrate_epoch_timeslots(cursor):
+    """
+    Schema v1: start_time / end_time from yymmddhhmmss local time TEXT to indexed INTEGER UTC epoch seconds
+
+    SQLite cannot change a column type, the table is rebuilt with the converted rows
+    """
+
+    cursor.execute("ALTER TABLE users RENAME TO users_legacy;")
+    cursor.execute(EPOCH_USERS_TABLE_QUERY)
+
+    cursor.execute("SELECT username, hashed_password, disabled, blacklist, start_time, end_time, date_of_birth, bot, jwt FROM users_legacy")
+    rows = [
+        row[:4] + (legacy_to_epoch(row[4]), legacy_to_epoch(row[5])) + row[6:]
+        for row in cursor.fetchall()
+    ]
+
+    cursor.executemany('''
+    INSERT INTO users (username, hashed_password, disabled, blacklist, start_time, end_time, date_of_birth, bot, jwt)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+    cursor.execute("DROP TABLE users_legacy;")
+    for query in TIMESLOT_INDEX_QUERIES:
+        cursor.execute(query)
+
+    log.info("DB: Converted %d timeslots to epoch timestamps", len(rows))
+
+
+def migrate_session_versions(cursor):
+    """Schema v2: per-user session version, carried in the JWT to enforce a single login"""
+
+    cursor.execute("ALTER TABLE users ADD COLUMN session_version INTEGER NOT NULL DEFAULT 0;")
+
+
+def migrate_refresh_tokens(cursor):
+    """
+    Schema v3: refresh tokens, stored as sha256 hashes
+
+    family: tokens rotated from the same login, revoked together on reuse
+    max_expires_at: absolute expiry of the family, the sliding expiry never passes it
+    """
+
+    cursor.execute('''
+    CREATE TABLE refresh_tokens (
+        token_hash TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        family TEXT NOT NULL,
+        session_version INTEGER NOT NULL,
+        expires_at INTEGER NOT NULL,
+        max_expires_at INTEGER NOT NULL,
+        used BOOL NOT NULL DEFAULT 0
+    );
+    ''')
+    cursor.execute("CREATE INDEX idx_refresh_tokens_username ON refresh_tokens (username);")
+    cursor.execute("CREATE INDEX idx_refresh_tokens_family ON refresh_tokens (family);")
+
+
+def migrate_user_search(cursor):
+    """
+    Schema v4: indexes of the admin user search (ops.search_users), results are ordered by username
+
+    Username prefixes range over the primary key. Slot windows range over the start_time index, bounded by the
+    longest slot (slot length index). Disabled & blacklisted users are few, partial indexes keep only them
+    """
+
+    cursor.execute("CREATE INDEX idx_users_bot ON users (bot, username);")
+    cursor.execute("CREATE INDEX idx_users_slot_length ON users (end_time - start_time);")
+    cursor.execute("CREATE INDEX idx_users_disabled ON users (username) WHERE disabled = 1;")
+    cursor.execute("CREATE INDEX idx_users_blacklist ON users (username) WHERE blacklist = 1;")
+
+
+# Schema migrations, PRAGMA user_version holds the number of migrations applied
+MIGRATIONS = (
+    migrate_epoch_timeslots,
+    migrate_session_versions,
+    migrate_refresh_tokens,
+    migrate_user_search,
+)
+
+
+# Seconds a worker waits for another one to finish creating or migrating the database
+INIT_LOCK_TIMEOUT = 120
+
+
+def migrate(sqliteConnection):
+    """
+    Apply the pending schema migrations, each in its own transaction
+
+    Workers start together: each step takes the write lock first (BEGIN IMMEDIATE) and reads the version under it,
+    a migration another worker applied meanwhile is never run twice
+    """
+
+    cursor = sqliteConnection.cursor()
+    while True:
+        cursor.execute("BEGIN IMMEDIATE;")
+        try:
+            version = cursor.execute("PRAGMA user_version;").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                cursor.execute("COMMIT;")
+                return
+            log.info("DB: Migrating schema to version %d", version + 1)
+            MIGRATIONS[version](cursor)
+            cursor.execute(f"PRAGMA user_version = {version + 1};")
+            cursor.execute("COMMIT;")
+        except Exception:
+            cursor.execute("ROLLBACK;")
+            raise
+
 
 def init():
+    """
+    Create or migrate the schema & seed the top level users, called once at startup by every worker
+
+    Idempotent: an up to date database is left untouched after the table & version check.
+    Raises on failure, a worker must not serve a database it could not bring up to date
+    """
     sqliteConnection = None
 
     try:
-        sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+        sqliteConnection = connect()
         cursor = sqliteConnection.cursor()
-        print('DB: Init')
+        # A migration of a big table by another worker takes longer than the usual busy timeout
+        cursor.execute(f"PRAGMA busy_timeout = {INIT_LOCK_TIMEOUT * 1000};")
 
-        # Check if the table exists
+        # Check if the table exists, under the write lock so only one worker creates it
+        cursor.execute("BEGIN IMMEDIATE;")
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users';")
-        table_exists = cursor.fetchone()
-
-        if table_exists:
-            # Write a query and execute it with cursor
-            query = 'select sqlite_version();'
-            cursor.execute(query)
-        else:
-            print('Table does not exist.')         
-            
-            # Create the table
-            create_table_query = '''
-            CREATE TABLE users (
-                username TEXT PRIMARY KEY,
-                hashed_password TEXT NOT NULL,
-                disabled BOOL NOT NULL,
-                blacklist BOOL NOT NULL,
-                start_time TEXT,
-                end_time TEXT,
-                date_of_birth DATE,
-                bot TEXT,
-                jwt TEXT
-            );
-            '''
-
-            cursor.execute(create_table_query)
-            sqliteConnection.commit()
-            print('Table created successfully.')
+        created = cursor.fetchone() is None
+        if created:
+            log.info("DB: Table does not exist")
+            # Create the original table, the migrations bring it to the current schema version
+            cursor.execute(LEGACY_USERS_TABLE_QUERY)
+        cursor.execute("COMMIT;")
+
+        # Bring older (or just created) databases up to the current schema
+        migrate(sqliteConnection)
+
+        if created:
+            log.info("DB: Table created successfully")
 
             def add_top_level_user(values):
 
                 # Insert root user into the table
                 query = '''
-                INSERT INTO users (username, hashed_password, disabled, blacklist, start_time, end_time, date_of_birth, bot, jwt)
+                INSERT OR IGNORE INTO users (username, hashed_password, disabled, blacklist, start_time, end_time, date_of_birth, bot, jwt)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 '''
                 # Execute the query with the user data
@@ -57,30 +201,26 @@ def init():
 
             # Add the root user
             add_top_level_user(("root", '$2b$12$7GcEqfDu5/.Kfrtsd0r68OAEcp2kMiyNDbba95aosOkrN5laurui2', 0, 0, 0, 0, date(year=2024, month=10, day=10), "", ""))
-            print('DB: Root user created successfully.')
+            log.info("DB: Root user created successfully")
 
             # Add the developer
             add_top_level_user(("developer", '$2b$12$XrlrGZEcqcBgjtI09Xaz0edKKfay7VklOXtcMWFxN1c8fOWQRdkHa', 0, 0, 0, 0, date(year=2024, month=10, day=10), "", ""))
-            print('DB: Developer created successfully.')
+            log.info("DB: Developer created successfully")
 
             # Add the admin user
             add_top_level_user(("admin", '$2b$12$f4SAGmDqVhHurbiGM/D.mOc1zLtvNM9JQTjPMH/JkjsP2KIWUN5aC', 0, 0, 0, 0, date(year=2024, month=10, day=10), "", ""))
-            print('DB: Admin created successfully.')
+            log.info("DB: Admin created successfully")
 
-    # Handle errors
+    # Handle errors, the startup fails with them
     except sqlite3.Error as error:
-        print('DB: Error occurred - ', error)
+        log.error("DB: Error occurred - %s", error)
+        raise
 
-    
     except Exception as e:
-        print("DB: Non SQL Exception -", e)
+        log.exception("DB: Non SQL Exception - %s", e)
+        raise
 
     finally:
 
         if sqliteConnection:
             sqliteConnection.close()
-            print('DB: SQLite Connection closed')
-
-
-
-init()
\ No newline at end of file
@@ -0,0 +1,82 @@
+# Created On: 2026, Oct 19
+# Admin endpoints over the database query statistics
+
+import asyncio
+from typing import Annotated
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from ..core.core import admin_plus, only_root_user
+from ..core.schema import User
+from . import audit, querylog
+
+router = APIRouter(prefix="/db")
+
+# Orderings accepted by GET /db/queries
+QUERY_ORDERS = ("total", "max", "calls", "rows", "busy_retries", "slow")
+
+
+@router.get("/queries")
+async def top_queries(
+    current_user: Annotated[User, Depends(only_root_user)], order: str = "total", limit: int = 20
+) -> list[dict]:
+    """Statements since start (or the last reset) by total time, or by max / calls / rows / busy_retries / slow"""
+    if order not in QUERY_ORDERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"order must be one of {', '.join(QUERY_ORDERS)}",
+        )
+    return querylog.top(max(1, limit), order)
+
+
+@router.get("/slow")
+async def slow_queries(current_user: Annotated[User, Depends(only_root_user)]) -> list[dict]:
+    """Latest slow queries with their query plan, newest first"""
+    return list(reversed(querylog.slow_queries))
+
+
+@router.post("/queries/reset")
+async def reset_queries(current_user: Annotated[User, Depends(only_root_user)]) -> bool:
+    """Clear the statistics, e.g. before measuring a change"""
+    querylog.reset()
+    return True
+
+
+@router.get("/audit")
+async def audit_events(
+    current_user: Annotated[User, Depends(admin_plus)],
+    username: str | None = None,
+    bot: str | None = None,
+    event: str | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    before: str | None = None,
+    limit: int = 100,
+) -> dict:
+    """
+    Audit events, newest first, filtered by any of user, bot, event & time range (epoch seconds)
+
+    Events reach the log within RERO_AUDIT_FLUSH_INTERVAL seconds. Next page: the `next` of a response as `before`
+    """
+    if not 0 < limit <= 1000:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="limit must be 1 to 1000")
+    cursor = None
+    if before:
+        try:
+            ts, _, event_id = before.partition(":")
+            cursor = (float(ts), int(event_id))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    rows = await asyncio.to_thread(audit.get_events, username, bot, event, since, until, cursor, limit)
+    return {
+        "events": [
+            {
+                "id": event_id, "ts": ts, "event": name, "username": user, "bot": bot_name,
+                "detail": orjson.loads(detail) if detail else None,
+            }
+            for event_id, ts, name, user, bot_name, detail in rows
+        ],
+        "next": f"{rows[-1][1]!r}:{rows[-1][0]}" if len(rows) == limit else None,
+    }
@@ -0,0 +1,112 @@
+# Created On: 2026, Oct 19
+# Audit log - append-only event rows in their own database, written in batches by app.core.audit
+
+from .. import config
+from ..core.logs import get_logger
+from ..core.metrics import db_timed
+from .querylog import connect
+
+log = get_logger(__name__)
+
+EVENTS_TABLE_QUERY = '''
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    event TEXT NOT NULL,
+    username TEXT,
+    bot TEXT,
+    detail TEXT
+)
+'''
+
+# Queries filter on one of user / bot / event and a time range, newest first: the rowid ends every index entry,
+# so (column, ts, id) order comes straight from the index
+EVENTS_INDEX_QUERIES = (
+    "CREATE INDEX IF NOT EXISTS events_user ON events (username, ts)",
+    "CREATE INDEX IF NOT EXISTS events_bot ON events (bot, ts)",
+    "CREATE INDEX IF NOT EXISTS events_event ON events (event, ts)",
+    "CREATE INDEX IF NOT EXISTS events_ts ON events (ts)",
+)
+
+
+def init():
+    """Create the audit database, called once at startup"""
+    sqliteConnection = None
+    try:
+        sqliteConnection = connect(config.AUDIT_DB_PATH)
+        sqliteConnection.execute("PRAGMA journal_mode=WAL;")
+        sqliteConnection.execute(EVENTS_TABLE_QUERY)
+        for query in EVENTS_INDEX_QUERIES:
+            sqliteConnection.execute(query)
+        sqliteConnection.commit()
+    finally:
+        if sqliteConnection:
+            sqliteConnection.close()
+
+
+@db_timed
+def add_events(rows: list[tuple]):
+    """
+    Append a batch of events in one transaction (one fsync for the whole batch)
+
+    param: (ts, event, username, bot, detail) tuples
+    exceptions: sqlite3 Error, nothing is written
+    """
+    sqliteConnection = None
+    try:
+        sqliteConnection = connect(config.AUDIT_DB_PATH)
+        # WAL + NORMAL: durable at checkpoints, a power cut loses at most the last batches, never corrupts
+        sqliteConnection.execute("PRAGMA synchronous=NORMAL;")
+        sqliteConnection.executemany(
+            "INSERT INTO events (ts, event, username, bot, detail) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        sqliteConnection.commit()
+    finally:
+        if sqliteConnection:
+            sqliteConnection.close()
+
+
+@db_timed
+def get_events(
+    username: str | None = None,
+    bot: str | None = None,
+    event: str | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    before: tuple[float, int] | None = None,
+    limit: int = 100,
+) -> list[tuple]:
+    """
+    Events matching every given filter, newest first
+
+    before: (ts, id) of the last event of the previous page
+    return: (id, ts, event, username, bot, detail) rows
+    """
+    where, params = [], []
+    for column, value in (("username", username), ("bot", bot), ("event", event)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        where.append("ts >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("ts < ?")
+        params.append(until)
+    if before is not None:
+        where.append("(ts, id) < (?, ?)")
+        params.extend(before)
+
+    query = "SELECT id, ts, event, username, bot, detail FROM events"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY ts DESC, id DESC LIMIT ?"
+    params.append(limit)
+
+    sqliteConnection = None
+    try:
+        sqliteConnection = connect(config.AUDIT_DB_PATH)
+        return sqliteConnection.execute(query, params).fetchall()
+    finally:
+        if sqliteConnection:
+            sqliteConnection.close()
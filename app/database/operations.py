@@ -3,9 +3,20 @@ import sqlite3
 from datetime import date
 from typing import List
 
+from .. import config
 from ..core.schema import User, UserInDB
+from ..core.metrics import db_timed
+from ..core.logs import get_logger
+from ..core.epoch import SharedEpoch
+from .querylog import connect
 
+log = get_logger(__name__)
 
+# Bumped after every write to the users table, the workers drop their cached users & responses
+users_epoch = SharedEpoch("users")
+
+
+@db_timed
 def add_user(user: UserInDB):
     """
     Function to add a new user into the database
@@ -19,9 +30,8 @@ def add_user(user: UserInDB):
     
     try:
         # Connect to DB and create a cursor
-        sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+        sqliteConnection = connect()
         cursor = sqliteConnection.cursor()
-        print('DB Init')
 
         # Write a query to insert the user data into the table
         query = '''
@@ -31,8 +41,9 @@ def add_user(user: UserInDB):
         # Execute the query with the user data
         cursor.execute(query, (user.username, user.hashed_password, user.disabled, user.blacklist, user.start_time, user.end_time, user.date_of_birth, user.bot, user.jwt))
         sqliteConnection.commit()
+        users_epoch.bump()
         
-        print('User added successfully to the database.')
+        log.info("DB: User %s added successfully", user.username)
 
         # Close the cursor
         cursor.close()
@@ -41,34 +52,110 @@ def add_user(user: UserInDB):
 
     # Catch  integrity error - unique key repetition
     except sqlite3.IntegrityError as error:
-        print('Unique key violation occurred -', error)
+        log.warning("DB: Unique key violation occurred - %s", error)
         raise sqlite3.IntegrityError
 
     # Catch other SQL errors
     except sqlite3.Error as error:
-        print('Error occurred -', error)
+        log.error("DB: Error occurred - %s", error)
 
     # General exception
     except Exception as e:
-        print("Non SQL Exception -", e)
+        log.exception("DB: Non SQL Exception - %s", e)
 
     finally:
 
         if sqliteConnection:
             sqliteConnection.close()
-            print('SQLite Connection closed')
 
     return success_flag
 
+def _existing_usernames(cursor, usernames: List[str]) -> set:
+    existing = set()
+    # Stay under SQLITE_MAX_VARIABLE_NUMBER
+    for i in range(0, len(usernames), 500):
+        chunk = usernames[i:i + 500]
+        query = f"SELECT username FROM users WHERE username IN ({', '.join('?' * len(chunk))})"
+        cursor.execute(query, chunk)
+        existing.update(row[0] for row in cursor.fetchall())
+    return existing
+
+
+@db_timed
+def existing_usernames(usernames: List[str]) -> set:
+    """The usernames of the list already in the database"""
+
+    sqliteConnection = None
+
+    try:
+        sqliteConnection = connect()
+        return _existing_usernames(sqliteConnection.cursor(), usernames)
+
+    finally:
+
+        if sqliteConnection:
+            sqliteConnection.close()
+
+
+@db_timed
+def add_users(users: List[UserInDB]) -> List[str]:
+    """
+    Add many users in a single transaction, usernames already taken are skipped
+
+    param: List[UserInDB]
+    return: usernames skipped as duplicates
+    exceptions: sqlite3 Error, nothing is inserted
+    """
+    duplicates: List[str] = []
+    sqliteConnection = None
+
+    try:
+        sqliteConnection = connect()
+        cursor = sqliteConnection.cursor()
+
+        # Take the write lock first, no other writer can add one of the usernames between the check & the insert
+        cursor.execute("BEGIN IMMEDIATE")
+
+        taken = _existing_usernames(cursor, [user.username for user in users])
+        duplicates = [user.username for user in users if user.username in taken]
+        query = '''
+        INSERT INTO users (username, hashed_password, disabled, blacklist, start_time, end_time, date_of_birth, bot, jwt)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+        cursor.executemany(
+            query,
+            [
+                (user.username, user.hashed_password, user.disabled, user.blacklist, user.start_time, user.end_time, user.date_of_birth, user.bot, user.jwt)
+                for user in users if user.username not in taken
+            ],
+        )
+        sqliteConnection.commit()
+        users_epoch.bump()
+
+        log.info("DB: %d users added, %d duplicates skipped", len(users) - len(taken), len(taken))
+
+    except sqlite3.Error as error:
+        log.error("DB: Error occurred - %s", error)
+        if sqliteConnection:
+            sqliteConnection.rollback()
+        raise
+
+    finally:
+
+        if sqliteConnection:
+            sqliteConnection.close()
+
+    return duplicates
+
+@db_timed
 def get_users() -> List[User]:
     
         users: List[User] = []
         sqliteConnection = None
     
         try:
-            sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+            sqliteConnection = connect()
             cursor = sqliteConnection.cursor()
-            print('Connected to DB')
     
             # Write a query to fetch all the users
             query = "SELECT * FROM users"
@@ -83,37 +170,115 @@ def get_users() -> List[User]:
                     user = User(username=user_details[0], hashed_password=user_details[1], disabled=user_details[2], blacklist=user_details[3], start_time=user_details[4], end_time=user_details[5], date_of_birth=user_details[6], bot=user_details[7])
                     users.append(user)
             else:
-                print("DB: No users found")
+                log.debug("DB: No users found")
             
         # Handle errors
         except sqlite3.Error as error:
-            print('DB: Error occurred - ', error)
+            log.error("DB: Error occurred - %s", error)
     
         
         except Exception as e:
-            print("DB: Non SQL Exception -", e)
+            log.exception("DB: Non SQL Exception - %s", e)
     
         finally:
     
             if sqliteConnection:
                 sqliteConnection.close()
-                print("DB: Connection Closed")
 
-            print(users)
     
             return users
 
 
+# Columns a user search may return, never the password hash nor the token
+USER_FIELDS = ("username", "disabled", "blacklist", "start_time", "end_time", "date_of_birth", "bot")
+
+# Slot window searches sort the candidate slots by username up to this many, past it walking the users in username
+# order finds a page sooner
+SLOT_SORT_MAX = 2000
+
+
+@db_timed
+def search_users(
+    prefix: str | None = None,
+    bot: str | None = None,
+    disabled: bool | None = None,
+    blacklist: bool | None = None,
+    slot_from: int | None = None,
+    slot_until: int | None = None,
+    after: str | None = None,
+    limit: int = 50,
+    fields: tuple = USER_FIELDS,
+) -> List[tuple]:
+    """
+    Users matching every given filter, ordered by username
+
+    prefix: of the username, case sensitive
+    slot_from, slot_until: epoch seconds, users with a timeslot overlapping the window
+    after: last username of the previous page
+    fields: columns of the returned rows, from USER_FIELDS
+    exceptions: sqlite3 Error
+    """
+    where, params = [], []
+    if prefix:
+        # A range over the primary key, LIKE would scan the table (it is case insensitive)
+        where.append("username >= ? AND username < ?")
+        params.extend((prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+    if after is not None:
+        where.append("username > ?")
+        params.append(after)
+    if bot is not None:
+        where.append("bot = ?")
+        params.append(bot)
+    # Literal flag terms, a partial index is only used when its WHERE appears as is
+    if disabled is not None:
+        where.append("disabled = 1" if disabled else "disabled = 0")
+    if blacklist is not None:
+        where.append("blacklist = 1" if blacklist else "blacklist = 0")
+
+    sqliteConnection = None
+
+    try:
+        sqliteConnection = connect()
+
+        if slot_from is not None or slot_until is not None:
+            # Users without a timeslot have 0 - 0, never overlapping
+            slot_from = slot_from or 0
+            # A slot overlapping the window started after slot_from - the longest slot
+            longest = sqliteConnection.execute("SELECT MAX(end_time - start_time) FROM users").fetchone()[0] or 0
+            low, high = slot_from - longest, slot_until if slot_until is not None else 2**62
+            candidates = sqliteConnection.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM users WHERE start_time > ? AND start_time < ? LIMIT ?)",
+                (low, high, SLOT_SORT_MAX),
+            ).fetchone()[0]
+            # Unary + keeps SQLite off an index
+            column = "+start_time" if candidates >= SLOT_SORT_MAX else "start_time"
+            where.append(f"+end_time > ? AND {column} > ? AND {column} < ?")
+            params.extend((slot_from, low, high))
+
+        query = f"SELECT {', '.join(fields)} FROM users"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY username LIMIT ?"
+        params.append(limit)
+
+        return sqliteConnection.execute(query, params).fetchall()
+
+    finally:
+
+        if sqliteConnection:
+            sqliteConnection.close()
+
+
 # TODO: Optimize this function to use get_user_in_db and remove the hashed_password
+@db_timed
 def get_user(username: str) -> User | None:
 
     user: User | None = None
     sqliteConnection = None
 
     try: 
-        sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+        sqliteConnection = connect()
         cursor = sqliteConnection.cursor()
-        print('Connected to DB')
 
         # Write a query to fetch the user details based on the username
         query = "SELECT * FROM users WHERE username = ?"
@@ -125,36 +290,34 @@ def get_user(username: str) -> User | None:
             # Create a User object with the fetched details
             # TODO: Check why hash_password is being added???
             user = UserInDB(username=user_details[0], hashed_password=user_details[1], disabled=user_details[2], blacklist=user_details[3], start_time=user_details[4], end_time=user_details[5], date_of_birth=user_details[6], bot=user_details[7], jwt=user_details[8])
-            print(user, type(user))
         else:
-            print("DB: User", username, "not found")
+            log.debug("DB: User %s not found", username)
         
     # Handle errors
     except sqlite3.Error as error:
-        print('DB: Error occurred - ', error)
+        log.error("DB: Error occurred - %s", error)
 
     
     except Exception as e:
-        print("DB: Non SQL Exception -", e)
+        log.exception("DB: Non SQL Exception - %s", e)
 
     finally:
 
         if sqliteConnection:
             sqliteConnection.close()
-            print("DB: Connection Closed")
 
         return user
 
 
+@db_timed
 def get_user_in_db(username: str) -> UserInDB | None:
 
     user: User | None = None
     sqliteConnection = None
 
     try: 
-        sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+        sqliteConnection = connect()
         cursor = sqliteConnection.cursor()
-        print('Connected to DB in get_user_in_db')
 
         # Write a query to fetch the user details based on the username
         query = "SELECT * FROM users WHERE username = ?"
@@ -165,35 +328,33 @@ def get_user_in_db(username: str) -> UserInDB | None:
         if user_details:
             # Create a User object with the fetched details
             user = UserInDB(username=user_details[0], hashed_password=user_details[1], disabled=user_details[2], blacklist=user_details[3], start_time=user_details[4], end_time=user_details[5], date_of_birth=user_details[6], bot=user_details[7], jwt=user_details[8])
-            print(user, type(user))
         else:
-            print("DB: User", username, "not found")
+            log.debug("DB: User %s not found", username)
         
     # Handle errors
     except sqlite3.Error as error:
-        print('DB: Error occurred - ', error)
+        log.error("DB: Error occurred - %s", error)
 
     
     except Exception as e:
-        print("DB: Non SQL Exception -", e)
+        log.exception("DB: Non SQL Exception - %s", e)
 
     finally:
 
         if sqliteConnection:
             sqliteConnection.close()
-            print("DB: Connection Closed")
 
         return user
 
+@db_timed
 def set_jwt(username: str, jwt: str):
     """Store the user jwt token"""
 
     sqliteConnection = None
 
     try:
-        sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+        sqliteConnection = connect()
         cursor = sqliteConnection.cursor()
-        print('DB: Init')
 
         # Update the jwt of the user
         query = "UPDATE users SET jwt = ? WHERE username = ?"
@@ -202,26 +363,27 @@ def set_jwt(username: str, jwt: str):
 
         # Check if any rows were affected
         if cursor.rowcount > 0:
-            print("DB: User", username, "jwt updated successfully")
+            users_epoch.bump()
+            log.info("DB: User %s jwt updated successfully", username)
         else:
-            print("DB: User", username, "not found")
+            log.debug("DB: User %s not found", username)
         
     # Handle errors
     except sqlite3.Error as error:
-        print('DB: Error occurred - ', error)
+        log.error("DB: Error occurred - %s", error)
         raise sqlite3.Error
     
     except Exception as e:
-        print("DB: Non SQL Exception -", e)
+        log.exception("DB: Non SQL Exception - %s", e)
         raise e
 
     finally:
 
         if sqliteConnection:
             sqliteConnection.close()
-            print("DB: Connection Closed")
 
 
+@db_timed
 def get_jwt(username):
     """Get the user jwt token"""
 
@@ -229,9 +391,8 @@ def get_jwt(username):
     sqliteConnection = None
 
     try:
-        sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+        sqliteConnection = connect()
         cursor = sqliteConnection.cursor()
-        print('DB: Init')
 
         # Write a query to fetch the jwt of the user
         query = "SELECT jwt FROM users WHERE username = ?"
@@ -240,36 +401,35 @@ def get_jwt(username):
 
         # Check if jwt exists
         if jwt:
-            print("DB: User", username, "jwt found")
+            log.debug("DB: User %s jwt found", username)
         else:
-            print("DB: User", username, "not found")
+            log.debug("DB: User %s not found", username)
         
     # Handle errors
     except sqlite3.Error as error:
-        print('DB: Error occurred - ', error)
+        log.error("DB: Error occurred - %s", error)
         raise sqlite3.Error
     
     except Exception as e:
-        print("DB: Non SQL Exception -", e)
+        log.exception("DB: Non SQL Exception - %s", e)
         raise e
 
     finally:
 
         if sqliteConnection:
             sqliteConnection.close()
-            print("DB: Connection Closed")
 
         return jwt
 
-def allot_timeslot(username: str, start_time: str, end_time: str, bot: str) -> User | None:
+@db_timed
+def allot_timeslot(username: str, start_time: int, end_time: int, bot: str) -> User | None:
     
         sqliteConnection = None
         user = None
     
         try:
-            sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+            sqliteConnection = connect()
             cursor = sqliteConnection.cursor()
-            print('DB: Init')
     
             # Update the start_time and end_time of the user
             query = "UPDATE users SET start_time = ?, end_time = ?, bot= ? WHERE username = ?"
@@ -278,37 +438,37 @@ def allot_timeslot(username: str, start_time: str, end_time: str, bot: str) -> U
     
             # Check if any rows were affected
             if cursor.rowcount > 0:
-                print("DB: User", username, "timeslot updated successfully")
+                users_epoch.bump()
+                log.info("DB: User %s timeslot updated successfully", username)
             else:
-                print("DB: User", username, "not found")
+                log.debug("DB: User %s not found", username)
             
         # Handle errors
         except sqlite3.Error as error:
-            print('DB: Error occurred - ', error)
+            log.error("DB: Error occurred - %s", error)
             raise sqlite3.Error
         
         except Exception as e:
-            print("DB: Non SQL Exception -", e)
+            log.exception("DB: Non SQL Exception - %s", e)
             raise e
     
         finally:
     
             if sqliteConnection:
                 sqliteConnection.close()
-                print("DB: Connection Closed")
     
             return user
         
 
+@db_timed
 def change_password(username: str, hashed_password: str) -> User | None:
     
         user = None
         sqliteConnection = None
     
         try:
-            sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+            sqliteConnection = connect()
             cursor = sqliteConnection.cursor()
-            print('DB: Init')
     
             # Update the password of the user
             query = "UPDATE users SET hashed_password = ? WHERE username = ?"
@@ -317,39 +477,39 @@ def change_password(username: str, hashed_password: str) -> User | None:
     
             # Check if any rows were affected
             if cursor.rowcount > 0:
-                print("DB: User", username, "password updated successfully")
+                users_epoch.bump()
+                log.info("DB: User %s password updated successfully", username)
                 user = get_user(username)
             else:
-                print("DB: User", username, "not found")
+                log.debug("DB: User %s not found", username)
                 return None
             
         # Handle errors
         except sqlite3.Error as error:
-            print('DB: Error occurred - ', error)
+            log.error("DB: Error occurred - %s", error)
             raise sqlite3.Error
         
         except Exception as e:
-            print("DB: Non SQL Exception -", e)
+            log.exception("DB: Non SQL Exception - %s", e)
             raise e
     
         finally:
     
             if sqliteConnection:
                 sqliteConnection.close()
-                print("DB: Connection Closed")
     
             return user
         
 
+@db_timed
 def set_user_blacklist(username: str, blacklist: bool) -> None:
     """Set the blacklist status of the user"""
 
     sqliteConnection = None
 
     try:
-        sqliteConnection = sqlite3.connect("/var/lib/sqlite/users.db")
+        sqliteConnection = connect()
         cursor = sqliteConnection.cursor()
-        print('DB: Init')
 
         # Update the blacklist status of the user
         query = "UPDATE users SET blacklist = ? WHERE username = ?"
@@ -358,21 +518,212 @@ def set_user_blacklist(username: str, blacklist: bool) -> None:
 
         # Check if any rows were affected
         if cursor.rowcount > 0:
-            print("DB: User", username, "blacklist updated successfully")
+            users_epoch.bump()
+            log.info("DB: User %s blacklist updated successfully", username)
         else:
-            print("DB: User", username, "not found")
+            log.debug("DB: User %s not found", username)
         
     # Handle errors
     except sqlite3.Error as error:
-        print('DB: Error occurred - ', error)
+        log.error("DB: Error occurred - %s", error)
         raise sqlite3.Error
     
     except Exception as e:
-        print("DB: Non SQL Exception -", e)
+        log.exception("DB: Non SQL Exception - %s", e)
         raise e
 
     finally:
 
         if sqliteConnection:
             sqliteConnection.close()
-            print("DB: Connection Closed")
+
+
+@db_timed
+def get_session_version(username: str) -> int | None:
+    """Get the current session version of the user"""
+
+    version = None
+    sqliteConnection = None
+
+    try:
+        sqliteConnection = connect()
+        cursor = sqliteConnection.cursor()
+
+        query = "SELECT session_version FROM users WHERE username = ?"
+        cursor.execute(query, (username,))
+        row = cursor.fetchone()
+
+        if row:
+            version = row[0]
+        else:
+            log.debug("DB: User %s not found", username)
+
+    # Handle errors
+    except sqlite3.Error as error:
+        log.error("DB: Error occurred - %s", error)
+        raise sqlite3.Error
+
+    finally:
+
+        if sqliteConnection:
+            sqliteConnection.close()
+
+    return version
+
+
+@db_timed
+def bump_session_version(username: str) -> int | None:
+    """Start a new session for the user, return the new session version"""
+
+    version = None
+    sqliteConnection = None
+
+    try:
+        sqliteConnection = connect()
+        cursor = sqliteConnection.cursor()
+
+        query = "UPDATE users SET session_version = session_version + 1 WHERE username = ? RETURNING session_version"
+        cursor.execute(query, (username,))
+        row = cursor.fetchone()
+        sqliteConnection.commit()
+
+        if row:
+            version = row[0]
+            log.info("DB: User %s session version updated successfully", username)
+        else:
+            log.debug("DB: User %s not found", username)
+
+    # Handle errors
+    except sqlite3.Error as error:
+        log.error("DB: Error occurred - %s", error)
+        raise sqlite3.Error
+
+    finally:
+
+        if sqliteConnection:
+            sqliteConnection.close()
+
+    return version
+
+
+@db_timed
+def add_refresh_token(token_hash: str, username: str, family: str, session_version: int, expires_at: int, max_expires_at: int) -> None:
+    """Store a new refresh token of a login, the previous logins' tokens are dropped"""
+
+    sqliteConnection = None
+
+    try:
+        sqliteConnection = connect()
+        cursor = sqliteConnection.cursor()
+
+        # Single session per user, older families are of no use anymore
+        cursor.execute("DELETE FROM refresh_tokens WHERE username = ? AND family != ?", (username, family))
+
+        query = '''
+        INSERT INTO refresh_tokens (token_hash, username, family, session_version, expires_at, max_expires_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        '''
+        cursor.execute(query, (token_hash, username, family, session_version, expires_at, max_expires_at))
+        sqliteConnection.commit()
+
+    # Handle errors
+    except sqlite3.Error as error:
+        log.error("DB: Error occurred - %s", error)
+        raise sqlite3.Error
+
+    finally:
+
+        if sqliteConnection:
+            sqliteConnection.close()
+
+
+@db_timed
+def get_refresh_token(token_hash: str) -> tuple | None:
+    """Get (username, family, session_version, expires_at, max_expires_at, used) of a refresh token"""
+
+    row = None
+    sqliteConnection = None
+
+    try:
+        sqliteConnection = connect()
+        cursor = sqliteConnection.cursor()
+
+        query = "SELECT username, family, session_version, expires_at, max_expires_at, used FROM refresh_tokens WHERE token_hash = ?"
+        cursor.execute(query, (token_hash,))
+        row = cursor.fetchone()
+
+    # Handle errors
+    except sqlite3.Error as error:
+        log.error("DB: Error occurred - %s", error)
+        raise sqlite3.Error
+
+    finally:
+
+        if sqliteConnection:
+            sqliteConnection.close()
+
+    return row
+
+
+@db_timed
+def rotate_refresh_token(token_hash: str, new_token_hash: str, expires_at: int) -> bool:
+    """
+    Mark a refresh token used and store its successor in the same family
+
+    return: False if the token was already used (concurrent reuse)
+    """
+
+    rotated = False
+    sqliteConnection = None
+
+    try:
+        sqliteConnection = connect()
+        cursor = sqliteConnection.cursor()
+
+        cursor.execute("UPDATE refresh_tokens SET used = 1 WHERE token_hash = ? AND used = 0", (token_hash,))
+
+        if cursor.rowcount > 0:
+            query = '''
+            INSERT INTO refresh_tokens (token_hash, username, family, session_version, expires_at, max_expires_at)
+            SELECT ?, username, family, session_version, ?, max_expires_at FROM refresh_tokens WHERE token_hash = ?
+            '''
+            cursor.execute(query, (new_token_hash, expires_at, token_hash))
+            rotated = True
+
+        sqliteConnection.commit()
+
+    # Handle errors
+    except sqlite3.Error as error:
+        log.error("DB: Error occurred - %s", error)
+        raise sqlite3.Error
+
+    finally:
+
+        if sqliteConnection:
+            sqliteConnection.close()
+
+    return rotated
+
+
+@db_timed
+def delete_refresh_tokens(username: str) -> None:
+    """Drop every refresh token of the user"""
+
+    sqliteConnection = None
+
+    try:
+        sqliteConnection = connect()
+        cursor = sqliteConnection.cursor()
+
+        cursor.execute("DELETE FROM refresh_tokens WHERE username = ?", (username,))
+        sqliteConnection.commit()
+
+    # Handle errors
+    except sqlite3.Error as error:
+        log.error("DB: Error occurred - %s", error)
+        raise sqlite3.Error
+
+    finally:
+
+        if sqliteConnection:
+            sqliteConnection.close()
@@ -0,0 +1,211 @@
+# Created On: 2026, Oct 19
+# Instrumented SQLite execution - per statement timing, row counts, SQLITE_BUSY retries & a slow-query log
+
+import functools
+import sqlite3
+import time
+from collections import deque
+
+from .. import config
+from ..core import metrics
+from ..core.logs import get_logger
+
+log = get_logger(__name__)
+
+# Statements worth an EXPLAIN QUERY PLAN when slow, transaction control / DDL / PRAGMA are not
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+# Slow queries kept for GET /db/slow
+SLOW_QUERY_HISTORY = 100
+
+BUSY_RETRIES = metrics.Counter("rero_db_busy_retries_total", "Statements retried after SQLITE_BUSY / SQLITE_LOCKED")
+
+SLOW_QUERIES = metrics.Counter("rero_db_slow_queries_total", "Statements slower than RERO_DB_SLOW_QUERY_MS")
+
+
+class QueryStats:
+    """Totals of one normalized statement"""
+
+    __slots__ = ("sql", "calls", "total", "max", "rows", "busy_retries", "slow")
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.busy_retries = 0
+        self.slow = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "sql": self.sql,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1e3, 3),
+            "mean_ms": round(self.total / self.calls * 1e3, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1e3, 3),
+            "rows": self.rows,
+            "busy_retries": self.busy_retries,
+            "slow": self.slow,
+        }
+
+
+# normalized statement -> totals
+stats: dict[str, QueryStats] = {}
+
+# Latest slow queries, newest last
+slow_queries: deque = deque(maxlen=SLOW_QUERY_HISTORY)
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize(sql: str) -> str:
+    """Statement text with whitespace collapsed, the key of its stats"""
+    return " ".join(sql.split())
+
+
+def is_busy(error: sqlite3.OperationalError) -> bool:
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error)
+
+
+def top(limit: int, order: str = "total") -> list[dict]:
+    """Statements with the largest `order` (total, max, calls, rows, busy_retries or slow) first"""
+    ranked = sorted(stats.values(), key=lambda entry: getattr(entry, order), reverse=True)
+    return [entry.to_dict() for entry in ranked[:limit]]
+
+
+def reset():
+    stats.clear()
+    slow_queries.clear()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor timing every statement and the fetches of its rows
+
+    A statement failing with SQLITE_BUSY is retried up to RERO_DB_BUSY_RETRIES times,
+    each attempt waits up to RERO_DB_BUSY_TIMEOUT in SQLite's busy handler
+    """
+
+    _entry: QueryStats | None = None
+    _parameters = ()
+    _elapsed = 0.0
+    _logged = False
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        return self._run(super().executemany, sql, seq_of_parameters, seq_of_parameters[0] if seq_of_parameters else ())
+
+    def _run(self, method, sql, parameters, first_parameters):
+        entry = stats.get(sql)
+        if entry is None:
+            key = normalize(sql)
+            entry = stats.get(key)
+            if entry is None:
+                entry = stats[key] = QueryStats(key)
+
+        retries = 0
+        begin = time.perf_counter()
+        try:
+            while True:
+                try:
+                    method(sql, parameters)
+                    break
+                except sqlite3.OperationalError as error:
+                    if retries >= config.DB_BUSY_RETRIES or not is_busy(error):
+                        raise
+                    retries += 1
+                    BUSY_RETRIES.inc()
+        finally:
+            elapsed = time.perf_counter() - begin
+            entry.calls += 1
+            entry.total += elapsed
+            entry.busy_retries += retries
+            if self.rowcount > 0:
+                entry.rows += self.rowcount
+
+            self._entry = entry
+            self._parameters = first_parameters
+            self._elapsed = elapsed
+            self._logged = False
+            self._check(entry)
+
+        return self
+
+    def _fetched(self, begin: float, rows: int):
+        entry = self._entry
+        if entry is None:
+            return
+        elapsed = time.perf_counter() - begin
+        entry.total += elapsed
+        entry.rows += rows
+        self._elapsed += elapsed
+        self._check(entry)
+
+    def _check(self, entry: QueryStats):
+        if self._elapsed > entry.max:
+            entry.max = self._elapsed
+        if self._logged or self._elapsed * 1e3 < config.DB_SLOW_QUERY_MS:
+            return
+
+        self._logged = True
+        entry.slow += 1
+        SLOW_QUERIES.inc()
+
+        plan = None
+        if entry.sql.lstrip("( ").upper().startswith(EXPLAINABLE):
+            try:
+                rows = sqlite3.Cursor(self.connection).execute("EXPLAIN QUERY PLAN " + entry.sql, self._parameters)
+                plan = [row[-1] for row in rows.fetchall()]
+            except sqlite3.Error as error:
+                plan = [f"unavailable: {error}"]
+
+        slow_queries.append(
+            {"ts": time.time(), "sql": entry.sql, "duration_ms": round(self._elapsed * 1e3, 3), "plan": plan}
+        )
+        log.warning(
+            "DB: Slow query %.1f ms - %s", self._elapsed * 1e3, entry.sql, extra={"plan": plan}
+        )
+
+    def fetchone(self):
+        begin = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(begin, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        begin = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(begin, len(rows))
+        return rows
+
+    def fetchall(self):
+        begin = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(begin, len(rows))
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection handing out InstrumentedCursor, including for the execute() shortcuts"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(path: str | None = None) -> InstrumentedConnection:
+    """sqlite3.connect() of the users database (or `path`) through the instrumented layer"""
+    return sqlite3.connect(
+        config.DB_PATH if path is None else path, timeout=config.DB_BUSY_TIMEOUT, factory=InstrumentedConnection
+    )
@@ -0,0 +1,149 @@
+# Created On: 2026, Oct 19
+# Telemetry chunks - numeric sensor samples stored column-wise, one row per sealed chunk, in their own database
+
+import sqlite3
+
+from .. import config
+from ..core.logs import get_logger
+from ..core.metrics import db_timed
+from .querylog import connect
+
+log = get_logger(__name__)
+
+# One row per chunk, the timestamps, values and per-block min / max / sum are float64 arrays packed in blobs.
+# Ids are drawn by the writing worker, a chunk has its id before it is saved
+CHUNKS_TABLE_QUERY = '''
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    bot TEXT NOT NULL,
+    username TEXT NOT NULL,
+    session INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    t_start REAL NOT NULL,
+    t_end REAL NOT NULL,
+    count INTEGER NOT NULL,
+    ts BLOB NOT NULL,
+    vals BLOB NOT NULL,
+    block_min BLOB NOT NULL,
+    block_max BLOB NOT NULL,
+    block_sum BLOB NOT NULL
+)
+'''
+
+# Range queries of one channel, the covering index answers them without reading the blobs
+CHUNKS_INDEX_QUERY = '''
+CREATE INDEX IF NOT EXISTS chunks_range ON chunks (bot, session, username, channel, t_start, t_end)
+'''
+
+CHUNK_COLUMNS = "id, t_start, t_end, count, ts, vals, block_min, block_max, block_sum"
+
+
+def init():
+    """Create the telemetry database, called once at startup"""
+    sqliteConnection = None
+    try:
+        sqliteConnection = connect(config.TELEMETRY_DB_PATH)
+        # Readers of other workers are not blocked by the chunk inserts
+        sqliteConnection.execute("PRAGMA journal_mode=WAL;")
+        sqliteConnection.execute(CHUNKS_TABLE_QUERY)
+        sqliteConnection.execute(CHUNKS_INDEX_QUERY)
+        sqliteConnection.commit()
+    finally:
+        if sqliteConnection:
+            sqliteConnection.close()
+
+
+@db_timed
+def add_chunks(rows: list[tuple]):
+    """
+    Insert sealed chunks in one transaction
+
+    param: (id, bot, username, session, channel, t_start, t_end, count, ts, vals, block_min, block_max, block_sum)
+    exceptions: sqlite3 Error
+    """
+    sqliteConnection = None
+    try:
+        sqliteConnection = connect(config.TELEMETRY_DB_PATH)
+        sqliteConnection.executemany(
+            "INSERT INTO chunks (id, bot, username, session, channel, t_start, t_end, count, ts, vals, "
+            "block_min, block_max, block_sum) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        sqliteConnection.commit()
+
+    except sqlite3.Error as error:
+        log.error("DB: Telemetry chunks not saved - %s", error)
+        raise
+
+    finally:
+        if sqliteConnection:
+            sqliteConnection.close()
+
+
+@db_timed
+def get_chunks(
+    bot: str, username: str, session: int, channel: str, start: float, end: float, skip: set[int] = frozenset()
+) -> list[tuple]:
+    """
+    Chunks of a channel overlapping [start, end], ordered by start
+
+    skip: ids already in memory, their blobs are not read
+    return: rows of CHUNK_COLUMNS, the blob columns are None for the skipped ids
+    """
+    sqliteConnection = None
+    try:
+        sqliteConnection = connect(config.TELEMETRY_DB_PATH)
+        cursor = sqliteConnection.cursor()
+        where = "bot = ? AND session = ? AND username = ? AND channel = ? AND t_start <= ? AND t_end >= ?"
+        params = (bot, session, username, channel, end, start)
+
+        ids = [row[0] for row in cursor.execute(f"SELECT id FROM chunks WHERE {where} ORDER BY t_start", params)]
+        wanted = [chunk_id for chunk_id in ids if chunk_id not in skip]
+        rows = {}
+        # Blobs of the chunks not in memory, by primary key
+        for offset in range(0, len(wanted), 500):
+            part = wanted[offset: offset + 500]
+            cursor.execute(
+                f"SELECT {CHUNK_COLUMNS} FROM chunks WHERE id IN ({', '.join('?' * len(part))})", part
+            )
+            rows.update((row[0], row) for row in cursor.fetchall())
+        return [rows.get(chunk_id, (chunk_id, None, None, None, None, None, None, None, None)) for chunk_id in ids]
+
+    finally:
+        if sqliteConnection:
+            sqliteConnection.close()
+
+
+@db_timed
+def get_extent(bot: str, username: str, session: int, channel: str) -> tuple[float, float] | None:
+    """(first, last) sample time stored for a channel, None without any chunk"""
+    sqliteConnection = None
+    try:
+        sqliteConnection = connect(config.TELEMETRY_DB_PATH)
+        row = sqliteConnection.execute(
+            "SELECT MIN(t_start), MAX(t_end) FROM chunks WHERE bot = ? AND session = ? AND username = ? AND channel = ?",
+            (bot, session, username, channel),
+        ).fetchone()
+        return None if row[0] is None else (row[0], row[1])
+
+    finally:
+        if sqliteConnection:
+            sqliteConnection.close()
+
+
+@db_timed
+def get_channels(bot: str, username: str | None = None) -> list[tuple]:
+    """(username, session, channel, samples, first, last) of the stored channels of a bot, newest session first"""
+    sqliteConnection = None
+    try:
+        sqliteConnection = connect(config.TELEMETRY_DB_PATH)
+        query = (
+            "SELECT username, session, channel, SUM(count), MIN(t_start), MAX(t_end) FROM chunks WHERE bot = ?"
+            + (" AND username = ?" if username is not None else "")
+            + " GROUP BY session, username, channel ORDER BY session DESC, channel"
+        )
+        return sqliteConnection.execute(query, (bot,) if username is None else (bot, username)).fetchall()
+
+    finally:
+        if sqliteConnection:
+            sqliteConnection.close()
@@ -1,17 +1,72 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .core import core
-from .communication import bot_comms ,code_comms, socket_io
-from .database import operations
+from .core import admission, audit, core, logs, metrics, profiler, provisioning, sessions
+from .communication import bot_comms ,code_comms, camera, delivery, prewarm, socket_io, telemetry, teleop, tracing, waiting
+from . import database
+from .database import admin as db_admin, operations
 from .timeslot import timeslot_manager
 
-app = FastAPI()
+
+async def warm_up():
+    """Fill the caches & load the backends the first requests of a new worker would otherwise wait for"""
+    core.pwd_context.handler().get_backend()
+    sessions.epoch.value()
+    await timeslot_manager.refresh_calendars()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup & shutdown of a worker, importing the app has no side effects
+
+    Logging first so the startup is logged, the secret is read here to fail at boot rather than at the first login
+    """
+    logs.setup()
+    database.init()
+    core.secret_key()
+    await warm_up()
+    audit.start()
+    socket_io.start()
+    waiting.start()
+    camera.start()
+    telemetry.start()
+    prewarm.start()
+    yield
+    prewarm.stop()
+    await telemetry.close()
+    await teleop.close()
+    camera.close()
+    waiting.stop()
+    socket_io.close()
+    provisioning.shutdown()
+    # Last, the steps above may still record events
+    await audit.close()
+    logs.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(profiler.ProfilerMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+# Outermost, the request latency metrics start once a request is admitted
+app.add_middleware(admission.AdmissionMiddleware)
 
 app.include_router(core.router)
+app.include_router(provisioning.router)
 app.include_router(timeslot_manager.router)
 app.include_router(code_comms.router)
 app.include_router(bot_comms.router)
+app.include_router(delivery.router)
+app.include_router(camera.router)
+app.include_router(teleop.router)
+app.include_router(telemetry.router)
+app.include_router(prewarm.router)
+app.include_router(metrics.router)
+app.include_router(profiler.router)
+app.include_router(tracing.router)
+app.include_router(db_admin.router)
 
 app.mount("", socket_io.socket_app)
-
@@ -0,0 +1,308 @@
+# Created On: 2026, Oct 19
+# Supervised multi-process server - uvicorn workers (uvloop / httptools) sharing one socket, rolling reload on SIGHUP
+#
+#   python -m app.server [--workers N] [--host 0.0.0.0] [--port 8080]
+#   python -m app.server reload      # graceful rolling reload of a running server, same as kill -HUP <pid>
+#   python -m app.server stop
+#
+# Workers import the app after the fork, a reload therefore picks up new code. Each new worker is started
+# and warmed up before an old one is asked to stop, the old one finishes its requests & pushes before exiting.
+
+import argparse
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from . import config
+from .core import logs
+from .core.logs import get_logger
+
+# __name__ is "__main__" under python -m, outside the "app" loggers
+log = get_logger(__spec__.name)
+
+APP = "app.main:app"
+
+PID_FILE = os.path.join(config.RUN_DIR, "rero-server.pid")
+
+# A worker exiting sooner than this after its start is respawned with a delay
+CRASH_WINDOW = 5.0
+
+
+class Worker(uvicorn.Server):
+    """uvicorn server reporting readiness to the supervisor & draining socket.io before its shutdown"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        # Runs the lifespan startup (database, warm up) before listening
+        await super().startup(sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+    async def shutdown(self, sockets=None):
+        from .communication import socket_io
+
+        await socket_io.drain()
+        await super().shutdown(sockets)
+
+
+class Process:
+    """A worker process seen from the supervisor"""
+
+    def __init__(self, pid: int, ready_fd: int):
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.started = time.monotonic()
+        self.deadline: float | None = None
+
+
+class Supervisor:
+    """
+    Keeps `workers` worker processes running on a socket bound once
+
+    SIGHUP: rolling reload, SIGTERM / SIGINT: graceful stop, dead workers are respawned
+    """
+
+    def __init__(self, host: str, port: int, workers: int, drain_timeout: float, boot_timeout: float):
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.drain_timeout = drain_timeout
+        self.boot_timeout = boot_timeout
+
+        self.sock: socket.socket | None = None
+        # Signals are written to this pipe, the main loop selects on it
+        self.wakeup_r: int | None = None
+        self.wakeup_w: int | None = None
+        self.running: dict[int, Process] = {}
+        # Workers asked to stop, still finishing their requests
+        self.draining: dict[int, Process] = {}
+        self.signals: list[int] = []
+
+    def bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def spawn(self) -> Process:
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            self.serve(ready_w)
+        os.close(ready_w)
+        process = Process(pid, ready_r)
+        self.running[pid] = process
+        return process
+
+    def serve(self, ready_fd: int):
+        """Worker process body, never returns"""
+        code = 0
+        try:
+            signal.set_wakeup_fd(-1)
+            os.close(self.wakeup_r)
+            os.close(self.wakeup_w)
+            for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            # A terminal hangup is for the supervisor to handle
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+            # The listener thread of the supervisor did not survive the fork
+            logs.setup()
+            # Metrics are per worker, scrapes answered by different workers must not mix their series
+            if self.workers > 1:
+                config.WORKER_ID = str(os.getpid())
+
+            server_config = uvicorn.Config(
+                APP,
+                loop="uvloop",
+                http="httptools",
+                ws="websockets",
+                lifespan="on",
+                access_log=False,
+                proxy_headers=True,
+                forwarded_allow_ips=config.FORWARDED_ALLOW_IPS,
+                timeout_graceful_shutdown=self.drain_timeout,
+            )
+            Worker(server_config, ready_fd).run(sockets=[self.sock])
+        except BaseException:
+            log.exception("Worker %d failed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+
+    def wait_ready(self, processes: list[Process]) -> list[Process]:
+        """Wait for the workers to finish starting, return the ones which failed"""
+        pending = {process.ready_fd: process for process in processes}
+        deadline = time.monotonic() + self.boot_timeout
+        ready = []
+        while pending and time.monotonic() < deadline:
+            readable, _, _ = select.select(list(pending), [], [], min(0.5, max(0.0, deadline - time.monotonic())))
+            for fd in readable:
+                # b"" when the worker exited before it was ready
+                if os.read(fd, 1):
+                    ready.append(pending[fd])
+                del pending[fd]
+                os.close(fd)
+        for fd in pending:
+            os.close(fd)
+        return [process for process in processes if process not in ready]
+
+    def stop(self, process: Process):
+        """Ask a worker to finish its requests & exit"""
+        self.running.pop(process.pid, None)
+        process.deadline = time.monotonic() + self.drain_timeout + 5
+        self.draining[process.pid] = process
+        try:
+            os.kill(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def reap(self) -> list[Process]:
+        """Collect exited workers, return the ones which were not asked to stop"""
+        died = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid in self.draining:
+                del self.draining[pid]
+            elif pid in self.running:
+                died.append(self.running.pop(pid))
+                log.warning("Worker %d exited unexpectedly (status %d)", pid, status)
+
+        now = time.monotonic()
+        for process in list(self.draining.values()):
+            if now > process.deadline:
+                log.warning("Worker %d still draining after %.0fs, killed", process.pid, self.drain_timeout)
+                try:
+                    os.kill(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                process.deadline = float("inf")
+        return died
+
+    def reload(self):
+        """Replace the workers one at a time, a new one must be ready before an old one stops"""
+        log.info("Rolling reload of %d workers", len(self.running))
+        for old in list(self.running.values()):
+            new = self.spawn()
+            if self.wait_ready([new]):
+                log.error("New worker %d failed to start, reload aborted", new.pid)
+                self.stop(new)
+                return
+            self.stop(old)
+            self.reap()
+        log.info("Reload done")
+
+    def on_signal(self, signum, frame):
+        self.signals.append(signum)
+
+    def run(self):
+        self.sock = self.bind()
+
+        # Workers share socket.io events through unix sockets unless a message queue is configured
+        if self.workers > 1 and not config.SOCKETIO_MESSAGE_QUEUE:
+            config.SOCKETIO_MESSAGE_QUEUE = "local"
+        # Polling requests of one client would land on different workers, without sticky sessions
+        if self.workers > 1 and config.SOCKETIO_TRANSPORTS != ["websocket"]:
+            log.warning("%d workers, socket.io restricted to the websocket transport", self.workers)
+            config.SOCKETIO_TRANSPORTS = ["websocket"]
+        config.SOCKETIO_GROUP = str(os.getpid())
+
+        with open(PID_FILE, "w") as f:
+            f.write(str(os.getpid()))
+
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        os.set_blocking(self.wakeup_r, False)
+        os.set_blocking(self.wakeup_w, False)
+        signal.set_wakeup_fd(self.wakeup_w)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self.on_signal)
+
+        log.info("Starting %d workers on %s:%d", self.workers, self.host, self.port)
+        begin = time.monotonic()
+        failed = self.wait_ready([self.spawn() for _ in range(self.workers)])
+        if failed:
+            log.error("%d workers failed to start", len(failed))
+        log.info("Workers ready in %.2fs", time.monotonic() - begin)
+
+        try:
+            while True:
+                # Woken up early by any signal, SIGCHLD included
+                if not self.signals:
+                    select.select([self.wakeup_r], [], [], 1)
+                try:
+                    os.read(self.wakeup_r, 512)
+                except BlockingIOError:
+                    pass
+
+                signals, self.signals = self.signals, []
+                if signal.SIGTERM in signals or signal.SIGINT in signals:
+                    break
+                if signal.SIGHUP in signals:
+                    self.reload()
+
+                for process in self.reap():
+                    if time.monotonic() - process.started < CRASH_WINDOW:
+                        time.sleep(1)
+                    self.wait_ready([self.spawn()])
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        log.info("Stopping %d workers", len(self.running))
+        for process in list(self.running.values()):
+            self.stop(process)
+        while self.draining:
+            self.reap()
+            time.sleep(0.1)
+        self.sock.close()
+        if os.path.exists(PID_FILE):
+            os.unlink(PID_FILE)
+
+
+def send(signum: int):
+    """Signal the running supervisor"""
+    with open(PID_FILE) as f:
+        os.kill(int(f.read()), signum)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RERO server")
+    parser.add_argument("command", nargs="?", default="run", choices=("run", "reload", "stop"))
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=config.WORKERS)
+    parser.add_argument("--drain-timeout", type=float, default=config.WORKER_DRAIN_TIMEOUT)
+    args = parser.parse_args()
+
+    if args.command == "reload":
+        return send(signal.SIGHUP)
+    if args.command == "stop":
+        return send(signal.SIGTERM)
+
+    logs.setup()
+    try:
+        Supervisor(args.host, args.port, args.workers, args.drain_timeout, config.WORKER_BOOT_TIMEOUT).run()
+    finally:
+        logs.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
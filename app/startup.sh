@@ -3,5 +3,5 @@ cd /rero/
 # Activate the environemnt
 . ./venv/bin/activate
 
-# Start the app
-uvicorn app.main:app --host 0.0.0.0 --port 8080
+# Start the app, one worker (RERO_WORKERS / --workers for more), reload with: python -m app.server reload
+python -m app.server --host 0.0.0.0 --port 8080
@@ -0,0 +1,228 @@
+# Created On: 2026, Oct 19
+# Per-bot free/busy bitmaps at minute granularity for timeslot availability queries
+
+from collections import defaultdict
+
+from ..core.epoch import SharedEpoch
+
+# One bit per minute of the day, bit i is the minute starting i minutes after (UTC) midnight
+MINUTES_PER_DAY = 24 * 60
+
+# Days are numbered from the epoch, day d covers epoch minutes [d * MINUTES_PER_DAY, (d + 1) * MINUTES_PER_DAY)
+
+
+def _bits(lo: int, hi: int) -> int:
+    """Bitmask with bits [lo, hi) set"""
+    if hi <= lo:
+        return 0
+    return ((1 << (hi - lo)) - 1) << lo
+
+
+def _minute_floor(epoch: int) -> int:
+    return epoch // 60
+
+
+def _minute_ceil(epoch: int) -> int:
+    return -(-epoch // 60)
+
+
+def _runs(mask: int):
+    """Yield (offset, length) of every run of set bits in mask, lowest first"""
+    while mask:
+        low = (mask & -mask).bit_length() - 1
+        shifted = mask >> low
+        length = (shifted ^ (shifted + 1)).bit_length() - 1
+        yield low, length
+        mask &= ~_bits(low, low + length)
+
+
+def _run_starts(mask: int, length: int) -> int:
+    """
+    Collapse mask so that bit i stays set only if bits [i, i + length) are all set
+
+    Uses log2(length) shift-and steps instead of scanning every bit
+    """
+    remaining = length - 1
+    step = 1
+    while remaining > 0 and mask:
+        shift = min(step, remaining)
+        mask &= mask >> shift
+        remaining -= shift
+        step *= 2
+    return mask
+
+
+class BotCalendar:
+    """
+    Busy bitmaps for a single bot, all times are UTC epoch seconds
+
+    days: day number -> busy bitmap of that day
+    bookings: username -> (start, end) of the alloted timeslot
+    day_index: day number -> usernames with a booking touching that day
+    """
+
+    def __init__(self):
+        self.days: dict[int, int] = {}
+        self.bookings: dict[str, tuple[int, int]] = {}
+        self.day_index: dict[int, set[str]] = defaultdict(set)
+
+    def _touched_days(self, start: int, end: int) -> range:
+        first = _minute_floor(start) // MINUTES_PER_DAY
+        last = (_minute_ceil(end) - 1) // MINUTES_PER_DAY
+        return range(first, last + 1)
+
+    def _rebuild(self, days):
+        """Recompute the bitmap of the given days from the bookings touching them"""
+        for day in days:
+            midnight = day * MINUTES_PER_DAY
+            bitmap = 0
+            for username in self.day_index.get(day, ()):
+                start, end = self.bookings[username]
+                lo = max(_minute_floor(start) - midnight, 0)
+                hi = min(_minute_ceil(end) - midnight, MINUTES_PER_DAY)
+                bitmap |= _bits(lo, hi)
+
+            if bitmap:
+                self.days[day] = bitmap
+            else:
+                self.days.pop(day, None)
+                self.day_index.pop(day, None)
+
+    def book(self, username: str, start: int, end: int):
+        """Add or replace the booking of a user, only the touched days are rebuilt"""
+        touched = self.release(username, rebuild=False)
+
+        if end > start:
+            self.bookings[username] = (start, end)
+            days = self._touched_days(start, end)
+            for day in days:
+                self.day_index[day].add(username)
+            touched.extend(days)
+
+        self._rebuild(touched)
+
+    def release(self, username: str, rebuild: bool = True) -> list[int]:
+        """Remove the booking of a user, return the days that were touched"""
+        booking = self.bookings.pop(username, None)
+        if booking is None:
+            return []
+
+        days = list(self._touched_days(*booking))
+        for day in days:
+            self.day_index[day].discard(username)
+
+        if rebuild:
+            self._rebuild(days)
+        return days
+
+    def busy_mask(self, start: int, end: int) -> int:
+        """Busy bitmap of the minutes in [start, end), bit 0 is the minute of start"""
+        first = _minute_floor(start)
+        length = _minute_ceil(end) - first
+        if length <= 0:
+            return 0
+
+        day, skip = divmod(first, MINUTES_PER_DAY)
+        mask = 0
+        offset = 0
+        while offset < length + skip:
+            mask |= self.days.get(day, 0) << offset
+            day += 1
+            offset += MINUTES_PER_DAY
+
+        return (mask >> skip) & _bits(0, length)
+
+    def _intervals(self, first: int, mask: int) -> list[tuple[int, int]]:
+        return [((first + lo) * 60, (first + lo + run) * 60) for lo, run in _runs(mask)]
+
+    def free_intervals(self, start: int, end: int) -> list[tuple[int, int]]:
+        """Free (start, end) intervals within [start, end)"""
+        first = _minute_floor(start)
+        length = _minute_ceil(end) - first
+        return self._intervals(first, ~self.busy_mask(start, end) & _bits(0, length))
+
+    def busy_intervals(self, start: int, end: int) -> list[tuple[int, int]]:
+        """Busy (start, end) intervals within [start, end)"""
+        return self._intervals(_minute_floor(start), self.busy_mask(start, end))
+
+    def next_free(self, after: int, minutes: int, horizon: int) -> int | None:
+        """Earliest start of a free window of the given length between after and after + horizon seconds"""
+        if minutes <= 0:
+            return None
+
+        first = _minute_ceil(after)
+        length = horizon // 60
+        if length < minutes:
+            return None
+
+        free = ~self.busy_mask(first * 60, (first + length) * 60) & _bits(0, length)
+        starts = _run_starts(free, minutes) & _bits(0, length - minutes + 1)
+        if not starts:
+            return None
+        return (first + (starts & -starts).bit_length() - 1) * 60
+
+
+# bot -> calendar
+calendars: dict[str, BotCalendar] = defaultdict(BotCalendar)
+
+# Set once the calendars have been built from the users table
+loaded: bool = False
+
+# Bumped on every timeslot write, a worker rebuilds its calendars when another worker moved it
+epoch = SharedEpoch("availability")
+version: int = 0
+
+
+def is_current() -> bool:
+    return loaded and epoch.value() == version
+
+
+def update_booking(username: str, start_time: int | None, end_time: int | None, bot: str | None):
+    """Move the booking of a user to the given bot & timeslot, called whenever a timeslot is written"""
+    global version
+
+    current = is_current()
+    changed = epoch.bump()
+    if not current:
+        return
+
+    for calendar in calendars.values():
+        calendar.release(username)
+
+    if bot and start_time and end_time:
+        calendars[bot].book(username, start_time, end_time)
+
+    # Still current unless another worker wrote in between
+    if changed == version + 1:
+        version = changed
+
+
+def build(users) -> dict[str, BotCalendar]:
+    """Calendars of a list of users, touches no shared state (runs in a thread)"""
+    built: dict[str, BotCalendar] = defaultdict(BotCalendar)
+    for user in users:
+        start, end = user.start_time, user.end_time
+        if user.bot and start and end and end > start:
+            calendar = built[user.bot]
+            calendar.bookings[user.username] = (start, end)
+            for day in calendar._touched_days(start, end):
+                calendar.day_index[day].add(user.username)
+
+    # Build every day bitmap once instead of per booking
+    for calendar in built.values():
+        calendar._rebuild(list(calendar.day_index))
+    return built
+
+
+def install(built: dict[str, BotCalendar], users_version: int):
+    """Replace the calendars by ones built from the users read when the epoch was at `users_version`"""
+    global calendars, loaded, version
+
+    calendars = built
+    loaded = True
+    version = users_version
+
+
+def load(users, users_version: int = 0):
+    """(Re)build every calendar from a list of users, read when the epoch was at `users_version`"""
+    install(build(users), users_version)
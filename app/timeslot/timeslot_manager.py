@@ -2,34 +2,93 @@
 # Created On:
 # Timeslot manager for fastapi
 
+import asyncio
 from typing import Annotated
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 
 from datetime import datetime, timedelta, timezone
 
 from ..database import operations as ds
 from ..core.schema import Token, TokenData, User, UserInDB
 
-from ..core.core import get_current_active_user, only_root_user, admin_plus
+from ..core import timeutils
+from ..core import cache
+from ..core import audit
+from ..core.core import get_current_user, get_current_active_user, only_root_user, admin_plus
+from ..communication.bot_comms import ROS_BOT, IOT_BOT
+
+from . import availability
 
 router = APIRouter()
 
+# Longest window that can be queried / searched at once
+AVAILABILITY_MAX_RANGE = int(timedelta(days=31).total_seconds())
+
+
+# One rebuild at a time, the callers arriving meanwhile wait for it
+_refresh_lock = asyncio.Lock()
+
+
+async def refresh_calendars():
+    """
+    Rebuild the calendars when a timeslot was written (by any worker) since they were built
+
+    The users table is read & the calendars built in a thread, the event loop keeps serving meanwhile
+    """
+    if availability.is_current():
+        return
+    async with _refresh_lock:
+        if availability.is_current():
+            return
+        # Epoch read first, a write during the load makes the next call reload again
+        users_version = availability.epoch.value()
+        built = await asyncio.to_thread(lambda: availability.build(ds.get_users()))
+        availability.install(built, users_version)
+
+
+async def get_calendar(bot: str) -> availability.BotCalendar:
+    """Calendar of the bot, built from the users table on first use"""
+
+    if bot not in (ROS_BOT, IOT_BOT):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bot not found",
+        )
+
+    await refresh_calendars()
+    return availability.calendars[bot]
+
+
+def parse_query_time(value: str) -> int:
+    """Parse an ISO 8601 query parameter to epoch seconds"""
+    try:
+        return timeutils.parse_timestamp(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Incorrect datetime format, should be ISO 8601",
+        )
+
 
 @router.get(
     "/timeslot",
+    response_model=list[User],
     responses={
         200: {"description": "Get all the timeslots"},
         401: {"description": "Not Authorized"},
     },
 )
 async def get_timeslots(
-    current_user: Annotated[User, Depends(admin_plus)]
-) -> list[User] | None:
+    request: Request, current_user: Annotated[User, Depends(admin_plus)]
+):
 
-    users: list[User] = ds.get_users()
-    # Removing the root entry
-    users.pop(0)
-    return users
+    def build() -> list[dict]:
+        users: list[User] = ds.get_users()
+        # Removing the root entry
+        users.pop(0)
+        return [user.model_dump() for user in users]
+
+    return cache.json_response(request, "timeslot", None, build)
 
 
 @router.get(
@@ -51,25 +110,107 @@ async def set_timeslot(
 ) -> User:
     """Allot a timeslot to the user
     Only root user is authorized to allot timeslots
+
+    start_time, end_time: ISO 8601 datetimes, naive values are taken as server local time
     """
 
-    # Check if the datetime string matches correct format
-    try:
-        datetime.strptime(start_time, "%y%m%d%H%M%S")
-        datetime.strptime(end_time, "%y%m%d%H%M%S")
-    except ValueError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Incorrect datetime format, should be yymmddhhmmss",
-        )
+    # Convert to epoch seconds, the format stored in the database
+    start: int = parse_query_time(start_time)
+    end: int = parse_query_time(end_time)
 
     user: User = ds.get_user(username)
     if user:
-        ds.allot_timeslot(username, start_time, end_time, bot)
+        ds.allot_timeslot(username, start, end, bot)
+
+        # Keep the free/busy bitmaps in step with the users table, in this & the other workers
+        availability.update_booking(username, start, end, bot)
+        audit.record("timeslot_allot", current_user.username, bot, user=username, start=start, end=end)
+
         return ds.get_user(username)
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+
+
+@router.get(
+    "/timeslot/availability",
+    responses={
+        200: {"description": "Free & busy intervals of the bot"},
+        400: {"description": "Invalid time range"},
+        404: {"description": "Bot not found"},
+    },
+)
+async def get_availability(
+    bot: str,
+    start_time: str,
+    end_time: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> dict:
+    """
+    Free / busy intervals of a bot between start_time & end_time (ISO 8601)
+    at minute granularity, ranges are limited to 31 days
+
+    Intervals are returned as UTC epoch seconds
+    """
+
+    start = parse_query_time(start_time)
+    end = parse_query_time(end_time)
+
+    if not (start < end <= start + AVAILABILITY_MAX_RANGE):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid range, end_time must be after start_time and within 31 days",
+        )
+
+    calendar = await get_calendar(bot)
+
+    return {
+        "bot": bot,
+        "free": [
+            {"start_time": lo, "end_time": hi}
+            for lo, hi in calendar.free_intervals(start, end)
+        ],
+        "busy": [
+            {"start_time": lo, "end_time": hi}
+            for lo, hi in calendar.busy_intervals(start, end)
+        ],
+    }
+
+
+@router.get(
+    "/timeslot/availability/next",
+    responses={
+        200: {"description": "Start of the next free slot, null if none"},
+        400: {"description": "Invalid duration"},
+        404: {"description": "Bot not found"},
+    },
+)
+async def get_next_free_slot(
+    bot: str,
+    minutes: int,
+    current_user: Annotated[User, Depends(get_current_user)],
+    after: str | None = None,
+) -> dict:
+    """
+    Earliest free slot of the bot lasting at least `minutes`,
+    searched from `after` (ISO 8601, default now) up to 31 days ahead
+
+    The slot is returned as UTC epoch seconds
+    """
+
+    if not (0 < minutes <= AVAILABILITY_MAX_RANGE // 60):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid duration",
+        )
+
+    start = parse_query_time(after) if after else timeutils.now()
+    slot = (await get_calendar(bot)).next_free(start, minutes, AVAILABILITY_MAX_RANGE)
+
+    if slot is None:
+        return {"bot": bot, "start_time": None, "end_time": None}
+
+    return {"bot": bot, "start_time": slot, "end_time": slot + minutes * 60}
@@ -0,0 +1,108 @@
+# Created On: 2026, Oct 19
+# Load shedding - latency of stops, bot output & /me during a surge of code pushes to a slow bot, shedding on & off
+#
+# Run from the repository root:
+#   python -m benchmarks.admission_bench [--pushers 32] [--seconds 10] [--push-delay 0.5]
+#
+# Pushers upload code in a loop as fast as the server answers. Meanwhile probes send an emergency stop, a line of
+# bot output and a /me request every --probe-interval seconds. Off: RERO_ADMISSION_MAX_CONCURRENT=0
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from .harness import PASSWORD, Harness
+from .stats import summarize
+
+PROGRAM = b"print('hello')\n"
+
+
+async def pusher(client: httpx.AsyncClient, headers: dict, until: float, results: dict):
+    while time.perf_counter() < until:
+        begin = time.perf_counter()
+        try:
+            response = await client.post("/bot/iot/code", files={"file": ("program.py", PROGRAM)}, headers=headers)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = "error"
+        if status == 200:
+            results["latencies"].append(time.perf_counter() - begin)
+        else:
+            results[status] = results.get(status, 0) + 1
+            if status == 503:
+                # Retry-After, scaled down to keep the surge going
+                await asyncio.sleep(0.1)
+
+
+async def probe(client: httpx.AsyncClient, method: str, url: str, headers: dict, until: float, interval: float) -> dict:
+    latencies, errors = [], 0
+    begin = time.perf_counter()
+    while time.perf_counter() < until:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors += 1
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+    return summarize(latencies, time.perf_counter() - begin, errors=errors)
+
+
+async def scenario(args, shedding: bool) -> dict:
+    env = {"FAKE_BOT_PUSH_DELAY": str(args.push_delay)}
+    if not shedding:
+        env["RERO_ADMISSION_MAX_CONCURRENT"] = "0"
+    with Harness(users_per_bot=1, env=env) as harness:
+        limits = httpx.Limits(max_connections=args.pushers + 8)
+        async with httpx.AsyncClient(base_url=harness.url, timeout=60, limits=limits) as client:
+            response = await client.post("/token", data={"username": "root", "password": PASSWORD})
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            until = time.perf_counter() + args.seconds
+            pushes = {"latencies": []}
+            tasks = [asyncio.create_task(pusher(client, headers, until, pushes)) for _ in range(args.pushers)]
+            # Let the surge build up
+            await asyncio.sleep(0.5)
+            stop, dump, me = await asyncio.gather(
+                probe(client, "GET", "/bot/iot/stop", headers, until, args.probe_interval),
+                probe(client, "GET", "/iot/dump?data=probe", {}, until, args.probe_interval),
+                probe(client, "GET", "/me", headers, until, args.probe_interval),
+            )
+            await asyncio.gather(*tasks)
+            scrape = (await client.get("/metrics")).text
+
+    latencies = pushes.pop("latencies")
+    return {
+        "stop": stop,
+        "dump": dump,
+        "me": me,
+        "push": {**summarize(latencies, args.seconds), "rejected": pushes},
+        "queue_seconds": [line for line in scrape.splitlines() if line.startswith("rero_admission_queue_seconds_count")],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pushers", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--push-delay", type=float, default=0.5, help="Seconds the fake bot takes to answer a push")
+    parser.add_argument("--probe-interval", type=float, default=0.2)
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    results = {
+        "shedding_off": asyncio.run(scenario(args, False)),
+        "shedding_on": asyncio.run(scenario(args, True)),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "scenarios": results}, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Created On: 2026, Oct 19
+# Audit log - cost of audit.record() on the request path, against one synchronous insert per event
+#
+# Run from the repository root:
+#   python -m benchmarks.audit_bench [--events 20000] [--rate 2000]
+#
+# In process, on a temporary audit database. Events are recorded at --rate per second from the event loop,
+# like requests would; the group commit writer runs alongside. The synchronous scenario commits each event on its own
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from .stats import summarize
+
+
+async def grouped(audit, store, events: int, rate: float) -> dict:
+    """record() per event while the writer runs, batch sizes of the group commits"""
+    batches = []
+    add_events = store.add_events
+
+    def counted(rows):
+        batches.append(len(rows))
+        add_events(rows)
+
+    store.add_events = counted
+    audit.start()
+    latencies = []
+    begin = time.perf_counter()
+    for number in range(events):
+        start = time.perf_counter()
+        audit.record("code_push", f"user-{number % 100}", "iot", trace_id=f"{number:016x}", outcome="pushed")
+        latencies.append(time.perf_counter() - start)
+        # Paced, the writer gets the loop in between
+        await asyncio.sleep(max(0.0, begin + (number + 1) / rate - time.perf_counter()))
+    duration = time.perf_counter() - begin
+    await audit.close()
+    store.add_events = add_events
+
+    batches.sort()
+    return {
+        "record": summarize(latencies, duration),
+        "commits": len(batches),
+        "events_written": sum(batches),
+        "batch_size": {"min": batches[0], "median": batches[len(batches) // 2], "max": batches[-1]} if batches else {},
+    }
+
+
+def synchronous(store, events: int) -> dict:
+    """One transaction per event, as an insert in the request would cost"""
+    latencies = []
+    begin = time.perf_counter()
+    for number in range(events):
+        start = time.perf_counter()
+        store.add_events([(time.time(), "code_push", f"user-{number % 100}", "iot", '{"outcome":"pushed"}')])
+        latencies.append(time.perf_counter() - start)
+    return {"insert": summarize(latencies, time.perf_counter() - begin)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=2000, help="Events per second of the group commit scenario")
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Before the app is imported, config reads the environment once
+        os.environ["RERO_AUDIT_DB_PATH"] = os.path.join(directory, "audit.db")
+        from app.core import audit
+        from app.database import audit as store
+
+        results = {"group_commit": asyncio.run(grouped(audit, store, args.events, args.rate))}
+        # Fewer events, each pays a commit
+        results["synchronous"] = synchronous(store, min(args.events, 2000))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "scenarios": results}, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Created On: 2026, Oct 19
+# Benchmark for the per-bot free/busy bitmaps with a year of bookings
+#
+# Run from the repository root:
+#   python -m benchmarks.availability_bench
+
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.timeslot import availability
+
+BOTS = ("ros", "iot")
+SLOTS_PER_DAY = 10
+DAYS = 365
+
+
+def timed(fn, repeat: int) -> float:
+    """Mean wall time of fn in microseconds"""
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - begin) / repeat * 1e6
+
+
+def synthetic_users(first_day: datetime) -> list:
+    """A year of 30 - 120 minute bookings, SLOTS_PER_DAY per bot per day"""
+    rng = random.Random(42)
+    users = []
+    for day in range(DAYS):
+        for bot in BOTS:
+            for slot in range(SLOTS_PER_DAY):
+                start = first_day + timedelta(days=day, hours=8 + slot, minutes=rng.choice((0, 15, 30)))
+                end = start + timedelta(minutes=rng.choice((30, 45, 60, 90, 120)))
+                users.append(SimpleNamespace(
+                    username=f"{bot}-{day}-{slot}",
+                    start_time=int(start.timestamp()),
+                    end_time=int(end.timestamp()),
+                    bot=bot,
+                ))
+    return users
+
+
+def main():
+    first_day = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    users = synthetic_users(first_day)
+
+    begin = time.perf_counter()
+    availability.load(users, availability.epoch.value())
+    load_ms = (time.perf_counter() - begin) * 1e3
+
+    calendar = availability.calendars["ros"]
+    day = 24 * 3600
+    week_start = int((first_day + timedelta(days=180)).timestamp())
+    week_end = week_start + 7 * day
+    month_end = week_start + 31 * day
+    morning = week_start + 8 * 3600
+
+    def rebook():
+        start = week_start + 6 * 3600
+        availability.update_booking("ros-180-0", start, start + 3600, "ros")
+
+    results = {
+        "bookings": len(users),
+        "load_ms": round(load_ms, 2),
+        "update_booking_us": round(timed(rebook, 1000), 2),
+        "busy_mask_week_us": round(timed(lambda: calendar.busy_mask(week_start, week_end), 1000), 2),
+        "free_intervals_week_us": round(timed(lambda: calendar.free_intervals(week_start, week_end), 1000), 2),
+        "free_intervals_month_us": round(timed(lambda: calendar.free_intervals(week_start, month_end), 200), 2),
+        "next_free_60min_us": round(timed(lambda: calendar.next_free(morning, 60, 31 * day), 1000), 2),
+        "next_free_600min_us": round(timed(lambda: calendar.next_free(morning, 600, 31 * day), 1000), 2),
+    }
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Created On: 2026, Oct 19
+# Camera relay - a synthetic frame source pushing to /ros/camera, fast & slow viewers on /bot/ros/camera
+#
+# Run from the repository root:
+#   python -m benchmarks.camera_bench [--fps 30] [--frame-kb 60] [--viewers 20] [--slow-viewers 5] [--window 1]
+#
+# Latency is measured from the source sending a frame to a viewer receiving it (timestamp inside the frame),
+# slow viewers sleep after every frame and should skip to the latest one rather than fall behind
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import time
+
+import httpx
+import websockets
+
+from .harness import PASSWORD, Harness
+from .stats import summarize
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+TIMESTAMP = struct.Struct("<d")
+
+
+def frame(size: int, padding: bytes) -> bytes:
+    """A JPEG-shaped frame of `size` bytes carrying its send time"""
+    return JPEG_SOI + TIMESTAMP.pack(time.time()) + padding[: size - 2 - TIMESTAMP.size - 2] + JPEG_EOI
+
+
+async def source(url: str, fps: float, size: int, seconds: float) -> int:
+    """Push frames at `fps` for `seconds`, return the number sent"""
+    padding = os.urandom(size)
+    sent = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        begin = time.perf_counter()
+        while time.perf_counter() - begin < seconds:
+            await ws.send(frame(size, padding))
+            sent += 1
+            await asyncio.sleep(max(0.0, begin + sent / fps - time.perf_counter()))
+    return sent
+
+
+async def viewer(url: str, latencies: list[float], delay: float, ack: bool, stop: asyncio.Event) -> int:
+    """Receive frames until stopped, sleeping `delay` after each (then acking it), return the number received"""
+    received = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), 1)
+            except asyncio.TimeoutError:
+                continue
+            latencies.append(time.time() - TIMESTAMP.unpack_from(message, len(JPEG_SOI))[0])
+            received += 1
+            if delay:
+                await asyncio.sleep(delay)
+            if ack:
+                await ws.send("1")
+    return received
+
+
+async def run(args) -> dict:
+    env = {"RERO_CAMERA_MAX_FPS": str(args.max_fps), "RERO_CAMERA_MAX_BITRATE": str(args.max_bitrate)}
+    with Harness(users_per_bot=1, env=env) as harness:
+        async with httpx.AsyncClient(base_url=harness.url) as client:
+            response = await client.post("/token", data={"username": "root", "password": PASSWORD})
+            token = response.json()["access_token"]
+
+            ws_url = harness.url.replace("http", "ws", 1)
+            viewer_url = f"{ws_url}/bot/ros/camera?token={token}&window={args.window}"
+
+            stop = asyncio.Event()
+            fast: list[float] = []
+            slow: list[float] = []
+            ack = args.window > 0
+            viewers = [asyncio.create_task(viewer(viewer_url, fast, 0, ack, stop)) for _ in range(args.viewers)]
+            viewers += [
+                asyncio.create_task(viewer(viewer_url, slow, args.slow_delay, ack, stop))
+                for _ in range(args.slow_viewers)
+            ]
+            # Let the viewers connect before the first frame
+            await asyncio.sleep(0.5)
+
+            begin = time.perf_counter()
+            sent = await source(f"{ws_url}/ros/camera", args.fps, args.frame_kb * 1024, args.seconds)
+            duration = time.perf_counter() - begin
+            await asyncio.sleep(0.5)
+            stop.set()
+            received = await asyncio.gather(*viewers)
+
+            metrics = (await client.get("/metrics")).text
+            frames = {
+                line.split("result=")[1].split('"')[1]: float(line.rsplit(" ", 1)[1])
+                for line in metrics.splitlines()
+                if line.startswith("rero_camera_frames_total") and 'bot="ros"' in line
+            }
+
+    fast_summary = summarize(fast, duration)
+    fast_summary["fps_per_viewer"] = round(sum(received[: args.viewers]) / max(1, args.viewers) / args.seconds, 2)
+    slow_summary = summarize(slow, duration)
+    slow_summary["fps_per_viewer"] = round(sum(received[args.viewers:]) / max(1, args.slow_viewers) / args.seconds, 2)
+    return {
+        "frames_sent": sent,
+        "frame_bytes": args.frame_kb * 1024,
+        "fast_viewers": fast_summary,
+        "slow_viewers": slow_summary,
+        "server_frames": frames,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--frame-kb", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--viewers", type=int, default=20)
+    parser.add_argument("--slow-viewers", type=int, default=5)
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="Seconds a slow viewer takes per frame")
+    parser.add_argument("--window", type=int, default=1, help="Unacked frames per viewer, 0 for no acks")
+    parser.add_argument("--max-fps", type=float, default=60, help="Server upstream limit")
+    parser.add_argument("--max-bitrate", type=float, default=100_000_000, help="Server upstream limit, bits/s")
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "scenarios": results}, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
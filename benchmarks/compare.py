@@ -0,0 +1,35 @@
+# Created On: 2026, Oct 19
+# Compare two benchmark result files scenario by scenario
+#
+#   python -m benchmarks.compare old.json new.json
+
+import json
+import sys
+
+FIELDS = ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s", "errors")
+
+
+def change(old: float, new: float) -> str:
+    if not old:
+        return "    n/a"
+    return f"{(new - old) / old * 100:+7.1f}%"
+
+
+def main():
+    with open(sys.argv[1]) as f:
+        old = json.load(f)
+    with open(sys.argv[2]) as f:
+        new = json.load(f)
+
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    for scenario, before in old["scenarios"].items():
+        after = new["scenarios"].get(scenario)
+        if after is None:
+            continue
+        print(f"\n{scenario}")
+        for field in FIELDS:
+            print(f"  {field:<18}{before.get(field, 0):>12}{after.get(field, 0):>12}  {change(before.get(field, 0), after.get(field, 0))}")
+
+
+if __name__ == "__main__":
+    main()
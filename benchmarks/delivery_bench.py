@@ -0,0 +1,116 @@
+# Created On: 2026, Oct 19
+# Reliable bot output - lines lost & duplicated with one /<bot>/dump request per line against acked /<bot>/output
+# batches, on a lossy link; credit granted while socket.io clients stop reading
+#
+# Run from the repository root:
+#   python -m benchmarks.delivery_bench [--rate 1000] [--seconds 5] [--loss 0.05] [--stalled-clients 0]
+#
+# The ros fake bot streams numbered lines, FAKE_BOT_LOSS of its output requests (or their answers) are lost.
+# A socket.io client counts every line it gets, stalled clients connect & never read
+
+import argparse
+import asyncio
+import json
+import re
+import time
+
+import httpx
+
+from app.communication import output_frames as frames
+
+from .harness import PASSWORD, Harness
+from .sio_client import SocketIOClient
+
+SEQ = re.compile(r"seq=(\d+)")
+
+
+async def collect(client: SocketIOClient, seen: dict):
+    """Count the lines by their number in the text until cancelled"""
+    try:
+        while True:
+            packet = await client.ws.recv()
+            if isinstance(packet, bytes):
+                for _, _, _, text in frames.decode(packet):
+                    seq = int(SEQ.search(text).group(1))
+                    seen[seq] = seen.get(seq, 0) + 1
+            elif packet == "2":
+                await client.ws.send("3")
+    except ConnectionError:
+        pass
+
+
+async def finished(bot: str, lines: int, reliable: bool, timeout: float) -> dict:
+    """Bot counters once every line was sent (dump mode) or acked (reliable mode)"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            stats = (await client.get(f"{bot}/stats")).json()
+            done = stats["output_acked"] if reliable else stats["dumped"] + stats["dump_errors"]
+            if done >= lines or time.monotonic() > deadline:
+                return stats
+            await asyncio.sleep(0.1)
+
+
+async def scenario(args, reliable: bool) -> dict:
+    env = {"FAKE_BOT_RELIABLE": "1" if reliable else "0", "FAKE_BOT_LOSS": str(args.loss)}
+    with Harness(users_per_bot=1, env=env) as harness:
+        async with httpx.AsyncClient(base_url=harness.url, timeout=30) as http:
+            response = await http.post("/token", data={"username": "root", "password": PASSWORD})
+            token = response.json()["access_token"]
+
+            client = SocketIOClient(harness.url, token)
+            await client.connect()
+            await client.emit("output_format", {"format": "binary"})
+            stalled = []
+            for _ in range(args.stalled_clients):
+                stalled.append(SocketIOClient(harness.url, token))
+                await stalled[-1].connect()
+                await stalled[-1].emit("output_format", {"format": "binary"})
+            await asyncio.sleep(0.5)
+
+            seen: dict[int, int] = {}
+            receiver = asyncio.create_task(collect(client, seen))
+            bot = f"http://127.0.0.1:{harness.bots['ros']}"
+            lines = int(args.rate * args.seconds)
+            begin = time.perf_counter()
+            await http.post(f"{bot}/stream", params={"lines": lines, "rate": args.rate})
+            stats = await finished(bot, lines, reliable, args.seconds * 20)
+            elapsed = time.perf_counter() - begin
+            await asyncio.sleep(0.5)
+            receiver.cancel()
+            for sio in (client, *stalled):
+                await sio.close()
+
+    result = {
+        "lines": lines,
+        "received": len(seen),
+        "lost": lines - len(seen),
+        "duplicated": sum(count - 1 for count in seen.values()),
+        "seconds_to_last_line": round(elapsed, 2),
+    }
+    if reliable:
+        result.update({key: value for key, value in stats.items() if key.startswith("output_")})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=1000, help="Lines per second")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--loss", type=float, default=0.05, help="Fraction of output requests or answers lost")
+    parser.add_argument("--stalled-clients", type=int, default=0, help="socket.io clients that never read")
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    results = {
+        "dump_per_line": asyncio.run(scenario(args, False)),
+        "reliable_batches": asyncio.run(scenario(args, True)),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "scenarios": results}, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# Created On: 2026, Oct 19
+# Stand-in bot for the benchmarks, implements the bot side of the server API
+#
+#   FAKE_BOT_NAME=iot FAKE_BOT_SERVER=http://127.0.0.1:8080 uvicorn benchmarks.fake_bot:app --port 8082
+#
+# Every pushed program "prints" FAKE_BOT_LINES lines back through /<bot>/dump (FAKE_BOT_RELIABLE=1: /<bot>/output
+# batches, acked & resent), POST /stream starts a synthetic print stream of a given rate, /teleop acks every command batch
+
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+import uuid
+from collections import deque
+from typing import Annotated
+
+import httpx
+from fastapi import FastAPI, Header, UploadFile, WebSocket, WebSocketDisconnect
+
+BOT = os.environ.get("FAKE_BOT_NAME", "iot")
+SERVER = os.environ.get("FAKE_BOT_SERVER", "http://127.0.0.1:8080")
+LINES_PER_PUSH = int(os.environ.get("FAKE_BOT_LINES", 1))
+# Seconds a teleop command batch takes to apply before its ack
+TELEOP_DELAY = float(os.environ.get("FAKE_BOT_TELEOP_DELAY", 0))
+# Seconds a push takes before the bot answers, a slow bot holds a server thread per push
+PUSH_DELAY = float(os.environ.get("FAKE_BOT_PUSH_DELAY", 0))
+# Output through the reliable /<bot>/output batches instead of one /<bot>/dump request per line
+RELIABLE = os.environ.get("FAKE_BOT_RELIABLE") == "1"
+# Fraction of output requests lost, half on the way to the server, half on the way back (the server got it)
+LOSS = float(os.environ.get("FAKE_BOT_LOSS", 0))
+
+# Concurrent dump requests to the server
+MAX_IN_FLIGHT = 32
+
+app = FastAPI()
+
+counters = {
+    "pushes": 0, "stops": 0, "dumped": 0, "dump_errors": 0, "teleop_batches": 0, "teleop_commands": 0, "teleop_stops": 0,
+    "output_batches": 0, "output_retries": 0, "output_acked": 0, "output_buffered_max": 0, "output_credit_min": None,
+}
+
+client: httpx.AsyncClient | None = None
+in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+background: set[asyncio.Task] = set()
+
+
+def get_client() -> httpx.AsyncClient:
+    global client
+    if client is None:
+        client = httpx.AsyncClient(base_url=SERVER, timeout=30)
+    return client
+
+
+async def lossy(request):
+    """Run the request, losing it or its answer LOSS of the time"""
+    if LOSS and random.random() < LOSS / 2:
+        raise httpx.TransportError("Request lost")
+    response = await request
+    if LOSS and random.random() < LOSS / 2:
+        raise httpx.TransportError("Answer lost")
+    return response
+
+
+async def dump(line: str, trace: str | None = None):
+    """Send one line of program output to the server"""
+    if RELIABLE:
+        return output.add(line, trace)
+    params = {"data": line}
+    if trace:
+        params["trace"] = trace
+    async with in_flight:
+        try:
+            response = await lossy(get_client().get(f"/{BOT}/dump", params=params))
+            response.raise_for_status()
+            counters["dumped"] += 1
+        except httpx.HTTPError:
+            counters["dump_errors"] += 1
+
+
+class Output:
+    """
+    Reliable output: lines are numbered & kept until acked, one batch of up to `credit` lines in flight.
+    A failed batch is sent again from the first unacked line, the server drops what it already has
+    """
+
+    def __init__(self):
+        self.session = uuid.uuid4().hex
+        self.next_seq = 1
+        # (seq, type, text) not acked yet, oldest first
+        self.unacked: deque = deque()
+        self.credit = 64
+        self.trace: str | None = None
+        self.pending = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def add(self, line: str, trace: str | None = None):
+        self.unacked.append((self.next_seq, "info", line))
+        self.next_seq += 1
+        self.trace = trace or self.trace
+        counters["output_buffered_max"] = max(counters["output_buffered_max"], len(self.unacked))
+        self.pending.set()
+        if self.task is None:
+            self.task = asyncio.create_task(self.send())
+
+    def restart(self):
+        """A new program run, numbered from 1 again"""
+        self.session = uuid.uuid4().hex
+        self.next_seq = 1
+        self.unacked.clear()
+        self.trace = None
+
+    async def send(self):
+        backoff = 0.05
+        while True:
+            await self.pending.wait()
+            if not self.unacked:
+                self.pending.clear()
+                continue
+            batch = list(itertools.islice(self.unacked, self.credit))
+            body = {"session": self.session, "records": batch, "trace": self.trace}
+            try:
+                response = await lossy(get_client().post(f"/{BOT}/output", json=body))
+                if response.status_code == 409:
+                    # Replaced by a newer run
+                    self.unacked.clear()
+                    continue
+                if response.status_code == 503:
+                    await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+                    continue
+                response.raise_for_status()
+            except httpx.HTTPError:
+                counters["output_retries"] += 1
+                await asyncio.sleep(backoff)
+                backoff = min(2.0, backoff * 2)
+                continue
+
+            backoff = 0.05
+            answer = response.json()
+            counters["output_batches"] += 1
+            while self.unacked and self.unacked[0][0] <= answer["ack"]:
+                self.unacked.popleft()
+                counters["output_acked"] += 1
+            self.credit = answer["credit"]
+            if counters["output_credit_min"] is None or self.credit < counters["output_credit_min"]:
+                counters["output_credit_min"] = self.credit
+
+
+output = Output()
+
+
+def spawn(coroutine):
+    task = asyncio.create_task(coroutine)
+    background.add(task)
+    task.add_done_callback(background.discard)
+
+
+async def stream(lines: int, rate: float, label: str, trace: str | None = None):
+    """Dump lines at a fixed rate, each line carries its send time for latency measurement"""
+    interval = 1 / rate if rate > 0 else 0
+    start = time.perf_counter()
+    pending = []
+    for seq in range(lines):
+        delay = start + seq * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        pending.append(asyncio.create_task(dump(f"{label} seq={seq} t={time.time():.6f}", trace)))
+    await asyncio.gather(*pending)
+
+
+@app.post("/push_code")
+async def push_code(file: UploadFile, x_trace_id: Annotated[str | None, Header()] = None):
+    code = await file.read()
+    counters["pushes"] += 1
+    output.restart()
+    if PUSH_DELAY:
+        await asyncio.sleep(PUSH_DELAY)
+    spawn(stream(LINES_PER_PUSH, 0, f"push bytes={len(code)}", x_trace_id))
+    return {"status": "running"}
+
+
+@app.get("/stop_code")
+async def stop_code():
+    counters["stops"] += 1
+    return {"status": "stopped"}
+
+
+@app.post("/stream")
+async def start_stream(lines: int, rate: float):
+    spawn(stream(lines, rate, "stream"))
+    return {"status": "streaming"}
+
+
+@app.websocket("/teleop")
+async def teleop(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        while True:
+            batch = json.loads(await websocket.receive_text())
+            counters["teleop_batches"] += 1
+            counters["teleop_commands"] += len(batch["commands"])
+            counters["teleop_stops"] += sum(1 for command in batch["commands"] if command["kind"] == "stop")
+            if TELEOP_DELAY:
+                await asyncio.sleep(TELEOP_DELAY)
+            await websocket.send_text(json.dumps({"ack": batch["seq"]}))
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/stats")
+async def stats():
+    return counters
@@ -0,0 +1,133 @@
+# Created On: 2026, Oct 19
+# Runs the server and stand-in bots as local processes against a temporary database & secret
+
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Password of root and every seeded bench-<bot>-<i> user
+PASSWORD = "bench"
+
+# Admission control loose enough that the storms measure the server, not the limiter
+BENCH_ENV = {
+    "RERO_LOGIN_USER_PER_MINUTE": "100000",
+    "RERO_LOGIN_USER_BURST": "100000",
+    "RERO_LOGIN_IP_PER_MINUTE": "100000",
+    "RERO_LOGIN_IP_BURST": "100000",
+    "RERO_LOGIN_VERIFY_WAIT": "60",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Harness:
+    """
+    Context manager running the server on a random port with two fake bots (iot, ros)
+
+    env: extra environment for the server, e.g. admission control settings
+    """
+
+    def __init__(self, users_per_bot: int = 50, lines_per_push: int = 1, env: dict | None = None):
+        self.users_per_bot = users_per_bot
+        self.lines_per_push = lines_per_push
+        self.extra_env = env or {}
+        self.processes: list[subprocess.Popen] = []
+        self.tmp = tempfile.TemporaryDirectory(prefix="rero-bench-")
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.bots = {"iot": free_port(), "ros": free_port()}
+
+    def env(self) -> dict:
+        secret_file = os.path.join(self.tmp.name, "secret")
+        if not os.path.exists(secret_file):
+            with open(secret_file, "w") as f:
+                f.write(secrets.token_hex(32) + "\n")
+
+        for bot in self.bots:
+            os.makedirs(os.path.join(self.tmp.name, bot), exist_ok=True)
+
+        return {
+            **os.environ,
+            **BENCH_ENV,
+            "PYTHONPATH": ROOT,
+            "RERO_DB_PATH": os.path.join(self.tmp.name, "users.db"),
+            "RERO_SECRET_FILE": secret_file,
+            "RERO_CODE_DIR": self.tmp.name,
+            "RERO_RUN_DIR": self.tmp.name,
+            "RERO_IOT_BOT": f"127.0.0.1:{self.bots['iot']}",
+            "RERO_ROS_BOT": f"127.0.0.1:{self.bots['ros']}",
+            **self.extra_env,
+        }
+
+    def spawn(self, name: str, args: list[str], env: dict) -> subprocess.Popen:
+        log = open(os.path.join(self.tmp.name, f"{name}.log"), "wb")
+        process = subprocess.Popen([sys.executable, *args], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        self.processes.append(process)
+        return process
+
+    def wait_ready(self, url: str, timeout: float = 30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(url, timeout=1).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        raise TimeoutError(f"{url} not ready after {timeout}s, see logs in {self.tmp.name}")
+
+    def start(self):
+        env = self.env()
+
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.seed", str(self.users_per_bot), PASSWORD],
+            cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+
+        uvicorn = ["-m", "uvicorn", "--host", "127.0.0.1", "--log-level", "warning"]
+        for bot, port in self.bots.items():
+            bot_env = {**env, "FAKE_BOT_NAME": bot, "FAKE_BOT_SERVER": self.url, "FAKE_BOT_LINES": str(self.lines_per_push)}
+            self.spawn(f"bot-{bot}", [*uvicorn, "--port", str(port), "benchmarks.fake_bot:app"], bot_env)
+
+        self.spawn("server", [*uvicorn, "--port", str(self.port), "app.main:app"], env)
+
+        self.wait_ready(f"{self.url}/openapi.json")
+        for port in self.bots.values():
+            self.wait_ready(f"http://127.0.0.1:{port}/stats")
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes.clear()
+        self.tmp.cleanup()
+
+    def users(self, bot: str) -> list[str]:
+        return [f"bench-{bot}-{i}" for i in range(self.users_per_bot)]
+
+    def __enter__(self):
+        try:
+            self.start()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,193 @@
+# Created On: 2026, Oct 19
+# End-to-end load scenarios against a local server with fake bots
+#
+# Run from the repository root:
+#   python -m benchmarks.load [--output results.json] [--logins 40] [--pushes 40] [--viewers 20] [--lines 500]
+#
+# Results (p50 / p95 / p99 latency & throughput per scenario) are saved as JSON,
+# compare two runs with python -m benchmarks.compare old.json new.json
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+
+import httpx
+
+from .harness import PASSWORD, ROOT, Harness
+from .sio_client import SocketIOClient
+from .stats import summarize
+
+
+async def login(client: httpx.AsyncClient, username: str) -> tuple[float, str | None]:
+    begin = time.perf_counter()
+    response = await client.post("/token", data={"username": username, "password": PASSWORD})
+    elapsed = time.perf_counter() - begin
+    if response.status_code != 200:
+        return elapsed, None
+    return elapsed, response.json()["access_token"]
+
+
+async def login_storm(harness: Harness, logins: int, concurrency: int) -> tuple[dict, dict]:
+    """Concurrent password logins, return the summary and the last token of every user"""
+    users = harness.users("iot") + harness.users("ros")
+    tokens: dict[str, str] = {}
+    latencies: list[float] = []
+    errors = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=harness.url, timeout=120) as client:
+
+        async def one(i: int):
+            nonlocal errors
+            username = users[i % len(users)]
+            async with gate:
+                elapsed, token = await login(client, username)
+            latencies.append(elapsed)
+            if token is None:
+                errors += 1
+            else:
+                tokens[username] = token
+
+        begin = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(logins)))
+        duration = time.perf_counter() - begin
+
+    return summarize(latencies, duration, errors), tokens
+
+
+async def code_push(harness: Harness, tokens: dict, pushes: int, concurrency: int) -> dict:
+    """Concurrent uploads to /bot/<bot>/code, each relayed to a fake bot"""
+    users = [username for username in tokens if username.startswith("bench-iot")]
+    code = b"for i in range(10):\n    print(i)\n"
+    latencies: list[float] = []
+    errors = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=harness.url, timeout=120) as client:
+
+        async def one(i: int):
+            nonlocal errors
+            username = users[i % len(users)]
+            async with gate:
+                begin = time.perf_counter()
+                response = await client.post(
+                    "/bot/iot/code",
+                    files={"file": ("main.py", code)},
+                    headers={"Authorization": f"Bearer {tokens[username]}"},
+                )
+                latencies.append(time.perf_counter() - begin)
+            if response.status_code != 200:
+                errors += 1
+
+        begin = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(pushes)))
+        duration = time.perf_counter() - begin
+
+    return summarize(latencies, duration, errors)
+
+
+async def print_stream(harness: Harness, root_token: str, viewers: int, lines: int, rate: float) -> dict:
+    """
+    A fake bot prints `lines` lines at `rate` lines/second, fanned out to `viewers` socket.io clients
+
+    Latency is measured from the bot sending a line to a viewer receiving it
+    """
+    clients = [SocketIOClient(harness.url, root_token) for _ in range(viewers)]
+    await asyncio.gather(*(client.connect() for client in clients))
+
+    latencies: list[float] = []
+    expected = lines
+
+    async def receive(client: SocketIOClient):
+        received = 0
+        async for event, data in client.events():
+            if event != "print" or not isinstance(data, dict) or "stream seq=" not in str(data.get("print")):
+                continue
+            sent = float(data["print"].rsplit("t=", 1)[1])
+            latencies.append(time.time() - sent)
+            received += 1
+            if received >= expected:
+                return
+
+    receivers = [asyncio.create_task(receive(client)) for client in clients]
+
+    begin = time.perf_counter()
+    async with httpx.AsyncClient(timeout=30) as bot:
+        await bot.post(f"http://127.0.0.1:{harness.bots['iot']}/stream", params={"lines": lines, "rate": rate})
+
+    timeout = lines / rate + 30 if rate > 0 else 60
+    done, pending = await asyncio.wait(receivers, timeout=timeout)
+    duration = time.perf_counter() - begin
+
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+    summary = summarize(latencies, duration, errors=viewers * lines - len(latencies))
+    summary["viewers"] = viewers
+    summary["lines"] = lines
+    return summary
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    results = {
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "parameters": vars(args),
+        "scenarios": {},
+    }
+
+    with Harness(users_per_bot=args.users, lines_per_push=args.lines_per_push) as harness:
+        scenarios = results["scenarios"]
+
+        scenarios["login_storm"], tokens = await login_storm(harness, args.logins, args.concurrency)
+        scenarios["code_push"] = await code_push(harness, tokens, args.pushes, args.concurrency)
+
+        async with httpx.AsyncClient(base_url=harness.url) as client:
+            _, root_token = await login(client, "root")
+        scenarios["print_stream"] = await print_stream(harness, root_token, args.viewers, args.lines, args.rate)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20, help="Seeded users per bot")
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--pushes", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--lines-per-push", type=int, default=1)
+    parser.add_argument("--viewers", type=int, default=20)
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200, help="Lines per second of the print stream")
+    parser.add_argument("--output", default=None, help="JSON file, default benchmarks/results/load-<commit>.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"load-{results['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=4)
+
+    print(json.dumps(results["scenarios"], indent=4))
+    print("Saved to", output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Created On: 2026, Oct 19
+# Compact bot output - bandwidth & CPU of JSON "print" events against binary "output" frames at high output rates
+#
+# Run from the repository root:
+#   python -m benchmarks.output_bench [--rate 2000] [--seconds 5] [--clients 10]
+#
+# Encoding: socket.io packets of --lines lines encoded in process, batches as the server makes them at --rate.
+# End to end: the ros fake bot streams lines at --rate, --clients socket.io clients in one format receive them;
+# bytes are counted per client as received (websocket payloads), CPU is the server process time
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import socketio
+
+from app.communication import output_frames as frames
+
+from .harness import PASSWORD, Harness
+from .sio_client import SIO_EVENT, SocketIOClient
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def line(seq: int) -> str:
+    """A line like the fake bot stream, a sensor readout"""
+    return f"stream seq={seq} t={time.time():.6f} pose=({seq % 97 * 0.01:.2f}, {seq % 89 * 0.02:.2f})"
+
+
+def encoding(lines: int, batch: int, compress_min: int) -> dict:
+    """Websocket payload bytes & encode CPU per line, JSON event per line or binary frame per `batch` lines"""
+    texts = [line(seq) for seq in range(lines)]
+
+    begin = time.process_time()
+    json_bytes = 0
+    for text in texts:
+        packet = socketio.packet.Packet(socketio.packet.EVENT, data=["print", {"print": text, "bot": "ros", "type": "info"}])
+        # Engine.IO message prefix "4"
+        json_bytes += 1 + len(packet.encode().encode())
+    json_cpu = time.process_time() - begin
+
+    results = {"json": {"bytes_per_line": round(json_bytes / lines, 2), "cpu_us_per_line": round(json_cpu / lines * 1e6, 3)}}
+    for name, minimum in (("binary", 0), ("binary_zlib", compress_min)):
+        begin = time.process_time()
+        total = 0
+        for first in range(0, lines, batch):
+            records = [(1, 0, seq, texts[seq].encode()) for seq in range(first, min(lines, first + batch))]
+            frame = frames.encode(records, minimum)
+            placeholder, attachment = socketio.packet.Packet(socketio.packet.EVENT, data=["output", frame]).encode()
+            total += 1 + len(placeholder.encode()) + len(attachment)
+        cpu = time.process_time() - begin
+        results[name] = {"bytes_per_line": round(total / lines, 2), "cpu_us_per_line": round(cpu / lines * 1e6, 3)}
+    return results
+
+
+def process_cpu(pid: int) -> float:
+    """User + system CPU seconds of a process"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+async def receive(client: SocketIOClient, totals: dict):
+    """Count payload bytes & bot output lines until cancelled"""
+    try:
+        while True:
+            packet = await client.ws.recv()
+            size = len(packet) if isinstance(packet, bytes) else len(packet.encode())
+            totals["bytes"] += size
+            if isinstance(packet, bytes):
+                totals["lines"] += len(frames.decode(packet))
+            elif packet == "2":
+                await client.ws.send("3")
+            elif packet.startswith(SIO_EVENT + '["print"'):
+                totals["lines"] += 1
+    except ConnectionError:
+        pass
+
+
+async def streamed(bot: str, lines: int, timeout: float) -> int:
+    """Wait for the fake bot to have sent every line, return the lines the server took"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            stats = (await client.get(f"{bot}/stats")).json()
+            if stats["dumped"] + stats["dump_errors"] >= lines or time.monotonic() > deadline:
+                return stats["dumped"]
+            await asyncio.sleep(0.1)
+
+
+async def scenario(args, output: str) -> dict:
+    with Harness(users_per_bot=1) as harness:
+        server = harness.processes[-1].pid
+        async with httpx.AsyncClient(base_url=harness.url, timeout=30) as http:
+            response = await http.post("/token", data={"username": "root", "password": PASSWORD})
+            token = response.json()["access_token"]
+
+            clients = []
+            for _ in range(args.clients):
+                client = SocketIOClient(harness.url, token)
+                await client.connect()
+                await client.emit("output_format", {"format": output})
+                clients.append(client)
+            await asyncio.sleep(0.5)
+
+            totals = [{"bytes": 0, "lines": 0} for _ in clients]
+            receivers = [asyncio.create_task(receive(client, total)) for client, total in zip(clients, totals)]
+
+            bot = f"http://127.0.0.1:{harness.bots['ros']}"
+            cpu = process_cpu(server)
+            lines = int(args.rate * args.seconds)
+            await http.post(f"{bot}/stream", params={"lines": lines, "rate": args.rate})
+            ingested = await streamed(bot, lines, args.seconds * 10)
+            # Last frames & packets on their way
+            await asyncio.sleep(0.5)
+            cpu = process_cpu(server) - cpu
+            for receiver in receivers:
+                receiver.cancel()
+
+            for client in clients:
+                await client.close()
+
+    received = sum(total["lines"] for total in totals)
+    return {
+        "lines_sent": lines,
+        "lines_ingested": ingested,
+        "lines_received_per_client": round(received / len(clients), 1),
+        "bytes_per_line_per_client": round(sum(total["bytes"] for total in totals) / max(1, received), 2),
+        # Includes the dump requests, the same in both formats
+        "server_cpu_s": round(cpu, 3),
+        "server_cpu_us_per_line": round(cpu / max(1, ingested) * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=2000, help="Lines per second")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--lines", type=int, default=100000, help="Lines of the encoding measurement")
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    # Lines per frame at --rate with the default 20 ms batches
+    batch = max(1, min(256, round(args.rate * 0.02)))
+    results = {
+        "encoding": {"lines_per_frame": batch, **encoding(args.lines, batch, 512)},
+        "json": asyncio.run(scenario(args, "json")),
+        "binary": asyncio.run(scenario(args, "binary")),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "scenarios": results}, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Created On: 2026, Oct 19
+# Pre-warming - time to first output of the first push of a timeslot, with & without the pre-warm
+#
+# Run from the repository root:
+#   python -m benchmarks.prewarm_bench [--rounds 5] [--lead 2]
+#
+# Each round allots bench-iot-0 a timeslot starting a few seconds later, logs in at the start & pushes right away.
+# Cold: RERO_PREWARM_LEAD=0, the first push of the worker also pays the import of requests & a new bot connection
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from .harness import PASSWORD, Harness
+from .stats import summarize
+
+PROGRAM = b"print('hello')\n"
+
+
+def iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+async def trace_marks(client: httpx.AsyncClient, admin: dict, trace_id: str, timeout: float = 10) -> dict | None:
+    """Stage marks (seconds since the push was received) once the first output is in"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        marks = (await client.get(f"/traces/{trace_id}", headers=admin)).json()["marks_ms"]
+        if "first_output" in marks:
+            return {stage: offset / 1e3 for stage, offset in marks.items()}
+        await asyncio.sleep(0.02)
+    return None
+
+
+async def round_trip(client: httpx.AsyncClient, admin: dict, lead: float) -> tuple[float, dict | None]:
+    """One timeslot: (seconds from the slot start to the push answered, marks of the push trace)"""
+    start = int(time.time()) + int(lead) + 3
+    response = await client.get(
+        "/timeslot/allot",
+        params={"username": "bench-iot-0", "start_time": iso(start), "end_time": iso(start + 60), "bot": "iot"},
+        headers=admin,
+    )
+    response.raise_for_status()
+
+    await asyncio.sleep(max(0.0, start - time.time()) + 0.05)
+    response = await client.post("/token", data={"username": "bench-iot-0", "password": PASSWORD})
+    user = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await client.post("/bot/iot/code", files={"file": ("program.py", PROGRAM)}, headers=user)
+    response.raise_for_status()
+    pushed = time.time() - start
+    return pushed, await trace_marks(client, admin, response.headers["X-Trace-Id"])
+
+
+async def scenario(lead: float, rounds: int) -> dict:
+    with Harness(users_per_bot=1, env={"RERO_PREWARM_LEAD": str(lead)}) as harness:
+        async with httpx.AsyncClient(base_url=harness.url, timeout=30) as client:
+            response = await client.post("/token", data={"username": "root", "password": PASSWORD})
+            admin = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            pushes, transfers, outputs = [], [], []
+            for _ in range(rounds):
+                pushed, marks = await round_trip(client, admin, lead)
+                pushes.append(pushed)
+                if marks is not None:
+                    transfers.append(marks["bot_ack"] - marks["transfer"])
+                    outputs.append(marks["first_output"])
+            state = (await client.get("/prewarm", headers=admin)).json()
+
+    errors = rounds - len(outputs)
+    return {
+        # Includes the login of the user at the slot start
+        "slot_start_to_push_done": summarize(pushes, 1),
+        "push_transfer_to_bot_ack": summarize(transfers, 1, errors=errors),
+        "push_to_first_output": summarize(outputs, 1, errors=errors),
+        "prewarm_state": state,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--lead", type=float, default=2, help="RERO_PREWARM_LEAD of the warm scenario")
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    results = {
+        "cold": asyncio.run(scenario(0, args.rounds)),
+        "prewarmed": asyncio.run(scenario(args.lead, args.rounds)),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "scenarios": results}, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
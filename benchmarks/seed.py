@@ -0,0 +1,51 @@
+# Created On: 2026, Oct 19
+# Seed a benchmark database, run by the harness with RERO_DB_PATH pointing at a temp file
+#
+#   python -m benchmarks.seed <users per bot> <password>
+
+import sqlite3
+import sys
+import time
+from datetime import date
+
+from passlib.context import CryptContext
+
+from app import config
+from app import database
+
+
+def main():
+    users_per_bot = int(sys.argv[1])
+    password = sys.argv[2]
+
+    # Creates & migrates the schema
+    database.init()
+
+    # One hash for everyone, seeding should not be dominated by bcrypt
+    hashed_password = CryptContext(schemes=["bcrypt"]).hash(password)
+
+    # Timeslot from an hour ago until a day from now
+    now = int(time.time())
+    start_time, end_time = now - 3600, now + 24 * 3600
+
+    rows = [
+        (f"bench-{bot}-{i}", hashed_password, 0, 0, start_time, end_time, date(2000, 1, 1), bot, None)
+        for bot in ("iot", "ros")
+        for i in range(users_per_bot)
+    ]
+
+    connection = sqlite3.connect(config.DB_PATH)
+    connection.executemany(
+        """
+        INSERT INTO users (username, hashed_password, disabled, blacklist, start_time, end_time, date_of_birth, bot, jwt)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    connection.execute("UPDATE users SET hashed_password = ? WHERE username = 'root'", (hashed_password,))
+    connection.commit()
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Created On: 2026, Oct 19
+# Minimal socket.io (Engine.IO v4, websocket transport) client for the benchmarks
+
+import json
+
+import websockets
+
+# Engine.IO / Socket.IO packet prefixes
+EIO_OPEN = "0"
+EIO_PING = "2"
+EIO_PONG = "3"
+SIO_CONNECT = "40"
+SIO_EVENT = "42"
+SIO_CONNECT_ERROR = "44"
+
+
+class SocketIOClient:
+    """Connects to the default namespace with the JWT in the Authorization header, yields events"""
+
+    def __init__(self, url: str, token: str):
+        self.url = url.replace("http", "ws", 1).rstrip("/") + "/socket.io/?EIO=4&transport=websocket"
+        self.token = token
+        self.ws = None
+
+    async def connect(self):
+        self.ws = await websockets.connect(
+            self.url, extra_headers={"Authorization": self.token}, max_size=None
+        )
+
+        packet = await self.ws.recv()
+        if not packet.startswith(EIO_OPEN):
+            raise ConnectionError(f"Unexpected open packet {packet!r}")
+
+        await self.ws.send(SIO_CONNECT)
+        while True:
+            packet = await self.ws.recv()
+            if packet.startswith(SIO_CONNECT):
+                return
+            if packet.startswith(SIO_CONNECT_ERROR):
+                raise ConnectionError(packet)
+            if packet == EIO_PING:
+                await self.ws.send(EIO_PONG)
+
+    async def emit(self, event: str, data=None):
+        await self.ws.send(SIO_EVENT + json.dumps([event, data]))
+
+    async def events(self):
+        """Yield (event, data) until the connection closes"""
+        async for packet in self.ws:
+            if isinstance(packet, bytes):
+                yield "binary", packet
+            elif packet == EIO_PING:
+                await self.ws.send(EIO_PONG)
+            elif packet.startswith(SIO_EVENT):
+                event, *args = json.loads(packet[len(SIO_EVENT):])
+                yield event, args[0] if args else None
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
@@ -0,0 +1,91 @@
+# Created On: 2026, Oct 19
+# Worker startup time - importing the app & spawn to first served request, on a new and an existing database
+#
+# Run from the repository root:
+#   python -m benchmarks.startup_bench [--runs 10] [--output startup.json]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .harness import ROOT, Harness
+from .stats import summarize
+
+
+def spawn_time(args: list[str], env: dict) -> float:
+    """Wall time of a Python process running to completion"""
+    begin = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, env=env, check=True)
+    return time.perf_counter() - begin
+
+
+def first_request_time(harness: Harness, env: dict, client: httpx.Client) -> float:
+    """Spawn uvicorn & poll until the first request is served"""
+    url = f"{harness.url}/metrics"
+    begin = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--port", str(harness.port), "--log-level", "warning", "app.main:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                if client.get(url).status_code == 200:
+                    return time.perf_counter() - begin
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError("server exited during startup")
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def scenario(fn, runs: int) -> dict:
+    latencies = [fn() for _ in range(runs)]
+    return summarize(latencies, sum(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    harness = Harness()
+    # One client for all the polls, creating one per poll costs more than the poll interval
+    client = httpx.Client(timeout=1)
+    try:
+        env = harness.env()
+        db_path = env["RERO_DB_PATH"]
+
+        def new_database() -> float:
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            return first_request_time(harness, env, client)
+
+        results = {
+            "interpreter": scenario(lambda: spawn_time(["-c", "pass"], env), args.runs),
+            "import_app": scenario(lambda: spawn_time(["-c", "import app.main"], env), args.runs),
+            "first_request_new_db": scenario(new_database, args.runs),
+            "first_request_existing_db": scenario(lambda: first_request_time(harness, env, client), args.runs),
+        }
+    finally:
+        client.close()
+        harness.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"scenarios": results}, f, indent=4)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# Created On: 2026, Oct 19
+# Latency / throughput summaries shared by the benchmarks
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], duration: float, errors: int = 0) -> dict:
+    """
+    Summary of a scenario, latencies in seconds
+
+    return: count, errors, p50 / p95 / p99 / mean / max in milliseconds, throughput per second
+    """
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "count": count,
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 0.50) * 1e3, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1e3, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1e3, 3),
+        "mean_ms": round(sum(ordered) / count * 1e3, 3) if count else 0.0,
+        "max_ms": round(ordered[-1] * 1e3, 3) if count else 0.0,
+        "duration_s": round(duration, 3),
+        "throughput_per_s": round(count / duration, 2) if duration > 0 else 0.0,
+    }
@@ -0,0 +1,108 @@
+# Created On: 2026, Oct 19
+# Sensor telemetry - ingest a long synthetic series into /iot/telemetry, then time downsampled range queries
+#
+# Run from the repository root:
+#   python -m benchmarks.telemetry_bench [--points 2000000] [--batch 10000] [--buckets 1000]
+#
+# Queries: the whole series, a 10% and a 0.1% window, each repeated; the response size is what a chart downloads
+
+import argparse
+import asyncio
+import json
+import math
+import time
+
+import httpx
+
+from .harness import PASSWORD, Harness
+from .stats import summarize
+
+# Sample period of the synthetic sensor (seconds)
+PERIOD = 0.001
+T0 = 1_800_000_000.0
+
+
+async def ingest(client: httpx.AsyncClient, points: int, batch: int) -> float:
+    """Post the series in batches, return the seconds taken"""
+    begin = time.perf_counter()
+    for offset in range(0, points, batch):
+        samples = [
+            ["temp", T0 + i * PERIOD, 20 + 5 * math.sin(i / 5000) + (i % 7) * 0.01]
+            for i in range(offset, min(points, offset + batch))
+        ]
+        response = await client.post("/iot/telemetry", json=samples)
+        response.raise_for_status()
+    return time.perf_counter() - begin
+
+
+async def query(client: httpx.AsyncClient, headers: dict, params: dict, repeat: int) -> dict:
+    latencies = []
+    size = 0
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get("/telemetry/iot", params=params, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        size = len(response.content)
+    summary = summarize(latencies, time.perf_counter() - begin)
+    summary["response_bytes"] = size
+    summary["buckets_filled"] = len(response.json()["t"])
+    return summary
+
+
+async def run(args) -> dict:
+    with Harness(users_per_bot=1, env={"RERO_TELEMETRY_FLUSH": "0.5"}) as harness:
+        async with httpx.AsyncClient(base_url=harness.url, timeout=120) as client:
+            response = await client.post("/token", data={"username": "root", "password": PASSWORD})
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            seconds = await ingest(client, args.points, args.batch)
+            # Open chunk saved, queries then read the database & the ring of the worker
+            await asyncio.sleep(1.5)
+
+            # Session of whoever holds the iot slot in the seeded database
+            channels = (await client.get("/telemetry/iot/channels", headers=headers)).json()
+            session = next(channel for channel in channels if channel["channel"] == "temp")
+            span = args.points * PERIOD
+            base = {
+                "channel": "temp", "username": session["username"], "session": session["session"], "buckets": args.buckets,
+            }
+            windows = {
+                "full": (T0, T0 + span),
+                "window_10pct": (T0 + span * 0.45, T0 + span * 0.55),
+                "window_0.1pct": (T0 + span * 0.5, T0 + span * 0.501),
+            }
+            results = {
+                name: await query(client, headers, {**base, "start": start, "end": end}, args.repeat)
+                for name, (start, end) in windows.items()
+            }
+
+    return {
+        "ingest": {
+            "points": args.points,
+            "seconds": round(seconds, 3),
+            "points_per_s": round(args.points / seconds),
+        },
+        "queries": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=2_000_000)
+    parser.add_argument("--batch", type=int, default=10_000, help="Samples per POST")
+    parser.add_argument("--buckets", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20, help="Runs of each query")
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "scenarios": results}, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Created On: 2026, Oct 19
+# Teleoperation - a socket.io client sending velocity commands to the ros fake bot, round trip to teleop_ack
+#
+# Run from the repository root:
+#   python -m benchmarks.teleop_bench [--rate 50] [--seconds 10] [--bot-delay 0]
+#
+# Commands replaced before they were sent (coalesced) get no ack of their own, the client latency covers the acked
+# ones; then the client goes quiet and the deadman has to stop the bot
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from .harness import PASSWORD, Harness
+from .sio_client import SocketIOClient
+from .stats import summarize
+
+
+async def drive(client: SocketIOClient, rate: float, seconds: float) -> tuple[list[float], int, float]:
+    """Send commands at `rate` for `seconds`, return the round trips of the acked ones, the number sent & duration"""
+    sent_at: dict[int, float] = {}
+    latencies: list[float] = []
+
+    async def receive():
+        async for event, data in client.events():
+            if event == "teleop_ack":
+                now = time.perf_counter()
+                for command_id in data.get("ids", ()):
+                    latencies.append(now - sent_at.pop(command_id))
+
+    receiver = asyncio.create_task(receive())
+    await client.emit("teleop_start", {"bot": "ros"})
+    await asyncio.sleep(0.5)
+
+    begin = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - begin < seconds:
+        sent_at[sent] = time.perf_counter()
+        await client.emit("teleop", {"kind": "velocity", "linear": 0.5, "angular": (sent % 20) / 10 - 1, "id": sent})
+        sent += 1
+        await asyncio.sleep(max(0.0, begin + sent / rate - time.perf_counter()))
+    duration = time.perf_counter() - begin
+
+    # Quiet past the deadman
+    await asyncio.sleep(1.5)
+    receiver.cancel()
+    return latencies, sent, duration
+
+
+async def run(args) -> dict:
+    # The fake bots get the server environment too
+    env = {"RERO_TELEOP_DEADMAN": str(args.deadman), "FAKE_BOT_TELEOP_DELAY": str(args.bot_delay)}
+    with Harness(users_per_bot=1, env=env) as harness:
+        async with httpx.AsyncClient(base_url=harness.url) as http:
+            response = await http.post("/token", data={"username": "root", "password": PASSWORD})
+            token = response.json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            client = SocketIOClient(harness.url, token)
+            await client.connect()
+            try:
+                latencies, sent, duration = await drive(client, args.rate, args.seconds)
+            finally:
+                await client.close()
+
+            server = (await http.get("/teleop/stats", headers=headers)).json()["ros"]
+            bot = httpx.get(f"http://127.0.0.1:{harness.bots['ros']}/stats").json()
+
+    client_summary = summarize(latencies, duration)
+    client_summary["sent"] = sent
+    return {
+        "client_round_trip": client_summary,
+        "server_command_to_ack": server,
+        "bot": {key: value for key, value in bot.items() if key.startswith("teleop")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=50, help="Commands per second")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--deadman", type=float, default=0.5, help="Server deadman timeout, seconds")
+    parser.add_argument("--bot-delay", type=float, default=0, help="Seconds the fake bot takes per command batch")
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "scenarios": results}, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
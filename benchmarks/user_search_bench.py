@@ -0,0 +1,106 @@
+# Created On: 2026, Oct 19
+# Admin user search - latency of each kind of search over a synthetic user base, against the full get_users() listing
+#
+# Run from the repository root:
+#   python -m benchmarks.user_search_bench [--users 100000] [--repeat 200]
+#
+# In process, on a temporary database. Users are user-<n> (n zero padded, shuffled), a third per bot and a third
+# without one, 1% disabled, 0.5% blacklisted, a timeslot somewhere in the next week for 30% of them
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from .stats import summarize
+
+DAY = 86400
+
+
+def seed(ds, count: int, now: int):
+    """Insert the synthetic users in one transaction, the password hash is a placeholder"""
+    rng = random.Random(1)
+    rows = []
+    for number in rng.sample(range(count), count):
+        bot = ("iot", "ros", "")[number % 3]
+        start = end = 0
+        if rng.random() < 0.3:
+            start = now + rng.randrange(7 * DAY) // 3600 * 3600
+            end = start + 3600
+        rows.append((
+            f"user-{number:06d}", "x", rng.random() < 0.01, rng.random() < 0.005, start, end, "2000-01-01", bot, "",
+        ))
+    connection = ds.connect()
+    try:
+        connection.executemany(
+            "INSERT INTO users (username, hashed_password, disabled, blacklist, start_time, end_time, date_of_birth, bot, jwt)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        # No ANALYZE, like the server databases
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def measure(call, repeat: int) -> dict:
+    latencies = []
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = call()
+        latencies.append(time.perf_counter() - start)
+    result = summarize(latencies, time.perf_counter() - begin)
+    result["rows"] = len(rows)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=50, help="Page size")
+    parser.add_argument("--output", default=None, help="JSON file, printed only by default")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Before the app is imported, config reads the environment once
+        os.environ["RERO_DB_PATH"] = os.path.join(directory, "users.db")
+        from app import database
+        from app.database import operations as ds
+
+        database.init()
+        now = int(time.time())
+        seed(ds, args.users, now)
+
+        limit = args.limit
+        # A page from the middle of the user base, the cursor skips the earlier ones through the index
+        middle = f"user-{args.users // 2:06d}"
+        searches = {
+            "prefix": lambda: ds.search_users(prefix="user-0123", limit=limit),
+            "bot": lambda: ds.search_users(bot="ros", limit=limit),
+            "bot_deep_page": lambda: ds.search_users(bot="ros", after=middle, limit=limit),
+            "disabled": lambda: ds.search_users(disabled=True, limit=limit),
+            "blacklisted": lambda: ds.search_users(blacklist=True, limit=limit),
+            "slot_window_hour": lambda: ds.search_users(slot_from=now + DAY, slot_until=now + DAY + 3600, limit=limit),
+            "slot_window_day": lambda: ds.search_users(slot_from=now + DAY, slot_until=now + 2 * DAY, limit=limit),
+            "slot_window_week": lambda: ds.search_users(slot_from=now, slot_until=now + 7 * DAY, limit=limit),
+            "bot_and_slot_window": lambda: ds.search_users(
+                bot="iot", slot_from=now + DAY, slot_until=now + 2 * DAY, limit=limit
+            ),
+            "prefix_projected": lambda: ds.search_users(prefix="user-05", limit=limit, fields=("username", "bot")),
+        }
+        results = {name: measure(call, args.repeat) for name, call in searches.items()}
+        # What finding a user cost before: every user through /timeslot
+        results["get_users_full_listing"] = measure(ds.get_users, max(1, args.repeat // 50))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "scenarios": results}, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()